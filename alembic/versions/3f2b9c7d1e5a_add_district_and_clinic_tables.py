@@ -0,0 +1,48 @@
+"""add district and clinic tables
+
+Revision ID: 3f2b9c7d1e5a
+Revises: a656496646c4
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2b9c7d1e5a'
+down_revision = 'a656496646c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('districts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=256), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_districts_id'), 'districts', ['id'], unique=False)
+    op.create_index(op.f('ix_districts_name'), 'districts', ['name'], unique=True)
+    op.create_table('clinics',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('district_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=512), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['district_id'], ['districts.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('district_id', 'name', name='uq_clinics_district_id_name')
+    )
+    op.create_index(op.f('ix_clinics_district_id'), 'clinics', ['district_id'], unique=False)
+    op.create_index(op.f('ix_clinics_id'), 'clinics', ['id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_clinics_id'), table_name='clinics')
+    op.drop_index(op.f('ix_clinics_district_id'), table_name='clinics')
+    op.drop_table('clinics')
+    op.drop_index(op.f('ix_districts_name'), table_name='districts')
+    op.drop_index(op.f('ix_districts_id'), table_name='districts')
+    op.drop_table('districts')
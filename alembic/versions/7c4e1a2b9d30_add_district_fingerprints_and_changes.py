@@ -0,0 +1,38 @@
+"""add district fingerprints and change feed
+
+Revision ID: 7c4e1a2b9d30
+Revises: 3f2b9c7d1e5a
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c4e1a2b9d30'
+down_revision = '3f2b9c7d1e5a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('districts', sa.Column('fingerprint', sa.String(length=64), nullable=True))
+    op.create_table('district_changes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('district', sa.String(length=256), nullable=False),
+    sa.Column('added', sa.JSON(), nullable=False),
+    sa.Column('removed', sa.JSON(), nullable=False),
+    sa.Column('fingerprint', sa.String(length=64), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_district_changes_id'), 'district_changes', ['id'], unique=False)
+    op.create_index(op.f('ix_district_changes_district'), 'district_changes', ['district'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_district_changes_district'), table_name='district_changes')
+    op.drop_index(op.f('ix_district_changes_id'), table_name='district_changes')
+    op.drop_table('district_changes')
+    op.drop_column('districts', 'fingerprint')
@@ -0,0 +1,24 @@
+"""add district etag
+
+Revision ID: 9e2d4b6a1c57
+Revises: 7c4e1a2b9d30
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e2d4b6a1c57'
+down_revision = '7c4e1a2b9d30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('districts', sa.Column('etag', sa.String(length=256), nullable=True))
+
+
+def downgrade():
+    op.drop_column('districts', 'etag')
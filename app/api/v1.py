@@ -1,13 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+import os
 import time
+import json
+from typing import List, Optional
 from app import models, schemas, crud
-from app.deps import get_db
-from app.dependencies import get_driver, driver_pool
-from selenium.webdriver.remote.webdriver import WebDriver
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
+from app.security import hash_password
+from app.deps import get_async_db
+from app.broker import DriverBrokerClient
+from app.dependencies import driver_pool
+from app.tabs import scrape_pool, tab_pool
+from app.scraper import DISTRICT_ENGINE, ENGINES, load_district_info, stream_district_info
+from app.cache import make_key, result_cache
+from app.executors import cpu_executor, db_executor, get_executor_stats
+from app.metrics import track_endpoint
+from app.changes import change_feed
+from app.crawl import CRAWL_ENGINE, CRAWL_ENGINES, slot_crawler, slot_index
+from app.scheduler import refresh_scheduler
+from app.singleflight import scrape_flight
+from app.jobs import job_manager
+from app.worker import JOB_HANDLERS, handle_district_refresh
 n = '\n'
 
 """
@@ -19,68 +32,267 @@ n = '\n'
 """
 
 
-router = APIRouter()
+# Метка эндпоинта для метрик команд драйвера и ожидания пула
+router = APIRouter(dependencies=[Depends(track_endpoint)])
 
 @router.post("/users", response_model=schemas.UserOut)
-def create_user(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
-    user = crud.get_user_by_email(db, email=user_in.email)
+async def create_user(user_in: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    user = await crud.get_user_by_email(db, user_in.email)
     if user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_user(db, user_in)
+    # bcrypt — в отдельном процессе: не держит GIL и потоки парсинга
+    hashed = await cpu_executor.run(hash_password, user_in.password)
+    return await crud.create_user(db, user_in, hashed)
 
 
 @router.get("/district")
-def use_driver(driver: WebDriver = Depends(get_driver)):
-    info = {}
+async def use_driver(
+    workers: Optional[int] = Query(None, ge=1, description="Кол-во драйверов для параллельного обхода"),
+    engine: Optional[str] = Query(None, description="auto | http | selenium"),
+    refresh: bool = Query(False, description="Игнорировать кэш и получить данные заново"),
+):
+    engine = (engine or DISTRICT_ENGINE).lower()
+    if engine not in ENGINES:
+        raise HTTPException(status_code=400, detail=f"engine должен быть одним из: {', '.join(ENGINES)}")
+    key = make_key("district", engine=engine)
     try:
-        driver.get("https://gorzdrav.spb.ru/service-free-schedule")
-        wait = WebDriverWait(driver, 10)
-        district_buttons = wait.until(
-            EC.presence_of_all_elements_located(
-                (By.XPATH, '/html/body/div/div[1]/div[12]/div[3]/div[1]/div[2]/div[1]/div/div[1]/ul/li')
-            )
+        if refresh:
+            await result_cache.invalidate(key)
+        info = await result_cache.get_or_load(
+            key, lambda: scrape_flight.do(key, lambda: _load_and_save_district_info(engine, workers))
         )
-        total_districts = len(district_buttons)
-        for i in range(total_districts):
-            try:
-                # В КАЖДОЙ итерации заново находим все элементы
-                district_buttons = wait.until(
-                    EC.presence_of_all_elements_located(
-                        (By.XPATH, '/html/body/div/div[1]/div[12]/div[3]/div[1]/div[2]/div[1]/div/div[1]/ul/li')
-                    )
-                )
-
-                if i < len(district_buttons):
-                    district_name = district_buttons[i].text
-                    district_buttons[i].click()
-                    clinic_list = wait.until(
-                        EC.presence_of_all_elements_located((By.XPATH, '//*[@id="serviceMoOutput"]/div'))
-                    )
-
-                    clinics = [clinic.text.split('\n', 1)[0] for clinic in clinic_list]
-                    driver.back()
-                    wait.until(
-                        EC.presence_of_element_located(
-                            (By.XPATH, '/html/body/div/div[1]/div[12]/div[3]/div[1]/div[2]/div[1]/div/div[1]/ul')
-                        )
-                    )
-                    if len(district_name) > 1:
-                        info[district_name] = clinics
-            except Exception as e:
-                print(f"Ошибка при обработке района {i + 1}: {e}")
-                driver.get("https://gorzdrav.spb.ru/service-free-schedule")
-                continue
-
         return {"district_buttons": info}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/district/stream")
+async def stream_districts(
+    workers: Optional[int] = Query(None, ge=1, description="Кол-во драйверов для параллельного обхода"),
+    engine: Optional[str] = Query(None, description="auto | http | selenium"),
+    format: str = Query("ndjson", description="ndjson | sse"),
+):
+    """Районы по одному — запись отправляется клиенту сразу после обработки района"""
+    engine = (engine or DISTRICT_ENGINE).lower()
+    if engine not in ENGINES:
+        raise HTTPException(status_code=400, detail=f"engine должен быть одним из: {', '.join(ENGINES)}")
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format должен быть ndjson или sse")
+
+    async def records():
+        try:
+            async for district, clinics in stream_district_info(scrape_pool(), engine, workers):
+                record = json.dumps({"district": district, "clinics": clinics}, ensure_ascii=False)
+                yield f"event: district\ndata: {record}\n\n" if format == "sse" else record + "\n"
+        except Exception as e:
+            error = json.dumps({"error": str(e)}, ensure_ascii=False)
+            yield f"event: error\ndata: {error}\n\n" if format == "sse" else error + "\n"
+            return
+        if format == "sse":
+            yield "event: done\ndata: {}\n\n"
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(records(), media_type=media_type)
+
+
+@router.get("/district/snapshot")
+async def get_district_snapshot(db: AsyncSession = Depends(get_async_db)):
+    """Последние сохраненные в БД данные — без обращения к Selenium"""
+    return await crud.get_district_snapshot(db)
+
+
+@router.post("/district/refresh")
+async def refresh_districts(
+    workers: Optional[int] = Query(None, ge=1, description="Кол-во драйверов для параллельного обхода"),
+    engine: Optional[str] = Query(None, description="auto | http | selenium"),
+    full: bool = Query(False, description="Перепроверить все районы, а не только возможно изменившиеся"),
+):
+    """Инкрементальное обновление: в ответе — сводка и diff изменившихся районов вместо полного списка"""
+    engine = (engine or DISTRICT_ENGINE).lower()
+    if engine not in ENGINES:
+        raise HTTPException(status_code=400, detail=f"engine должен быть одним из: {', '.join(ENGINES)}")
+    try:
+        return await _refresh_districts(engine, workers, full)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/district/changes")
+async def get_district_changes(
+    since: int = Query(0, ge=0, description="id последней полученной записи"),
+    limit: int = Query(100, ge=1, le=1000),
+    district: Optional[str] = Query(None, description="Только изменения одного района"),
+    wait: float = Query(0, ge=0, le=60, description="Сколько секунд ждать новых записей (long-poll)"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Лента изменений: добавленные и удаленные поликлиники по районам, по возрастанию id"""
+    async def load():
+        try:
+            return await crud.get_district_changes(db, since, limit, district)
+        finally:
+            # Между опросами long-poll соединение возвращается в пул
+            await db.rollback()
+
+    changes = await change_feed.wait(load, wait)
+    return {"changes": changes, "last_id": changes[-1]["id"] if changes else since}
+
+
+async def _refresh_districts(engine: str, workers: Optional[int] = None, full: bool = False):
+    params = {"engine": engine, "workers": workers, "full": full}
+    if isinstance(driver_pool, DriverBrokerClient):
+        result = await driver_pool.submit("district_refresh", params)
+    else:
+        key = make_key("district_refresh", engine=engine, full=full)
+        result = await scrape_flight.do(key, lambda: handle_district_refresh(scrape_pool(), params))
+    if result["changes"] or result["removed"]:
+        # Кэш /district обновляем из БД, а не сбрасываем — следующий запрос не должен ждать браузер
+        info = await db_executor.run(crud.load_district_info)
+        for name in ENGINES:
+            await result_cache.set(make_key("district", engine=name), info)
+    return result
+
+
+async def _refresh_district_cache():
+    key = make_key("district", engine=DISTRICT_ENGINE)
+    if not await result_cache.refresh(
+        key, lambda: scrape_flight.do(key, lambda: _load_and_save_district_info(DISTRICT_ENGINE, None))
+    ):
+        raise RuntimeError(f"Не удалось обновить {key}")
+
+
+async def _crawl_slots():
+    slot_crawler.start(scrape_pool())
+    await slot_crawler.wait()
+    error = (slot_crawler.get_stats()["last"] or {}).get("error")
+    if error:
+        raise RuntimeError(error)
+
+
+def register_refresh_targets(scheduler):
+    """
+    Цели фонового обновления; интервал 0 отключает цель, по умолчанию все выключены.
+    Для /district интервал стоит брать чуть меньше CACHE_TTL (например, 0.8 от него).
+    Первый запуск — через интервал с разбросом, чтобы рестарт воркеров API не запускал парсинг разом
+    """
+    district_interval = float(os.getenv("REFRESH_DISTRICT_INTERVAL") or "0")
+    incremental_interval = float(os.getenv("REFRESH_DISTRICT_INCREMENTAL_INTERVAL", "0"))
+    slots_interval = float(os.getenv("REFRESH_SLOTS_INTERVAL", "0"))
+    if district_interval > 0:
+        scheduler.register("district", _refresh_district_cache, district_interval, initial_delay=district_interval)
+    if incremental_interval > 0:
+        scheduler.register("district_refresh", lambda: _refresh_districts(DISTRICT_ENGINE),
+                           incremental_interval, initial_delay=incremental_interval)
+    if slots_interval > 0:
+        scheduler.register("slots", _crawl_slots, slots_interval)
+
+
+async def _load_and_save_district_info(engine: str, workers: Optional[int]):
+    if isinstance(driver_pool, DriverBrokerClient):
+        # Брокер сам парсит и сохраняет — одинаковые запросы всех воркеров API объединяются в нем
+        result = await driver_pool.submit("district", {"engine": engine, "workers": workers})
+        return result["district_buttons"]
+    info = await load_district_info(scrape_pool(), engine, workers)
+    change_feed.publish(await db_executor.run(crud.store_district_info, info))
+    return info
+
+
+@router.post("/slots/crawl", status_code=202)
+async def start_slot_crawl(
+    engine: Optional[str] = Query(None, description="auto | http | selenium"),
+    district: Optional[List[str]] = Query(None, description="id районов; по умолчанию — все"),
+):
+    """Запускает обход свободных талонов в фоне; прогресс — GET /slots/crawl"""
+    engine = (engine or CRAWL_ENGINE).lower()
+    if engine not in CRAWL_ENGINES:
+        raise HTTPException(status_code=400, detail=f"engine должен быть одним из: {', '.join(CRAWL_ENGINES)}")
+    started = slot_crawler.start(scrape_pool(), engine, district)
+    return {"started": started, "crawl_stats": slot_crawler.get_stats()}
+
+
+@router.get("/slots/crawl")
+async def get_slot_crawl_stats():
+    """Эндпоинт для проверки хода обхода талонов"""
+    return {
+        "status": "ok",
+        "crawl_stats": slot_crawler.get_stats(),
+        "timestamp": time.time()
+    }
+
+
+@router.get("/slots")
+async def find_slots(
+    clinic: Optional[str] = Query(None, description="id или название поликлиники"),
+    specialty: Optional[str] = Query(None, description="Название специальности"),
+    district: Optional[str] = Query(None, description="Название района"),
+    with_slots_only: bool = Query(True, description="Только врачи со свободными талонами"),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """Свободные талоны из индекса последнего обхода — без запросов к сайту"""
+    return {
+        "doctors": slot_index.query(clinic, specialty, district, with_slots_only, limit),
+        "updated_at": slot_index.updated_at,
+    }
+
+
+@router.post("/jobs", response_model=schemas.ScrapeJobOut, status_code=202)
+async def submit_scrape_job(job_in: schemas.ScrapeJobCreate):
+    """Принимает задачу парсинга и сразу возвращает ее id; результат — через GET /jobs/{job_id}"""
+    if job_in.type not in JOB_HANDLERS:
+        raise HTTPException(status_code=400, detail=f"Неизвестный тип задачи: {job_in.type}")
+    job = await job_manager.submit(job_in.type, job_in.params)
+    return job.to_dict()
+
+
+@router.get("/jobs/{job_id}", response_model=schemas.ScrapeJobOut)
+async def get_scrape_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=60, description="Сколько секунд ждать завершения задачи (long-poll)"),
+):
+    job = await job_manager.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    job = await job_manager.store.wait(job, wait)
+    return job.to_dict()
+
+
 @router.get("/driver-pool")
 async def get_driver_pool_stats():
     """Эндпоинт для проверки статуса пула драйверов"""
     return {
         "status": "ok",
         "pool_stats": driver_pool.get_stats(),
+        "tab_stats": tab_pool.get_stats() if tab_pool.enabled else None,
+        "job_stats": job_manager.store.get_stats(),
+        "timestamp": time.time()
+    }
+
+
+@router.get("/cache")
+async def get_cache_stats():
+    """Эндпоинт для проверки статуса кэша результатов"""
+    return {
+        "status": "ok",
+        "cache_stats": result_cache.get_stats(),
+        "singleflight_stats": scrape_flight.get_stats(),
+        "timestamp": time.time()
+    }
+
+
+@router.get("/scheduler")
+async def get_scheduler_stats():
+    """Эндпоинт для проверки фоновых обновлений: интервалы, последние запуски, пропуски из-за занятого пула"""
+    return {
+        "status": "ok",
+        "targets": refresh_scheduler.get_stats(),
+        "timestamp": time.time()
+    }
+
+
+@router.get("/executors")
+async def get_executors_stats():
+    """Эндпоинт для проверки очередей и времени ожидания пулов потоков"""
+    return {
+        "status": "ok",
+        "executors": get_executor_stats(),
         "timestamp": time.time()
     }
@@ -0,0 +1,372 @@
+"""
+Брокер драйверов для нескольких воркеров API (gunicorn --workers N).
+Один процесс держит все сессии браузера, воркеры арендуют их через Unix-сокет
+или отправляют туда задачи парсинга целиком — сессий столько, сколько в пуле брокера,
+а не воркеры × DRIVER_POOL_SIZE.
+
+Запуск брокера: python -m app.broker
+Воркеры API: DRIVER_BROKER=client (сокет — DRIVER_BROKER_SOCKET)
+
+Протокол — JSON по строке на сообщение, одно соединение на одну операцию:
+    {"op": "lease", "clean": "full"} -> {"session_id", "executor_url", ...}, затем {"op": "release", "failed": false}
+    {"op": "task", "type": "district", "params": {...}} -> {"result": ...}
+    {"op": "status"} -> {"stats": ..., "readiness": ...}
+Если воркер отключился, не вернув сессию, брокер считает аренду неудачной и проверяет драйвер
+"""
+import os
+import json
+import time
+import signal
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Union
+
+from dotenv import load_dotenv
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.remote.remote_connection import RemoteConnection
+
+from app.cache import make_key
+from app.executors import driver_executor
+from app.metrics import current_endpoint, instrument_driver, pool_acquire_seconds
+from app.scheduler import background_lease
+from app.singleflight import scrape_flight
+
+load_dotenv()
+
+DRIVER_BROKER_SOCKET = os.getenv("DRIVER_BROKER_SOCKET", "/tmp/parsergz-driver-broker.sock")
+# Результат задачи (все районы) не помещается в стандартный лимит строки asyncio в 64 КБ
+_STREAM_LIMIT = 16 * 1024 * 1024
+
+
+async def _send(writer: asyncio.StreamWriter, message: dict):
+    writer.write(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+    await writer.drain()
+
+
+async def _receive(reader: asyncio.StreamReader) -> Optional[dict]:
+    """Следующее сообщение; None — собеседник закрыл соединение"""
+    line = await reader.readline()
+    return json.loads(line) if line else None
+
+
+def _executor_url(driver) -> str:
+    connection = driver.command_executor
+    client_config = getattr(connection, "_client_config", None)
+    return client_config.remote_server_addr if client_config is not None else connection._url
+
+
+class _LeaseFailed(Exception):
+    """Воркер сообщил об ошибке во время аренды или пропал, не вернув сессию"""
+
+
+class DriverBrokerServer:
+    """Раздает сессии пула драйверов и выполняет задачи парсинга по запросам через Unix-сокет"""
+
+    def __init__(self, pool, path: str = None, handlers: Dict = None):
+        self.pool = pool
+        self.path = path or DRIVER_BROKER_SOCKET
+        self.handlers = handlers
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._stats = {"leases": 0, "lease_failures": 0, "tasks": 0, "task_failures": 0, "active_leases": 0}
+
+    async def start(self):
+        if self.handlers is None:
+            from app.worker import JOB_HANDLERS
+
+            self.handlers = JOB_HANDLERS
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # Сокет от предыдущего запуска
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path, limit=_STREAM_LIMIT)
+        print(f"🔌 Брокер драйверов слушает {self.path}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await _receive(reader)
+            if request is None:
+                return
+            op = request.get("op")
+            if op == "lease":
+                await self._serve_lease(request, reader, writer)
+            elif op == "task":
+                await self._serve_task(request, writer)
+            elif op == "status":
+                await _send(writer, {"stats": self.get_stats(), "readiness": self.pool.get_readiness()})
+            else:
+                await _send(writer, {"error": f"Неизвестная операция: {op}"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            print(f"❌ Ошибка обработки запроса к брокеру: {e}")
+            try:
+                await _send(writer, {"error": str(e)})
+            except Exception:
+                pass
+        finally:
+            writer.close()
+
+    async def _serve_lease(self, request: dict, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._stats["leases"] += 1
+        self._stats["active_leases"] += 1
+        # Приоритет аренды клиента (фоновое обновление уступает интерактивным запросам)
+        background_lease.set(bool(request.get("background")))
+        try:
+            async with self.pool.get_driver(request.get("clean")) as driver:
+                warm_url = self.pool.warm_url
+                await _send(writer, {
+                    "session_id": driver.session_id,
+                    "executor_url": _executor_url(driver),
+                    "parked_url": warm_url if warm_url and self.pool.is_parked_on(driver, warm_url) else None,
+                    "blocked_urls": self.pool._blocked_urls(),
+                })
+                # Держим сессию, пока воркер не вернет ее или не отключится
+                release = await _receive(reader)
+                if release is None or release.get("failed"):
+                    raise _LeaseFailed()
+        except _LeaseFailed:
+            self._stats["lease_failures"] += 1
+        finally:
+            self._stats["active_leases"] -= 1
+
+    async def _serve_task(self, request: dict, writer: asyncio.StreamWriter):
+        self._stats["tasks"] += 1
+        handler = self.handlers.get(request.get("type"))
+        if handler is None:
+            await _send(writer, {"error": f"Неизвестный тип задачи: {request.get('type')}"})
+            return
+        params = request.get("params") or {}
+        current_endpoint.set(f"broker:{request.get('type')}")
+        background_lease.set(bool(request.get("background")))
+        # Одинаковые задачи от разных воркеров API выполняются один раз
+        key = make_key("broker-task", type=request.get("type"), params=json.dumps(params, sort_keys=True))
+        try:
+            result = await scrape_flight.do(key, lambda: handler(self.pool, params))
+        except Exception as e:
+            self._stats["task_failures"] += 1
+            await _send(writer, {"error": str(e)})
+            return
+        await _send(writer, {"result": result})
+
+    def get_stats(self):
+        return {**self._stats, "pool": self.pool.get_stats()}
+
+
+class _AttachedRemote(webdriver.Remote):
+    """webdriver.Remote, подключенный к уже созданной брокером сессии вместо создания новой"""
+
+    def __init__(self, command_executor: Union[str, RemoteConnection], session_id: str):
+        self._attach_session_id = session_id
+        super().__init__(command_executor=command_executor, options=Options())
+
+    def start_session(self, capabilities, *args, **kwargs):
+        self.session_id = self._attach_session_id
+        self.caps = {}
+
+
+class DriverBrokerClient:
+    """
+    Пул драйверов воркера API поверх брокера — тот же интерфейс, что у AsyncDriverPool
+    (get_driver, is_parked_on, get_stats, get_readiness), но сессии живут в процессе брокера
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or DRIVER_BROKER_SOCKET
+        # Размер пула брокера; до первого ответа брокера — из тех же переменных окружения
+        self.pool_size = int(os.getenv("DRIVER_POOL_SIZE", "2"))
+        self.max_size = max(int(os.getenv("DRIVER_POOL_MAX") or self.pool_size), self.pool_size)
+        self.page_load_strategy = os.getenv("DRIVER_PAGE_LOAD_STRATEGY", "normal")
+        self.status_interval = float(os.getenv("DRIVER_BROKER_STATUS_INTERVAL", "5"))
+        self._parked: Dict[int, Optional[str]] = {}
+        self._blocked_urls: List[str] = []
+        # HTTP-соединение (пул keep-alive) на каждый узел selenium — общее для всех аренд
+        self._connections: Dict[str, RemoteConnection] = {}
+        self._connections_lock = threading.Lock()
+        self._broker_status: dict = {}
+        self._status_task: Optional[asyncio.Task] = None
+        self._stats = {"leases": 0, "lease_errors": 0, "tasks": 0, "wait_total": 0.0, "wait_max": 0.0}
+
+    async def initialize(self):
+        if self._status_task is None:
+            self._status_task = asyncio.create_task(self._status_loop())
+
+    async def _connect(self):
+        return await asyncio.open_unix_connection(self.path, limit=_STREAM_LIMIT)
+
+    def _attach(self, executor_url: str, session_id: str) -> _AttachedRemote:
+        """Драйвер для сессии брокера; соединение с узлом переиспользуется, а не создается на каждую аренду"""
+        with self._connections_lock:
+            connection = self._connections.get(executor_url)
+            if connection is None:
+                driver = _AttachedRemote(executor_url, session_id)
+                self._connections[executor_url] = driver.command_executor
+                return driver
+        return _AttachedRemote(connection, session_id)
+
+    @asynccontextmanager
+    async def get_driver(self, clean: Optional[str] = None):
+        started = time.monotonic()
+        try:
+            reader, writer = await self._connect()
+            await _send(writer, {"op": "lease", "clean": clean, "background": background_lease.get()})
+            lease = await _receive(reader)
+            if lease is None or "error" in lease:
+                raise RuntimeError(f"Брокер не выдал драйвер: {(lease or {}).get('error', 'соединение закрыто')}")
+        except Exception:
+            self._stats["lease_errors"] += 1
+            raise
+        waited = time.monotonic() - started
+        pool_acquire_seconds.observe(waited, endpoint=current_endpoint.get())
+        self._stats["leases"] += 1
+        self._stats["wait_total"] += waited
+        self._stats["wait_max"] = max(self._stats["wait_max"], waited)
+        self._blocked_urls = lease.get("blocked_urls") or []
+
+        driver = None
+        failed = False
+        try:
+            driver = instrument_driver(
+                await driver_executor.run(self._attach, lease["executor_url"], lease["session_id"])
+            )
+            self._parked[id(driver)] = lease.get("parked_url")
+            yield driver
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._parked.pop(id(driver), None)
+            try:
+                await _send(writer, {"op": "release", "failed": failed})
+            except ConnectionError:
+                pass
+            writer.close()
+
+    def is_parked_on(self, driver, url: str) -> bool:
+        return self._parked.get(id(driver)) == url
+
+    def is_saturated(self) -> bool:
+        """По последнему статусу брокера (обновляется раз в status_interval)"""
+        pool_stats = (self._broker_status.get("stats") or {}).get("pool")
+        if not pool_stats:
+            return True
+        return pool_stats.get("waiting", 0) > 0 or pool_stats.get("in_use", 0) >= pool_stats.get("pool_size", 0)
+
+    async def _run(self, func, *args):
+        return await driver_executor.run(func, *args)
+
+    def apply_resource_blocking(self, driver):
+        """Блокировка ресурсов в новой вкладке — с шаблонами, полученными от брокера"""
+        from app.dependencies import _execute_cdp
+
+        if not self._blocked_urls:
+            return
+        try:
+            _execute_cdp(driver, "Network.enable", {})
+            _execute_cdp(driver, "Network.setBlockedURLs", {"urls": self._blocked_urls})
+        except Exception as e:
+            print(f"⚠️ Не удалось включить блокировку ресурсов через CDP: {e}")
+
+    async def submit(self, job_type: str, params: dict = None):
+        """Выполняет задачу парсинга в процессе брокера (на его пуле, с его объединением запросов)"""
+        self._stats["tasks"] += 1
+        reader, writer = await self._connect()
+        try:
+            await _send(writer, {"op": "task", "type": job_type, "params": params or {},
+                                 "background": background_lease.get()})
+            response = await _receive(reader)
+        finally:
+            writer.close()
+        if response is None:
+            raise RuntimeError("Брокер закрыл соединение, не вернув результат")
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response["result"]
+
+    async def fetch_status(self) -> dict:
+        reader, writer = await self._connect()
+        try:
+            await _send(writer, {"op": "status"})
+            return await _receive(reader) or {}
+        finally:
+            writer.close()
+
+    async def _status_loop(self):
+        """Периодически забирает у брокера статистику и готовность — get_stats/get_readiness синхронные"""
+        while True:
+            try:
+                self._broker_status = await self.fetch_status()
+                pool_stats = self._broker_status.get("stats", {}).get("pool", {})
+                self.pool_size = pool_stats.get("pool_size", self.pool_size)
+                self.max_size = pool_stats.get("max_size", self.max_size)
+            except (OSError, ValueError) as e:
+                self._broker_status = {"error": str(e)}
+            await asyncio.sleep(self.status_interval)
+
+    async def close_all(self):
+        if self._status_task is not None:
+            self._status_task.cancel()
+            try:
+                await self._status_task
+            except asyncio.CancelledError:
+                pass
+            self._status_task = None
+        with self._connections_lock:
+            connections, self._connections = list(self._connections.values()), {}
+        for connection in connections:
+            connection.close()
+
+    def get_readiness(self) -> dict:
+        readiness = self._broker_status.get("readiness")
+        if readiness is None:
+            return {"ready": False, "broker": self.path, "error": self._broker_status.get("error")}
+        return {**readiness, "broker": self.path}
+
+    def get_stats(self):
+        leases = self._stats["leases"]
+        return {
+            "mode": "broker-client",
+            "broker": self.path,
+            "leases": leases,
+            "lease_errors": self._stats["lease_errors"],
+            "tasks": self._stats["tasks"],
+            "wait_avg_ms": round(self._stats["wait_total"] / leases * 1000, 2) if leases else 0.0,
+            "wait_max_ms": round(self._stats["wait_max"] * 1000, 2),
+            "broker_stats": self._broker_status.get("stats"),
+        }
+
+
+async def main():
+    from app.dependencies import AsyncDriverPool
+    from app.executors import shutdown_executors
+    from app.fetcher import http_fetcher
+
+    pool = AsyncDriverPool()
+    server = DriverBrokerServer(pool)
+    stopping = asyncio.Event()
+
+    loop = asyncio.get_event_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    await pool.initialize()
+    await server.start()
+    try:
+        await stopping.wait()
+    finally:
+        await server.stop()
+        await pool.close_all()
+        await http_fetcher.close()
+        shutdown_executors()
+        print("🛑 Брокер драйверов остановлен")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,228 @@
+import os
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# (время сохранения, значение)
+CacheEntry = Tuple[float, Any]
+
+
+def make_key(endpoint: str, **params) -> str:
+    """Ключ кэша из имени эндпоинта и параметров, влияющих на результат"""
+    parts = [f"{name}={params[name]}" for name in sorted(params) if params[name] is not None]
+    return ":".join([endpoint] + parts)
+
+
+class RedisCacheBackend:
+    """
+    Общий backend кэша в Redis — чтобы все воркеры uvicorn/gunicorn видели одни и те же записи
+    """
+
+    def __init__(self, url: str, prefix: str = "parsergz:cache:"):
+        import redis.asyncio as redis  # опциональная зависимость
+
+        self._redis = redis.from_url(url)
+        self._prefix = prefix
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        raw = await self._redis.get(self._prefix + key)
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        return data["stored_at"], data["value"]
+
+    async def set(self, key: str, entry: CacheEntry, expire: float):
+        stored_at, value = entry
+        payload = json.dumps({"stored_at": stored_at, "value": value}, ensure_ascii=False)
+        await self._redis.set(self._prefix + key, payload, ex=max(1, int(expire)))
+
+    async def delete(self, key: str):
+        await self._redis.delete(self._prefix + key)
+
+    async def try_lock(self, key: str, expire: float) -> bool:
+        """Блокировка на фоновое обновление, общая для всех воркеров"""
+        return bool(await self._redis.set(self._prefix + "lock:" + key, "1", nx=True, ex=max(1, int(expire))))
+
+    async def unlock(self, key: str):
+        await self._redis.delete(self._prefix + "lock:" + key)
+
+    async def close(self):
+        await self._redis.close()
+
+
+class ResultCache:
+    """
+    TTL-кэш результатов парсинга: LRU в памяти процесса с вытеснением по размеру
+    и stale-while-revalidate — устаревшая запись отдается сразу, а обновление идет в фоне
+    """
+
+    def __init__(self, ttl: float = None, stale_ttl: float = None, max_entries: int = None,
+                 max_bytes: int = None, backend=None):
+        self.ttl = ttl if ttl is not None else float(os.getenv("CACHE_TTL", "3600"))
+        # Сколько времени после ttl еще можно отдавать устаревшую запись
+        self.stale_ttl = stale_ttl if stale_ttl is not None else float(os.getenv("CACHE_STALE_TTL", "86400"))
+        self.max_entries = max_entries or int(os.getenv("CACHE_MAX_ENTRIES", "128"))
+        self.max_bytes = max_bytes or int(os.getenv("CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+        self.backend = backend
+
+        self._entries: "OrderedDict[str, Tuple[CacheEntry, int]]" = OrderedDict()
+        self._bytes = 0
+        self._refresh_tasks: Dict[str, asyncio.Task] = {}
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0, "evictions": 0}
+
+    # ---------- локальный LRU ----------
+
+    def _local_get(self, key: str) -> Optional[CacheEntry]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        self._entries.move_to_end(key)
+        return item[0]
+
+    def _local_set(self, key: str, entry: CacheEntry):
+        size = len(json.dumps(entry[1], ensure_ascii=False, default=str).encode("utf-8"))
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        if size > self.max_bytes:
+            # Запись больше всего кэша — не храним ее локально
+            return
+        self._entries[key] = (entry, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self._stats["evictions"] += 1
+
+    async def _store(self, key: str, value: Any) -> CacheEntry:
+        entry = (time.time(), value)
+        self._local_set(key, entry)
+        if self.backend is not None:
+            try:
+                await self.backend.set(key, entry, self.ttl + self.stale_ttl)
+            except Exception as e:
+                print(f"⚠️ Ошибка записи в общий кэш: {e}")
+        return entry
+
+    async def _lookup(self, key: str) -> Optional[CacheEntry]:
+        entry = self._local_get(key)
+        if self.backend is not None:
+            try:
+                shared = await self.backend.get(key)
+            except Exception as e:
+                print(f"⚠️ Ошибка чтения общего кэша: {e}")
+                shared = None
+            # Другой воркер мог обновить запись — берем более свежую
+            if shared is not None and (entry is None or shared[0] > entry[0]):
+                self._local_set(key, shared)
+                entry = shared
+        return entry
+
+    # ---------- публичный интерфейс ----------
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Значение из кэша или результат loader(), если записи нет или она слишком старая"""
+        entry = await self._lookup(key)
+        if entry is not None:
+            age = time.time() - entry[0]
+            if age < self.ttl:
+                self._stats["hits"] += 1
+                return entry[1]
+            if age < self.ttl + self.stale_ttl:
+                self._stats["stale_hits"] += 1
+                self._schedule_refresh(key, loader)
+                return entry[1]
+
+        self._stats["misses"] += 1
+        value = await loader()
+        await self._store(key, value)
+        return value
+
+    def _schedule_refresh(self, key: str, loader: Callable[[], Awaitable[Any]]):
+        """Запускает не более одного фонового обновления на ключ"""
+        task = self._refresh_tasks.get(key)
+        if task is not None and not task.done():
+            return
+        self._refresh_tasks[key] = asyncio.create_task(self._refresh(key, loader))
+
+    async def refresh(self, key: str, loader: Callable[[], Awaitable[Any]]) -> bool:
+        """Обновление записи заранее (планировщик); если фоновое обновление ключа уже идет — ждем его"""
+        task = self._refresh_tasks.get(key)
+        if task is None or task.done():
+            task = self._refresh_tasks[key] = asyncio.create_task(self._refresh(key, loader))
+        return await asyncio.shield(task)
+
+    async def set(self, key: str, value: Any):
+        await self._store(key, value)
+
+    async def _refresh(self, key: str, loader: Callable[[], Awaitable[Any]]) -> bool:
+        locked = False
+        try:
+            if self.backend is not None:
+                locked = await self.backend.try_lock(key, self.ttl)
+                if not locked:
+                    # Обновление уже идет в другом воркере — для планировщика это успех
+                    return True
+            await self._store(key, await loader())
+            self._stats["refreshes"] += 1
+            return True
+        except Exception as e:
+            self._stats["refresh_errors"] += 1
+            print(f"⚠️ Ошибка фонового обновления кэша {key}: {e}")
+            return False
+        finally:
+            if locked:
+                try:
+                    await self.backend.unlock(key)
+                except Exception:
+                    pass
+            self._refresh_tasks.pop(key, None)
+
+    async def invalidate(self, key: Optional[str] = None):
+        """Удаляет одну запись или весь локальный кэш"""
+        if key is None:
+            self._entries.clear()
+            self._bytes = 0
+            return
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self._bytes -= item[1]
+        if self.backend is not None:
+            await self.backend.delete(key)
+
+    async def close(self):
+        for task in list(self._refresh_tasks.values()):
+            task.cancel()
+        self._refresh_tasks.clear()
+        if self.backend is not None:
+            await self.backend.close()
+
+    def get_stats(self):
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "shared_backend": self.backend is not None,
+        }
+
+
+def _create_backend():
+    redis_url = os.getenv("CACHE_REDIS_URL")
+    if not redis_url:
+        return None
+    try:
+        return RedisCacheBackend(redis_url)
+    except ImportError:
+        print("⚠️ CACHE_REDIS_URL задан, но пакет redis не установлен — используется только локальный кэш")
+        return None
+
+
+# Глобальный экземпляр кэша
+result_cache = ResultCache(backend=_create_backend())
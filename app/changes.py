@@ -0,0 +1,97 @@
+"""
+Инкрементальное обновление районов: отпечаток списка поликлиник района, компактный diff
+и лента изменений. Сами записи ленты хранятся в БД (таблица district_changes),
+здесь — уведомления для long-poll и выбор районов, которые пора перепроверить
+"""
+import os
+import time
+import asyncio
+import hashlib
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Район без изменений все равно перепроверяется не реже, чем раз в столько секунд (режим selenium)
+DISTRICT_REFRESH_MAX_AGE = float(os.getenv("DISTRICT_REFRESH_MAX_AGE", "86400"))
+# Сколько устаревших районов перепроверять за одно обновление (0 — без ограничения)
+DISTRICT_REFRESH_BATCH = int(os.getenv("DISTRICT_REFRESH_BATCH", "0"))
+
+
+def fingerprint(clinics: List[str]) -> str:
+    """Отпечаток списка поликлиник района (с учетом порядка)"""
+    return hashlib.sha256("\n".join(clinics).encode("utf-8")).hexdigest()
+
+
+def diff_clinics(old: List[str], new: List[str]) -> Dict[str, List[str]]:
+    """Добавленные и удаленные поликлиники в порядке списков"""
+    old_set, new_set = set(old), set(new)
+    return {
+        "added": [clinic for clinic in dict.fromkeys(new) if clinic not in old_set],
+        "removed": [clinic for clinic in dict.fromkeys(old) if clinic not in new_set],
+    }
+
+
+def pick_stale(names: List[str], known: Dict[str, dict], max_age: float = None,
+               limit: int = None) -> List[str]:
+    """
+    Районы, которые нужно открыть заново: новые и без отпечатка — всегда,
+    остальные — самые давно проверенные старше max_age, не больше limit за раз
+    """
+    max_age = DISTRICT_REFRESH_MAX_AGE if max_age is None else max_age
+    limit = DISTRICT_REFRESH_BATCH if limit is None else limit
+    now = time.time()
+    unknown = [name for name in names if not (known.get(name) or {}).get("fingerprint")]
+    skip = set(unknown)
+    stale = sorted(
+        (name for name in names if name not in skip and now - (known[name]["updated_at"] or 0) >= max_age),
+        key=lambda name: known[name]["updated_at"] or 0,
+    )
+    return unknown + (stale[:limit] if limit else stale)
+
+
+class ChangeFeed:
+    """
+    Уведомления о новых записях ленты изменений. Записи, сохраненные другим процессом
+    (брокер, воркер Kafka), long-poll замечает по опросу БД раз в poll_interval
+    """
+
+    def __init__(self, poll_interval: float = None):
+        self.poll_interval = poll_interval or float(os.getenv("CHANGE_FEED_POLL_INTERVAL", "5"))
+        self.last_id = 0
+        self._event: Optional[asyncio.Event] = None
+        self._stats = {"published": 0}
+
+    def publish(self, changes: List[dict]):
+        if not changes:
+            return
+        self.last_id = max(self.last_id, max(change["id"] for change in changes))
+        self._stats["published"] += len(changes)
+        event, self._event = self._event, None
+        if event is not None:
+            event.set()
+
+    async def wait(self, load: Callable[[], Awaitable[List[dict]]], timeout: float) -> List[dict]:
+        """Long-poll: результат load(), как только он не пустой, но не дольше timeout секунд"""
+        deadline = time.monotonic() + timeout
+        while True:
+            # Событие берем до чтения, чтобы не пропустить publish() во время запроса к БД
+            if self._event is None:
+                self._event = asyncio.Event()
+            event = self._event
+            changes = await load()
+            remaining = deadline - time.monotonic()
+            if changes or remaining <= 0:
+                return changes
+            try:
+                await asyncio.wait_for(event.wait(), min(remaining, self.poll_interval))
+            except asyncio.TimeoutError:
+                pass
+
+    def get_stats(self):
+        return {**self._stats, "last_id": self.last_id}
+
+
+# Глобальная лента изменений
+change_feed = ChangeFeed()
@@ -0,0 +1,448 @@
+"""
+Глубокий обход свободных талонов: район -> поликлиника -> специальность -> врач -> талоны.
+
+Задачи лежат в приоритетной очереди (frontier): более глубокие уровни идут первыми, поэтому ветки
+дообходятся до конца и очередь не разрастается. Запросы к одному хосту ограничены по параллельности
+и минимальному интервалу, сетевые ошибки повторяются с экспоненциальной задержкой.
+Запросы идут в JSON API напрямую (http) или через fetch() внутри страницы драйвера из пула (selenium).
+Результат — компактный индекс в памяти (SlotIndex) с поиском по поликлинике и специальности
+"""
+import os
+import sys
+import json
+import time
+import heapq
+import random
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+from dotenv import load_dotenv
+
+from app.executors import scrape_executor
+from app.fetcher import FetchSchemaError, GorzdravHttpFetcher, http_fetcher
+from app.scheduler import background_lease
+from app.scraper import SCHEDULE_URL
+
+load_dotenv()
+
+CRAWL_ENGINE = os.getenv("CRAWL_ENGINE", "auto").lower()
+CRAWL_ENGINES = ("auto", "http", "selenium")
+
+# Порядок обработки: меньше — раньше
+TASK_PRIORITIES = {"appointments": 0, "doctors": 1, "specialties": 2, "lpus": 3, "districts": 4}
+
+# Запрос к API из контекста страницы: cookie и заголовки как у обычного посетителя сайта.
+# Аргументы: URL, callback
+FETCH_JSON_JS = """
+const [url, done] = arguments;
+fetch(url, {headers: {Accept: 'application/json'}, credentials: 'same-origin'})
+    .then((response) => response.text().then((body) => done({status: response.status, body})))
+    .catch((e) => done({status: 0, error: String(e)}));
+"""
+
+
+class CrawlRequestError(Exception):
+    """Ошибка запроса через браузер; status — HTTP-код ответа (0 — запрос не дошел)"""
+
+    def __init__(self, message: str, status: int = 0):
+        super().__init__(message)
+        self.status = status
+
+
+class BrowserApiFetcher(GorzdravHttpFetcher):
+    """Тот же API, но запросы выполняет fetch() в странице драйвера из пула — если прямой HTTP заблокирован"""
+
+    def __init__(self, pool, base_url: str = None):
+        super().__init__(base_url=base_url)
+        self.pool = pool
+
+    async def _request(self, path: str, etag: Optional[str] = None) -> Tuple[Optional[list], Optional[str]]:
+        # warm: без очистки cookie и about:blank — страница сайта остается открытой между запросами,
+        # и следующий fetch() идет без перезагрузки (полную очистку сделает следующая обычная аренда)
+        async with self.pool.get_driver(clean="warm") as driver:
+            response = await scrape_executor.run(
+                self._browser_get, driver, self.base_url + path, self.pool.is_parked_on(driver, SCHEDULE_URL)
+            )
+        if response.get("status") != 200:
+            raise CrawlRequestError(f"{path}: {response.get('error') or response.get('status')}",
+                                    response.get("status") or 0)
+        try:
+            data = json.loads(response.get("body") or "")
+        except ValueError as e:
+            raise FetchSchemaError(f"{path}: ответ не является JSON") from e
+        # Условных запросов через браузер нет: ETag не читаем, 304 не ждем
+        return self._check_envelope(path, data), None
+
+    @staticmethod
+    def _browser_get(driver, url: str, page_ready: bool) -> dict:
+        # fetch() из чужого origin упрется в CORS — страницу сайта открываем, только если драйвер не на нем
+        if not page_ready and urlsplit(driver.current_url).netloc != urlsplit(url).netloc:
+            driver.get(SCHEDULE_URL)
+        return driver.execute_async_script(FETCH_JSON_JS, url)
+
+    async def close(self):
+        pass
+
+
+class HostLimiter:
+    """Вежливость: не больше concurrency одновременных запросов к хосту и не чаще одного раза в delay секунд"""
+
+    def __init__(self, concurrency: int, delay: float):
+        self.concurrency = concurrency
+        self.delay = delay
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._next_at: Dict[str, float] = {}
+
+    @asynccontextmanager
+    async def slot(self, host: str):
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._semaphores[host] = asyncio.Semaphore(self.concurrency)
+        async with semaphore:
+            # Время запроса резервируется сразу, поэтому ожидающие выстраиваются с шагом delay
+            now = time.monotonic()
+            start_at = max(now, self._next_at.get(host, 0.0))
+            self._next_at[host] = start_at + self.delay
+            if start_at > now:
+                await asyncio.sleep(start_at - now)
+            yield
+
+
+class CrawlTask:
+    __slots__ = ("kind", "params", "attempt")
+
+    def __init__(self, kind: str, params: dict, attempt: int = 0):
+        self.kind = kind
+        self.params = params
+        self.attempt = attempt
+
+
+class Frontier:
+    """
+    Приоритетная очередь задач обхода. Отложенные задачи (повторы) лежат отдельно до своего времени.
+    pop() возвращает None, когда очередь пуста и ни одна взятая задача не может добавить новых
+    """
+
+    def __init__(self):
+        self._ready: List[Tuple[int, int, CrawlTask]] = []
+        self._delayed: List[Tuple[float, int, CrawlTask]] = []
+        self._seq = itertools.count()
+        self._unfinished = 0
+        self._changed = asyncio.Condition()
+
+    def __len__(self):
+        return len(self._ready) + len(self._delayed)
+
+    async def push(self, task: CrawlTask, delay: float = 0.0):
+        if delay > 0:
+            heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._seq), task))
+        else:
+            heapq.heappush(self._ready, (TASK_PRIORITIES[task.kind], next(self._seq), task))
+        self._unfinished += 1
+        async with self._changed:
+            self._changed.notify()
+
+    async def pop(self) -> Optional[CrawlTask]:
+        async with self._changed:
+            while True:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, seq, task = heapq.heappop(self._delayed)
+                    heapq.heappush(self._ready, (TASK_PRIORITIES[task.kind], seq, task))
+                if self._ready:
+                    return heapq.heappop(self._ready)[2]
+                if not self._unfinished:
+                    return None
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def task_done(self):
+        self._unfinished -= 1
+        async with self._changed:
+            self._changed.notify_all()
+
+
+# (время приема, id талона)
+Slot = Tuple[str, str]
+# (id поликлиники, id врача)
+DoctorKey = Tuple[str, str]
+
+
+class SlotIndex:
+    """
+    Свободные талоны в памяти: кортежи талонов по врачу и обратные индексы
+    по поликлинике, специальности и району. Строки интернируются — названия повторяются тысячи раз
+    """
+
+    def __init__(self):
+        self._slots: Dict[DoctorKey, Tuple[Slot, ...]] = {}
+        self._doctors: Dict[DoctorKey, dict] = {}
+        self._by_clinic: Dict[str, Set[DoctorKey]] = {}
+        self._by_specialty: Dict[str, Set[DoctorKey]] = {}
+        self._by_district: Dict[str, Set[DoctorKey]] = {}
+        self.updated_at: Optional[float] = None
+
+    @staticmethod
+    def _text(value) -> str:
+        return sys.intern(str(value or ""))
+
+    def put(self, meta: dict, slots: List[Slot], generation: int):
+        key = (self._text(meta["lpu_id"]), self._text(meta["doctor_id"]))
+        self._drop(key)
+        doctor = {name: self._text(value) for name, value in meta.items()}
+        doctor["generation"] = generation
+        self._doctors[key] = doctor
+        self._slots[key] = tuple(sorted((self._text(start), self._text(slot_id)) for start, slot_id in slots))
+        self._by_clinic.setdefault(doctor["lpu_id"], set()).add(key)
+        self._by_clinic.setdefault(doctor["clinic"].lower(), set()).add(key)
+        self._by_specialty.setdefault(doctor["specialty"].lower(), set()).add(key)
+        self._by_district.setdefault(doctor["district"].lower(), set()).add(key)
+        self.updated_at = time.time()
+
+    def _drop(self, key: DoctorKey):
+        doctor = self._doctors.pop(key, None)
+        self._slots.pop(key, None)
+        if doctor is None:
+            return
+        for index, value in ((self._by_clinic, doctor["lpu_id"]), (self._by_clinic, doctor["clinic"].lower()),
+                             (self._by_specialty, doctor["specialty"].lower()),
+                             (self._by_district, doctor["district"].lower())):
+            keys = index.get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[value]
+
+    def prune(self, generation: int, districts: Optional[Set[str]] = None) -> int:
+        """Удаляет врачей, не встретившихся в обходе generation (только в районах districts, если заданы)"""
+        stale = [key for key, doctor in self._doctors.items()
+                 if doctor["generation"] < generation and (districts is None or doctor["district_id"] in districts)]
+        for key in stale:
+            self._drop(key)
+        return len(stale)
+
+    def query(self, clinic: Optional[str] = None, specialty: Optional[str] = None,
+              district: Optional[str] = None, with_slots_only: bool = True, limit: int = 100) -> List[dict]:
+        """Врачи с талонами; clinic — id или название поликлиники, specialty и district — названия"""
+        keys: Optional[Set[DoctorKey]] = None
+        for index, value in ((self._by_clinic, clinic), (self._by_specialty, specialty),
+                             (self._by_district, district)):
+            if value is None:
+                continue
+            found = index.get(value.lower(), set()) | index.get(value, set())
+            keys = found if keys is None else keys & found
+        if keys is None:
+            keys = set(self._doctors)
+
+        doctors = []
+        for key in keys:
+            slots = self._slots[key]
+            if with_slots_only and not slots:
+                continue
+            doctor = {name: value for name, value in self._doctors[key].items() if name != "generation"}
+            doctor["slots"] = [{"id": slot_id, "visit_start": start} for start, slot_id in slots]
+            doctors.append(doctor)
+        # Сначала врачи с ближайшим талоном, врачи без талонов — в конце
+        doctors.sort(key=lambda doctor: (not doctor["slots"], doctor["slots"][0]["visit_start"] if doctor["slots"] else ""))
+        return doctors[:limit]
+
+    def get_stats(self):
+        return {
+            "doctors": len(self._doctors),
+            "slots": sum(len(slots) for slots in self._slots.values()),
+            "clinics": len({key[0] for key in self._doctors}),
+            "specialties": len(self._by_specialty),
+            "updated_at": self.updated_at,
+        }
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, FetchSchemaError):
+        return False
+    status = getattr(error, "status", None)
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+    # 4xx — ошибка запроса, повтор не поможет; кроме 429 (слишком часто) и 408
+    return not status or status >= 500 or status in (408, 429)
+
+
+class SlotCrawler:
+    """Обход талонов поверх пула драйверов или HTTP-клиента; одновременно выполняется один обход"""
+
+    def __init__(self, index: SlotIndex, concurrency: int = None, retries: int = None, backoff: float = None,
+                 host_concurrency: int = None, host_delay: float = None):
+        self.index = index
+        self.concurrency = concurrency or int(os.getenv("CRAWL_CONCURRENCY", "8"))
+        self.retries = retries if retries is not None else int(os.getenv("CRAWL_RETRIES", "3"))
+        self.backoff = backoff or float(os.getenv("CRAWL_BACKOFF", "1.0"))
+        self.limiter = HostLimiter(
+            host_concurrency or int(os.getenv("CRAWL_HOST_CONCURRENCY", "4")),
+            host_delay if host_delay is not None else float(os.getenv("CRAWL_HOST_DELAY", "0.2")),
+        )
+        self.generation = 0
+        self.frontier: Optional[Frontier] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stats: Dict[str, int] = {}
+        self._last: Optional[dict] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, pool, engine: Optional[str] = None, districts: Optional[List[str]] = None) -> bool:
+        """Запускает обход в фоне; False, если обход уже идет"""
+        if self.running:
+            return False
+        self._task = asyncio.create_task(self._run(pool, engine, districts))
+        return True
+
+    async def wait(self):
+        """Дожидается текущего обхода, если он идет"""
+        if self.running:
+            await asyncio.shield(self._task)
+
+    async def _run(self, pool, engine: Optional[str], districts: Optional[List[str]]):
+        # Обход не срочный: в режиме selenium его аренды уступают драйверы запросам пользователей
+        background_lease.set(True)
+        try:
+            await self.crawl(await self._select_fetcher(pool, engine), districts)
+        except Exception as e:
+            print(f"❌ Обход талонов завершился ошибкой: {e}")
+            self._last = {"error": str(e), "finished_at": time.time()}
+
+    async def _select_fetcher(self, pool, engine: Optional[str]):
+        engine = (engine or CRAWL_ENGINE).lower()
+        if engine not in CRAWL_ENGINES:
+            raise ValueError(f"Неизвестный engine: {engine}")
+        if engine == "selenium":
+            return BrowserApiFetcher(pool)
+        if engine == "auto":
+            try:
+                await http_fetcher.fetch_districts()
+            except Exception as e:
+                print(f"⚠️ Прямой HTTP к API недоступен, обход талонов через браузер: {e}")
+                return BrowserApiFetcher(pool)
+        return http_fetcher
+
+    async def crawl(self, fetcher, districts: Optional[List[str]] = None) -> dict:
+        """Полный обход (или только районов districts — id из /shared/districts); возвращает сводку"""
+        self.generation += 1
+        generation = self.generation
+        host = urlsplit(fetcher.base_url).netloc
+        self.frontier = frontier = Frontier()
+        self._stats = {"requests": 0, "retries": 0, "failed": 0, "doctors": 0, "slots": 0}
+        started = time.monotonic()
+
+        only = set(map(str, districts)) if districts else None
+        await frontier.push(CrawlTask("districts", {"only": only}))
+
+        async def worker():
+            while True:
+                task = await frontier.pop()
+                if task is None:
+                    return
+                try:
+                    await self._execute(fetcher, host, frontier, task, generation)
+                finally:
+                    await frontier.task_done()
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+
+        # Если часть веток не удалась, старые данные по ним лучше устаревших талонов, чем их отсутствие
+        pruned = self.index.prune(generation, only) if not self._stats["failed"] else 0
+        self._last = {**self._stats, "pruned": pruned, "seconds": round(time.monotonic() - started, 2),
+                      "finished_at": time.time()}
+        print(f"🩺 Обход талонов: врачей {self._stats['doctors']}, талонов {self._stats['slots']}, "
+              f"запросов {self._stats['requests']}, ошибок {self._stats['failed']}")
+        return self._last
+
+    async def _execute(self, fetcher, host: str, frontier: Frontier, task: CrawlTask, generation: int):
+        try:
+            async with self.limiter.slot(host):
+                self._stats["requests"] += 1
+                result = await self._fetch(fetcher, task)
+        except Exception as e:
+            if _is_retryable(e) and task.attempt < self.retries:
+                self._stats["retries"] += 1
+                delay = self.backoff * 2 ** task.attempt * (0.5 + random.random())
+                await frontier.push(CrawlTask(task.kind, task.params, task.attempt + 1), delay)
+            else:
+                self._stats["failed"] += 1
+                print(f"⚠️ Обход талонов: {task.kind} {task.params} не удался: {e}")
+            return
+        await self._expand(frontier, task, result, generation)
+
+    @staticmethod
+    async def _fetch(fetcher, task: CrawlTask) -> List[dict]:
+        params = task.params
+        if task.kind == "districts":
+            return await fetcher.fetch_districts()
+        if task.kind == "lpus":
+            return await fetcher.fetch_lpus(params["district_id"])
+        if task.kind == "specialties":
+            return await fetcher.fetch_specialties(params["lpu_id"])
+        if task.kind == "doctors":
+            return await fetcher.fetch_doctors(params["lpu_id"], params["specialty_id"])
+        return await fetcher.fetch_appointments(params["lpu_id"], params["doctor_id"])
+
+    async def _expand(self, frontier: Frontier, task: CrawlTask, items: List[dict], generation: int):
+        """Дочерние задачи для следующего уровня; на уровне врачей — запись в индекс"""
+        params = task.params
+        for item in items:
+            if task.kind == "districts":
+                if params["only"] is None or str(item["id"]) in params["only"]:
+                    await frontier.push(CrawlTask("lpus", {"district_id": str(item["id"]), "district": item["name"]}))
+            elif task.kind == "lpus":
+                await frontier.push(CrawlTask("specialties", {
+                    **params, "lpu_id": str(item["id"]),
+                    "clinic": item.get("lpuFullName") or item.get("lpuShortName") or "",
+                }))
+            elif task.kind == "specialties":
+                # Специальности без свободных талонов дальше не открываем
+                if item.get("countFreeTicket") == 0:
+                    continue
+                await frontier.push(CrawlTask("doctors", {
+                    **params, "specialty_id": str(item["id"]), "specialty": item.get("name") or "",
+                }))
+            elif task.kind == "doctors":
+                doctor = {**params, "doctor_id": str(item["id"]), "doctor": item.get("name") or ""}
+                if item.get("freeTicketCount") == 0:
+                    self._put(doctor, [], generation)
+                else:
+                    await frontier.push(CrawlTask("appointments", doctor))
+        if task.kind == "appointments":
+            self._put(params, [(item.get("visitStart") or "", item["id"]) for item in items], generation)
+
+    def _put(self, doctor: dict, slots: List[Slot], generation: int):
+        meta = {name: doctor.get(name, "") for name in
+                ("district_id", "district", "lpu_id", "clinic", "specialty_id", "specialty", "doctor_id", "doctor")}
+        self.index.put(meta, slots, generation)
+        self._stats["doctors"] += 1
+        self._stats["slots"] += len(slots)
+
+    async def stop(self):
+        if self.running:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def get_stats(self):
+        return {
+            "running": self.running,
+            "generation": self.generation,
+            "frontier": len(self.frontier) if self.running and self.frontier is not None else 0,
+            "current": dict(self._stats) if self.running else None,
+            "last": self._last,
+            "index": self.index.get_stats(),
+        }
+
+
+# Глобальный индекс талонов и обходчик
+slot_index = SlotIndex()
+slot_crawler = SlotCrawler(slot_index)
@@ -1,19 +1,229 @@
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app import models, schemas
-from passlib.context import CryptContext
+from app.changes import diff_clinics, fingerprint
+from app.db import SessionLocal
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Размер пачки для INSERT ... ON CONFLICT
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "500"))
 
-def get_user_by_email(db: Session, email: str):
-    return db.query(models.User).filter(models.User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(models.User).where(models.User.email == email))
+    return result.scalars().first()
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.User).offset(skip).limit(limit).all()
+async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100):
+    result = await db.execute(select(models.User).order_by(models.User.id).offset(skip).limit(limit))
+    return result.scalars().all()
 
-def create_user(db: Session, user_in: schemas.UserCreate):
-    hashed = pwd_context.hash(user_in.password)
-    db_user = models.User(email=user_in.email, full_name=user_in.full_name, hashed_password=hashed)
+async def create_user(db: AsyncSession, user_in: schemas.UserCreate, hashed_password: str):
+    """hashed_password считается заранее в cpu_executor (app.security) — bcrypt не должен занимать цикл событий"""
+    db_user = models.User(email=user_in.email, full_name=user_in.full_name, hashed_password=hashed_password)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    # created_at заполняет БД
+    await db.refresh(db_user)
     return db_user
+
+
+def _batches(rows: list, size: int):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _district_clinics(db: Session, district_ids: List[int]) -> Dict[int, List[str]]:
+    clinics: Dict[int, List[str]] = {}
+    if not district_ids:
+        return clinics
+    rows = (
+        db.query(models.Clinic.district_id, models.Clinic.name)
+        .filter(models.Clinic.district_id.in_(district_ids))
+        .order_by(models.Clinic.district_id, models.Clinic.position)
+    )
+    for district_id, name in rows:
+        clinics.setdefault(district_id, []).append(name)
+    return clinics
+
+
+def _change_to_dict(change: models.DistrictChange) -> dict:
+    return {
+        "id": change.id,
+        "district": change.district,
+        "added": change.added,
+        "removed": change.removed,
+        "fingerprint": change.fingerprint,
+        "created_at": change.created_at.timestamp() if change.created_at else None,
+    }
+
+
+def save_district_info(db: Session, info: Dict[str, List[str]], batch_size: int = UPSERT_BATCH_SIZE,
+                       removed: Iterable[str] = (), touched: Iterable[str] = (),
+                       etags: Optional[Dict[str, Optional[str]]] = None) -> List[dict]:
+    """
+    Сохраняет результат парсинга пачками INSERT ... ON CONFLICT DO UPDATE и возвращает записи ленты изменений.
+    Поликлиники перезаписываются только у районов, чей отпечаток поменялся; у остальных и у touched
+    (проверены без изменений) обновляется только updated_at. Районы, которых нет в info, не трогаем,
+    кроме перечисленных в removed — они удаляются вместе с поликлиниками.
+    etags — ETag ответов API для районов из info; пишется в той же транзакции, что и отпечаток,
+    у районов без ETag сбрасывается, чтобы следующее обновление не получило 304 на чужую версию
+    """
+    etags = etags or {}
+    removed = [name for name in removed if name not in info]
+    touched = [name for name in touched if name not in info]
+    if not info and not removed and not touched:
+        return []
+    now = datetime.now(timezone.utc)
+
+    stored = {
+        name: (district_id, stored_fingerprint)
+        for district_id, name, stored_fingerprint in db.query(
+            models.District.id, models.District.name, models.District.fingerprint
+        ).filter(models.District.name.in_(list(info) + removed))
+    }
+    fingerprints = {name: fingerprint(clinics) for name, clinics in info.items()}
+    changed = [name for name in info if name not in stored or stored[name][1] != fingerprints[name]]
+    old_clinics = _district_clinics(db, [stored[name][0] for name in changed + removed if name in stored])
+
+    district_ids: Dict[str, int] = {}
+    district_rows = [
+        {"name": name, "fingerprint": fingerprints[name], "etag": etags.get(name), "updated_at": now}
+        for name in info
+    ]
+    for batch in _batches(district_rows, batch_size):
+        stmt = insert(models.District).values(batch)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[models.District.name],
+            set_={"fingerprint": stmt.excluded.fingerprint, "etag": stmt.excluded.etag,
+                  "updated_at": stmt.excluded.updated_at},
+        ).returning(models.District.id, models.District.name)
+        district_ids.update({name: district_id for district_id, name in db.execute(stmt)})
+
+    clinic_rows = [
+        {"district_id": district_ids[district], "name": clinic, "position": position, "updated_at": now}
+        for district in changed
+        for position, clinic in enumerate(dict.fromkeys(info[district]))
+    ]
+    for batch in _batches(clinic_rows, batch_size):
+        stmt = insert(models.Clinic).values(batch)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_clinics_district_id_name",
+            set_={"position": stmt.excluded.position, "updated_at": stmt.excluded.updated_at},
+        )
+        db.execute(stmt)
+
+    if changed:
+        db.query(models.Clinic).filter(
+            models.Clinic.district_id.in_([district_ids[name] for name in changed]),
+            models.Clinic.updated_at < now,
+        ).delete(synchronize_session=False)
+    if touched:
+        db.query(models.District).filter(models.District.name.in_(touched)).update(
+            {models.District.updated_at: now}, synchronize_session=False
+        )
+
+    changes = []
+    for name in changed:
+        diff = diff_clinics(old_clinics.get(stored.get(name, (None,))[0], []), info[name])
+        if diff["added"] or diff["removed"]:
+            changes.append(models.DistrictChange(district=name, fingerprint=fingerprints[name],
+                                                 created_at=now, **diff))
+    gone = [name for name in removed if name in stored]
+    for name in gone:
+        changes.append(models.DistrictChange(district=name, added=[], removed=old_clinics.get(stored[name][0], []),
+                                             fingerprint=None, created_at=now))
+    if gone:
+        # Поликлиники удалит ON DELETE CASCADE
+        db.query(models.District).filter(models.District.name.in_(gone)).delete(synchronize_session=False)
+
+    db.add_all(changes)
+    db.flush()
+    records = [_change_to_dict(change) for change in changes]
+    db.commit()
+    return records
+
+
+def store_district_info(info: Dict[str, List[str]], removed: Iterable[str] = (),
+                        touched: Iterable[str] = (), etags: Optional[Dict[str, Optional[str]]] = None) -> List[dict]:
+    """save_district_info в отдельной сессии; ошибка сохранения не должна ломать парсинг"""
+    db = SessionLocal()
+    try:
+        return save_district_info(db, info, removed=removed, touched=touched, etags=etags)
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ Не удалось сохранить районы в БД: {e}")
+        return []
+    finally:
+        db.close()
+
+
+def _district_info_query():
+    return (
+        select(models.District.name, models.Clinic.name)
+        .outerjoin(models.Clinic, models.Clinic.district_id == models.District.id)
+        .order_by(models.District.id, models.Clinic.position)
+    )
+
+
+def _rows_to_district_info(rows) -> Dict[str, List[str]]:
+    info: Dict[str, List[str]] = {}
+    for district, clinic in rows:
+        clinics = info.setdefault(district, [])
+        if clinic is not None:
+            clinics.append(clinic)
+    return info
+
+
+def get_district_info(db: Session) -> Dict[str, List[str]]:
+    """Последний сохраненный снимок районов и поликлиник"""
+    return _rows_to_district_info(db.execute(_district_info_query()))
+
+
+async def get_district_snapshot(db: AsyncSession) -> dict:
+    """Снимок районов и время последнего обновления для эндпоинта без Selenium"""
+    rows = await db.execute(_district_info_query())
+    updated_at = await db.scalar(select(func.max(models.District.updated_at)))
+    return {"district_buttons": _rows_to_district_info(rows), "updated_at": updated_at}
+
+
+def load_district_info() -> Dict[str, List[str]]:
+    db = SessionLocal()
+    try:
+        return get_district_info(db)
+    finally:
+        db.close()
+
+
+def get_district_state(db: Session) -> Dict[str, dict]:
+    """
+    Отпечаток, ETag сохраненной версии и время последней проверки каждого района — для инкрементального обновления
+    """
+    return {
+        name: {"fingerprint": stored_fingerprint, "etag": etag,
+               "updated_at": updated_at.timestamp() if updated_at else None}
+        for name, stored_fingerprint, etag, updated_at in db.query(
+            models.District.name, models.District.fingerprint, models.District.etag, models.District.updated_at
+        )
+    }
+
+
+def load_district_state() -> Dict[str, dict]:
+    db = SessionLocal()
+    try:
+        return get_district_state(db)
+    finally:
+        db.close()
+
+
+async def get_district_changes(db: AsyncSession, since_id: int = 0, limit: int = 100,
+                               district: Optional[str] = None) -> List[dict]:
+    """Записи ленты изменений после since_id по возрастанию id"""
+    query = select(models.DistrictChange).where(models.DistrictChange.id > since_id)
+    if district:
+        query = query.where(models.DistrictChange.district == district)
+    result = await db.execute(query.order_by(models.DistrictChange.id).limit(limit))
+    return [_change_to_dict(change) for change in result.scalars()]
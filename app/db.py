@@ -1,16 +1,47 @@
 import os
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
-# sync engine
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# Для async engine тот же адрес, но через asyncpg
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or str(
+    make_url(DATABASE_URL).set(drivername="postgresql+asyncpg")
+)
+
+# Размер пула соединений задаем явно: по умолчанию 5 + 10 и ожидание 30 с
+POOL_OPTIONS = {
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    "pool_pre_ping": True,
+}
+
+# sync engine: пакетное сохранение районов в потоках (db_executor), брокер, воркер, alembic.
+# Одновременных запросов не больше потоков db_executor, поэтому пул маленький
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=int(os.getenv("DB_POOL_SIZE") or os.getenv("DB_EXECUTOR_THREADS") or "4"),
+    max_overflow=int(os.getenv("DB_MAX_OVERFLOW") or "2"),
+    **POOL_OPTIONS,
+)
 
 # класс фабрики сессий
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# async engine: запросы эндпоинтов без потоков из пула
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_size=int(os.getenv("DB_ASYNC_POOL_SIZE") or "10"),
+    max_overflow=int(os.getenv("DB_ASYNC_MAX_OVERFLOW") or "10"),
+    **POOL_OPTIONS,
+)
+
+# После commit объекты не перечитываются: ответ собирается уже без обращения к БД
+AsyncSessionLocal = sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # базовый класс для моделей
 Base = declarative_base()
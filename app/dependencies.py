@@ -1,10 +1,13 @@
 import os
 import asyncio
+import fnmatch
+import threading
 import time
 from contextlib import asynccontextmanager
 from asyncio import Semaphore
-from typing import List, Optional
+from typing import Dict, List, Optional, Set
 
+import httpx
 from selenium import webdriver
 from selenium.webdriver import Chrome
 from selenium.webdriver.chrome.options import Options
@@ -12,29 +15,201 @@ from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 from dotenv import load_dotenv
 
+from app.executors import driver_executor
+from app.metrics import current_endpoint, instrument_driver, pool_acquire_seconds
+from app.scheduler import background_lease
+
 load_dotenv()
 
+# Шаблоны URL для CDP Network.setBlockedURLs (шаблон совпадает с URL целиком, поэтому * в конце — для query)
+_IMAGE_PATTERNS = ["*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.svg*", "*.ico*", "*.bmp*"]
+_FONT_PATTERNS = ["*.woff*", "*.woff2*", "*.ttf*", "*.otf*", "*.eot*"]
+_MEDIA_PATTERNS = ["*.mp4*", "*.webm*", "*.mp3*", "*.ogg*"]
+_CSS_PATTERNS = ["*.css*"]
+_TRACKER_PATTERNS = [
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*mc.yandex.ru*", "*top-fwz1.mail.ru*", "*counter.yadro.ru*", "*vk.com/rtrg*",
+]
+
+# Профили блокировки ресурсов: none — ничего не блокируем, light — картинки, шрифты, медиа и счетчики,
+# aggressive — дополнительно CSS
+BLOCK_PROFILES = {
+    "none": [],
+    "light": _IMAGE_PATTERNS + _FONT_PATTERNS + _MEDIA_PATTERNS + _TRACKER_PATTERNS,
+    "aggressive": _IMAGE_PATTERNS + _FONT_PATTERNS + _MEDIA_PATTERNS + _TRACKER_PATTERNS + _CSS_PATTERNS,
+}
+
+
+def _split_env_list(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _blocks_allowed(pattern: str, allowlist: List[str]) -> bool:
+    """
+    Заденет ли шаблон блокировки (* — любые символы) разрешенный URL или хост.
+    Хост проверяется как адрес на нем: "mc.yandex.ru" -> "https://mc.yandex.ru/"
+    """
+    for entry in allowlist:
+        url = entry if "/" in entry or "*" in entry else f"https://{entry}/"
+        if fnmatch.fnmatchcase(url, pattern):
+            return True
+    return False
+
+
+def _execute_cdp(driver, cmd: str, params: dict):
+    """CDP-команда для локального Chrome и для webdriver.Remote (через /goog/cdp/execute)"""
+    if hasattr(driver, "execute_cdp_cmd"):
+        return driver.execute_cdp_cmd(cmd, params)
+    driver.command_executor._commands["executeCdpCommand"] = ("POST", "/session/$sessionId/goog/cdp/execute")
+    return driver.execute("executeCdpCommand", {"cmd": cmd, "params": params})["value"]
+
+
+# Режимы подготовки драйвера при выдаче: full — очистка cookies/storage и about:blank,
+# warm — без очистки, свободные драйверы держат открытой DRIVER_WARM_URL
+CLEAN_MODES = ("full", "warm")
+
+
+_chromedriver_lock = threading.Lock()
+_chromedriver_cache: Optional[str] = None
+
+
+def _chromedriver_path() -> str:
+    """
+    Путь к chromedriver: CHROMEDRIVER_PATH или ChromeDriverManager().install(),
+    который вызывается один раз — без проверки версий и сети при каждом создании сессии
+    """
+    global _chromedriver_cache
+    with _chromedriver_lock:
+        if _chromedriver_cache is None:
+            _chromedriver_cache = os.getenv("CHROMEDRIVER_PATH") or ChromeDriverManager().install()
+        return _chromedriver_cache
+
+
+class _SeleniumNode:
+    """Один Selenium-эндпоинт (standalone или grid): живые сессии, задержка создания сессии, здоровье"""
+
+    __slots__ = ("url", "max_sessions", "sessions", "latency", "healthy", "failures")
+
+    def __init__(self, url: str, max_sessions: int):
+        self.url = url.rstrip("/")
+        self.max_sessions = max_sessions
+        self.sessions = 0
+        self.latency = 0.0  # Сглаженное время создания сессии, с
+        self.healthy = True
+        self.failures = 0  # Ошибки создания сессии подряд
+
+    def observe(self, seconds: float):
+        self.latency = seconds if not self.latency else 0.8 * self.latency + 0.2 * seconds
+
+    def to_dict(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "sessions": self.sessions,
+            "max_sessions": self.max_sessions,
+            "latency_ms": round(self.latency * 1000, 1),
+        }
+
+
+class _DriverState:
+    """Учет жизненного цикла одного драйвера"""
+
+    __slots__ = ("driver", "created_at", "uses", "idle_since", "parked_at")
+
+    def __init__(self, driver: Chrome):
+        self.driver = driver
+        self.created_at = time.time()
+        self.uses = 0
+        self.idle_since = self.created_at
+        self.parked_at = 0.0  # Когда драйвер открыл warm_url; 0 — страница не прогрета
+
 
 class AsyncDriverPool:
     """
     Асинхронный пул Selenium WebDriver для переиспользования драйверов
     """
 
-    def __init__(self, pool_size: int = None):
+    def __init__(self, pool_size: int = None, block_profile: str = None, block_allowlist: List[str] = None,
+                 page_load_strategy: str = None, min_size: int = None, max_size: int = None):
+        # pool_size — текущий целевой размер пула, меняется в пределах [min_size, max_size]
         self.pool_size = pool_size or int(os.getenv("DRIVER_POOL_SIZE", "2"))
+        self.min_size = min_size or int(os.getenv("DRIVER_POOL_MIN") or self.pool_size)
+        self.max_size = max(max_size or int(os.getenv("DRIVER_POOL_MAX") or self.pool_size), self.pool_size)
+        self.min_size = min(self.min_size, self.pool_size)
         self._drivers: List[Chrome] = []  # Список доступных драйверов
-        self._semaphore = Semaphore(self.pool_size)  # Ограничивает одновременный доступ
+        self._semaphore = Semaphore(self.max_size)  # Ограничивает одновременный доступ
+        self._holders = 0  # Сколько запросов прошли семафор (выданы или получают драйвер)
+        self._acquiring = 0  # Интерактивные запросы, еще не получившие драйвер
+        self._background_wake = asyncio.Event()  # Освободилось место или ушла очередь — будим фоновые аренды
         self._lock = asyncio.Lock()  # Защищает инициализацию от race conditions
         self._initialized = False
         self._initialization_task: Optional[asyncio.Task] = None  # Фоновая задача инициализации
-        self._drivers_creation_tasks: List[asyncio.Task] = []  # Задачи создания драйверов
+        self._drivers_creation_tasks: Set[asyncio.Task] = set()  # Задачи создания драйверов
+        self._states: Dict[int, _DriverState] = {}  # Все живые драйверы пула (свободные и выданные)
+        self._pending = 0  # Драйверы, которые сейчас создаются
+        self._driver_available = asyncio.Condition()  # Сигнал о возврате/создании драйвера
+        self._stats = {"created": 0, "recycled": 0, "replaced": 0, "probe_failures": 0,
+                       "grown": 0, "shrunk": 0, "prewarmed": 0, "drained": 0,
+                       "background_leases": 0, "background_waits": 0}
 
         self.selenium_remote = os.getenv("SELENIUM_REMOTE", "true").lower() in ("1", "true", "yes")
         self.selenium_url = os.getenv("SELENIUM_URL", "http://selenium:4444/wd/hub")
+        # Несколько Selenium-узлов через запятую; сессии размещаются на наименее загруженном здоровом узле
+        node_urls = _split_env_list(os.getenv("SELENIUM_URLS", "")) or [self.selenium_url]
+        node_max_sessions = int(os.getenv("SELENIUM_NODE_MAX_SESSIONS", "20"))
+        self._nodes = [_SeleniumNode(url, node_max_sessions) for url in node_urls]
+        self._node_by_driver: Dict[int, _SeleniumNode] = {}
+        self._nodes_lock = threading.Lock()  # Узлы выбираются из потоков создания драйверов
+        self.node_check_interval = float(os.getenv("DRIVER_NODE_CHECK_INTERVAL", "15"))
+        self._health_task: Optional[asyncio.Task] = None
+
+        # Теплый режим: свободные драйверы припаркованы на warm_url и периодически ее обновляют
+        self.clean_mode = os.getenv("DRIVER_CLEAN_MODE", "full").lower()
+        if self.clean_mode not in CLEAN_MODES:
+            raise ValueError(f"Неизвестный режим очистки: {self.clean_mode}")
+        self.warm_url = os.getenv("DRIVER_WARM_URL", "")
+        self.warm_refresh = float(os.getenv("DRIVER_WARM_REFRESH", "120"))
+        self.warm_interval = float(os.getenv("DRIVER_WARM_TICK", "5"))
+        self._warm_task: Optional[asyncio.Task] = None
         # Кол-во попыток при создании одного драйвера (полезно при старте, когда selenium ещё поднимается)
         self._create_retries = int(os.getenv("DRIVER_CREATE_RETRIES", "10"))
         self._create_retry_delay = float(os.getenv("DRIVER_CREATE_RETRY_DELAY", "5.0"))
 
+        # Блокировка тяжелых ресурсов: профиль из BLOCK_PROFILES и URL/хосты, которые блокировать нельзя
+        # (например "https://gorzdrav.spb.ru/logo.png" или "mc.yandex.ru")
+        self.block_profile = (block_profile or os.getenv("DRIVER_BLOCK_PROFILE", "light")).lower()
+        if self.block_profile not in BLOCK_PROFILES:
+            raise ValueError(f"Неизвестный профиль блокировки: {self.block_profile}")
+        self.block_allowlist = block_allowlist if block_allowlist is not None else _split_env_list(
+            os.getenv("DRIVER_BLOCK_ALLOWLIST", ""))
+        # normal — ждать полной загрузки, eager — только DOMContentLoaded
+        self.page_load_strategy = page_load_strategy or os.getenv("DRIVER_PAGE_LOAD_STRATEGY", "normal")
+
+        # Ротация сессий: после N выдач или M минут жизни драйвер закрывается и заменяется новым (0 — без ограничения)
+        self.max_uses = int(os.getenv("DRIVER_MAX_USES", "50"))
+        self.max_age = float(os.getenv("DRIVER_MAX_AGE_MINUTES", "30")) * 60
+        # Проверка живости драйвера при каждой выдаче из пула
+        self.probe_on_checkout = os.getenv("DRIVER_PROBE_ON_CHECKOUT", "true").lower() in ("1", "true", "yes")
+
+        # Эластичность: рост при очереди ожидающих, сжатие простаивающих, прогрев по прогнозу спроса
+        self.grow_waiters = int(os.getenv("DRIVER_POOL_GROW_WAITERS", "2"))
+        self.idle_timeout = float(os.getenv("DRIVER_IDLE_TIMEOUT", "300"))
+        self.scale_interval = float(os.getenv("DRIVER_POOL_TICK", "5"))
+        self.prewarm_headroom = float(os.getenv("DRIVER_PREWARM_HEADROOM", "1.25"))
+        self._waiters = 0  # Запросы, ждущие свободный драйвер
+        self._in_use = 0  # Выданные драйверы
+        self._peak_demand = 0  # Максимум (выдано + ждут) с прошлого тика
+        self._demand_ewma = 0.0
+        self._scaler_task: Optional[asyncio.Task] = None
+
+        # Темп создания при старте: окно одновременных создаваемых сессий растет, пока grid отвечает быстро,
+        # и уменьшается вдвое при ошибках
+        self.create_concurrency = int(os.getenv("DRIVER_CREATE_CONCURRENCY", "4"))
+        self.create_fast_seconds = float(os.getenv("DRIVER_CREATE_FAST_SECONDS", "5"))
+        # Сколько живых драйверов нужно, чтобы /ready считал пул готовым
+        self.ready_min = int(os.getenv("DRIVER_READY_MIN", "1"))
+        self._status_client = None  # httpx.AsyncClient для /status узлов
+
     async def initialize(self):
         """
         Асинхронная инициализация пула драйверов
@@ -61,67 +236,145 @@ class AsyncDriverPool:
                 await self._create_all_drivers_parallel()
 
                 self._initialized = True
-                print(f"✅ Пул драйверов инициализирован ({len(self._drivers)}/{self.pool_size} драйверов)")
+                print(f"✅ Пул драйверов инициализирован ({len(self._states)}/{self.pool_size} драйверов)")
+
+                if self.min_size < self.max_size:
+                    self._scaler_task = asyncio.create_task(self._scale_loop())
+                if self.selenium_remote:
+                    self._health_task = asyncio.create_task(self._health_loop())
+                if self.warm_url:
+                    self._warm_task = asyncio.create_task(self._warm_loop())
 
     async def _create_all_drivers_parallel(self):
-        """Создает все драйверы параллельно"""
-        tasks = []
-        for i in range(self.pool_size):
-            task = asyncio.create_task(self._create_single_driver(i))
-            tasks.append(task)
-            # Небольшая задержка между запуском задач чтобы не перегрузить Selenium
-            await asyncio.sleep(0.5)
-
-        # Ждем завершения всех задач
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        # Обрабатываем результаты
+        """
+        Создает недостающие драйверы параллельно с адаптивным темпом: начинаем с одной сессии,
+        окно растет на 1 после каждого быстрого создания и уменьшается вдвое после ошибки
+        """
+        # Часть драйверов могла быть создана по требованию до инициализации
+        missing = self.pool_size - self._total_sessions()
+        window = 1
+        launched = 0
         successful = 0
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                print(f"❌ Не удалось создать драйвер {i + 1}: {result}")
-            else:
+        in_flight: Set[asyncio.Task] = set()
+
+        while launched < missing or in_flight:
+            while launched < missing and len(in_flight) < window:
+                in_flight.add(asyncio.create_task(self._timed_create(launched)))
+                launched += 1
+
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    window = max(1, window // 2)
+                    continue
                 successful += 1
+                if task.result() <= self.create_fast_seconds:
+                    window = min(window + 1, self.create_concurrency)
+
+        print(f"✅ {successful}/{missing} драйверов создано")
 
-        print(f"✅ {successful}/{self.pool_size} драйверов создано")
+    async def _timed_create(self, index: int) -> float:
+        """Создает драйвер и возвращает, сколько секунд это заняло"""
+        started = time.monotonic()
+        await self._create_single_driver(index)
+        return time.monotonic() - started
 
     async def _create_single_driver(self, index: int):
-        """Создает один драйвер"""
+        """Создает один драйвер и кладет его в пул"""
+        self._pending += 1
         try:
-            driver = await asyncio.get_event_loop().run_in_executor(
-                None, self._create_driver_with_retries
-            )
-            self._drivers.append(driver)
+            driver = await self._spawn_driver()
+            await self._put_idle(driver)
             print(f"✅ Создан драйвер {index + 1}/{self.pool_size}")
             return driver
         except Exception as e:
             print(f"❌ Ошибка создания драйвера {index + 1}: {e}")
             raise
+        finally:
+            self._pending -= 1
+            await self._notify_available()
 
     async def _wait_for_selenium(self, timeout: int = 60):
-        """Ожидает пока Selenium станет доступен"""
-        import requests
-        from requests.exceptions import RequestException
-
+        """Ожидает пока станет доступен хотя бы один Selenium-узел"""
         print("⏳ Ожидание доступности Selenium...")
         start_time = time.time()
 
         while time.time() - start_time < timeout:
-            try:
-                response = requests.get(f"{self.selenium_url}/status", timeout=5)
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get('value', {}).get('ready', False):
-                        print("✅ Selenium готов к работе")
-                        return
-            except RequestException:
-                pass
+            await self._check_nodes()
+            ready = [node.url for node in self._nodes if node.healthy]
+            if ready:
+                print(f"✅ Selenium готов к работе ({', '.join(ready)})")
+                return
 
             print("⏳ Selenium недоступен, повторная попытка через 3 секунды...")
             await asyncio.sleep(3)
 
         print("⚠️ Selenium не стал доступен в течение таймаута, продолжаем с ретраями...")
 
+    async def _node_ready(self, node: _SeleniumNode) -> bool:
+        """Асинхронная проверка /status одного узла — не блокирует цикл событий"""
+        if self._status_client is None:
+            self._status_client = httpx.AsyncClient(timeout=float(os.getenv("SELENIUM_STATUS_TIMEOUT", "5")))
+        try:
+            response = await self._status_client.get(f"{node.url}/status")
+            if response.status_code == 200:
+                return bool(response.json().get('value', {}).get('ready', False))
+        except (httpx.HTTPError, ValueError):
+            pass
+        return False
+
+    async def _check_nodes(self):
+        """Параллельная проверка /status всех узлов"""
+        results = await asyncio.gather(*(self._node_ready(node) for node in self._nodes))
+        for node, ready in zip(self._nodes, results):
+            if ready and not node.healthy:
+                print(f"✅ Selenium-узел {node.url} снова доступен")
+            elif not ready and node.healthy:
+                print(f"⚠️ Selenium-узел {node.url} не прошел проверку /status, выводим его из работы")
+            node.healthy = ready
+            if ready:
+                node.failures = 0
+
+    async def _health_loop(self):
+        """Периодическая проверка узлов и вывод драйверов с больных узлов"""
+        while True:
+            await asyncio.sleep(self.node_check_interval)
+            try:
+                await self._check_nodes()
+                await self._drain_unhealthy()
+            except Exception as e:
+                print(f"⚠️ Ошибка проверки Selenium-узлов: {e}")
+
+    async def _drain_unhealthy(self):
+        """Свободные драйверы больных узлов заменяются на здоровых; выданные — при возврате"""
+        async with self._driver_available:
+            drained = [driver for driver in self._drivers if not self._driver_node_healthy(driver)]
+            for driver in drained:
+                self._drivers.remove(driver)
+        for driver in drained:
+            self._retire(driver, "drained")
+
+    def _driver_node_healthy(self, driver: Chrome) -> bool:
+        node = self._node_by_driver.get(id(driver))
+        return node is None or node.healthy
+
+    def _pick_node(self) -> _SeleniumNode:
+        """Резервирует место на наименее загруженном здоровом узле"""
+        with self._nodes_lock:
+            candidates = [node for node in self._nodes if node.healthy and node.sessions < node.max_sessions]
+            if not candidates:
+                # Все узлы больны или заполнены — пробуем наименее загруженный, ретраи разберутся
+                candidates = self._nodes
+            node = min(candidates, key=lambda n: (n.sessions / max(n.max_sessions, 1), n.latency))
+            node.sessions += 1
+            return node
+
+    def _release_node(self, driver: Chrome):
+        node = self._node_by_driver.pop(id(driver), None)
+        if node is not None:
+            with self._nodes_lock:
+                node.sessions -= 1
+
     def _create_driver_with_retries(self) -> Chrome:
         last_exc: Optional[Exception] = None
         for i in range(1, self._create_retries + 1):
@@ -155,26 +408,57 @@ class AsyncDriverPool:
             chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
             chrome_options.add_experimental_option("useAutomationExtension", False)
 
+            chrome_options.page_load_strategy = self.page_load_strategy
+            blocked_urls = self._blocked_urls()
+            if blocked_urls:
+                # Картинки отключаем и настройкой профиля — так они не грузятся даже из CSS.
+                # Настройка действует на все картинки, поэтому только если allowlist не снял ни одного шаблона
+                if set(_IMAGE_PATTERNS) <= set(blocked_urls):
+                    chrome_options.add_experimental_option(
+                        "prefs", {"profile.managed_default_content_settings.images": 2}
+                    )
+                    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+
             if self.selenium_remote:
-                # Подключаемся к уже запущенному selenium/standalone-chrome (в другом контейнере)
-                driver = webdriver.Remote(command_executor=self.selenium_url, options=chrome_options)
+                # Подключаемся к уже запущенному selenium/standalone-chrome на выбранном узле
+                node = self._pick_node()
+                started = time.time()
+                try:
+                    driver = webdriver.Remote(command_executor=node.url, options=chrome_options)
+                except Exception:
+                    with self._nodes_lock:
+                        node.sessions -= 1
+                        node.failures += 1
+                        if node.failures >= 3:
+                            node.healthy = False
+                    raise
+                node.observe(time.time() - started)
+                node.failures = 0
+                self._node_by_driver[id(driver)] = node
             else:
-                # Локальный режим: автоматическое управление драйвером (ChromeDriverManager)
-                service = Service(ChromeDriverManager().install())
+                # Локальный режим: путь к chromedriver определяется один раз на процесс
+                service = Service(_chromedriver_path())
                 driver = Chrome(service=service, options=chrome_options)
 
+            # Все команды драйвера (и его элементов) проходят через execute — там и меряем их время
+            instrument_driver(driver)
+
             try:
                 driver.set_window_size(1366, 768)
             except Exception:
                 # Игнорируем ошибки установки размеров в headless окружении
                 pass
 
-            # Неявное ожидание (секунды)
-            implicit_wait = int(os.getenv("DRIVER_IMPLICIT_WAIT", "5"))
-            try:
-                driver.implicitly_wait(implicit_wait)
-            except Exception:
-                pass
+            self.apply_resource_blocking(driver)
+
+            # Неявное ожидание (секунды). По умолчанию выключено: парсер ждет данные через app/waits.py,
+            # а неявное ожидание складывается с явным и растягивает каждый неудачный поиск
+            implicit_wait = int(os.getenv("DRIVER_IMPLICIT_WAIT", "0"))
+            if implicit_wait:
+                try:
+                    driver.implicitly_wait(implicit_wait)
+                except Exception:
+                    pass
 
             # Скрытие WebDriver фактора, если возможно
             try:
@@ -194,111 +478,382 @@ class AsyncDriverPool:
                     "   -> Локальный режим включён (SELENIUM_REMOTE=false). Убедитесь, что в контейнере установлен Google Chrome и его зависимости.")
             else:
                 print(
-                    f"   -> Remote режим: пытались подключиться к {self.selenium_url}. Убедитесь, что selenium standalone доступен.")
+                    f"   -> Remote режим: пытались подключиться к {', '.join(n.url for n in self._nodes)}. Убедитесь, что selenium standalone доступен.")
             raise
 
+    def apply_resource_blocking(self, driver: Chrome):
+        """Включает блокировку ресурсов через CDP в текущей вкладке драйвера (CDP действует на одну вкладку)"""
+        blocked_urls = self._blocked_urls()
+        if not blocked_urls:
+            return
+        try:
+            _execute_cdp(driver, "Network.enable", {})
+            _execute_cdp(driver, "Network.setBlockedURLs", {"urls": blocked_urls})
+        except Exception as e:
+            print(f"⚠️ Не удалось включить блокировку ресурсов через CDP: {e}")
+
+    def _blocked_urls(self) -> List[str]:
+        """
+        Шаблоны профиля, которые не задевают URL и хосты из allowlist. Исключений в Network.setBlockedURLs нет,
+        поэтому шаблон, под который попал разрешенный адрес, снимается целиком
+        """
+        return [pattern for pattern in BLOCK_PROFILES[self.block_profile]
+                if not _blocks_allowed(pattern, self.block_allowlist)]
+
     @asynccontextmanager
-    async def get_driver(self):
+    async def get_driver(self, clean: Optional[str] = None):
         """
-        Асинхронный контекстный менеджер для получения драйвера из пула
+        Асинхронный контекстный менеджер для получения драйвера из пула.
+        clean — режим из CLEAN_MODES, по умолчанию DRIVER_CLEAN_MODE
         """
-        # Если пул еще не инициализирован, создаем драйвер по требованию
-        if not self._initialized and not self._drivers:
-            await self._create_driver_on_demand()
+        clean = (clean or self.clean_mode).lower()
+        if clean not in CLEAN_MODES:
+            raise ValueError(f"Неизвестный режим очистки: {clean}")
 
         # Запускаем фоновую инициализацию если еще не запущена
         if not self._initialization_task and not self._initialized:
             await self.initialize()
 
-        # Ждем доступный драйвер (ограничено семафором)
-        await self._semaphore.acquire()
+        started = time.perf_counter()
+        background = background_lease.get()
+        if background:
+            await self._wait_background_turn()
+        else:
+            self._acquiring += 1
 
+        # Ждем доступный драйвер (ограничено семафором)
         try:
-            # Берем драйвер из пула или создаем новый если пул пустой
-            if self._drivers:
-                driver = self._drivers.pop()
-            else:
-                driver = await asyncio.get_event_loop().run_in_executor(
-                    None, self._create_driver_with_retries
-                )
+            await self._semaphore.acquire()
+        except BaseException:
+            self._acquired(background)
+            raise
+        self._holders += 1
 
+        try:
+            try:
+                driver = await self._checkout(clean)
+            finally:
+                self._acquired(background)
+            pool_acquire_seconds.observe(time.perf_counter() - started, endpoint=current_endpoint.get())
+            failed = False
             try:
-                # Очищаем состояние драйвера перед использованием
-                await self._clean_driver(driver)
                 yield driver
-
+            except Exception:
+                failed = True
+                raise
             finally:
-                # Возвращаем драйвер в пул
-                self._drivers.append(driver)
+                # Возвращаем драйвер в пул (или заменяем, если он сломался)
+                await self._checkin(driver, failed)
 
         finally:
             # Освобождаем семафор
+            self._holders -= 1
             self._semaphore.release()
+            self._background_wake.set()
+
+    def is_saturated(self) -> bool:
+        """Нет места для фоновой работы: кто-то ждет драйвер или заняты все сессии текущего размера пула"""
+        return bool(self._acquiring or self._waiters) or self._holders >= self.pool_size
+
+    def _acquired(self, background: bool):
+        if not background:
+            self._acquiring -= 1
+            self._background_wake.set()
+
+    async def _wait_background_turn(self):
+        """Фоновая аренда ждет, пока пул не перестанет быть занятым; пул ради нее не растет"""
+        self._stats["background_leases"] += 1
+        if self.is_saturated():
+            self._stats["background_waits"] += 1
+        while self.is_saturated():
+            self._background_wake.clear()
+            try:
+                await asyncio.wait_for(self._background_wake.wait(), self.scale_interval)
+            except asyncio.TimeoutError:
+                pass
 
-    async def _create_driver_on_demand(self):
-        """Создает драйвер по требованию если пул пустой"""
-        try:
-            driver = await asyncio.get_event_loop().run_in_executor(
-                None, self._create_driver_with_retries
-            )
+    def _total_sessions(self) -> int:
+        return len(self._states) + self._pending
+
+    async def _run(self, func, *args):
+        """Блокирующие операции с драйверами — в отдельном пуле потоков обслуживания"""
+        return await driver_executor.run(func, *args)
+
+    async def _spawn_driver(self) -> Chrome:
+        """Создает драйвер и регистрирует его в пуле (не кладет в список свободных)"""
+        driver = await self._run(self._create_driver_with_retries)
+        self._states[id(driver)] = _DriverState(driver)
+        self._stats["created"] += 1
+        return driver
+
+    async def _put_idle(self, driver: Chrome):
+        state = self._states.get(id(driver))
+        if state is not None:
+            state.idle_since = time.time()
+        async with self._driver_available:
             self._drivers.append(driver)
+            self._driver_available.notify()
+
+    async def _notify_available(self):
+        async with self._driver_available:
+            self._driver_available.notify_all()
+
+    async def _checkout(self, clean: str = "full") -> Chrome:
+        """Выдает живой (и в режиме full очищенный) драйвер; сломанные и отслужившие заменяются в фоне"""
+        while True:
+            driver = await self._take_idle_driver()
+            state = self._states[id(driver)]
+
+            if self._should_retire(state):
+                self._retire(driver, "recycled")
+                continue
+            if self.probe_on_checkout and state.uses and not await self._run(self._sync_is_alive, driver):
+                self._stats["probe_failures"] += 1
+                self._retire(driver, "replaced")
+                continue
+            if clean == "full":
+                if not await self._clean_driver(driver):
+                    self._retire(driver, "replaced")
+                    continue
+                state.parked_at = 0.0
+
+            state.uses += 1
+            self._in_use += 1
+            self._track_demand()
+            return driver
+
+    async def _take_idle_driver(self) -> Chrome:
+        async with self._driver_available:
+            while not self._drivers and self._total_sessions() >= self.pool_size:
+                # Все сессии заняты или создаются — ждем возврата или замены
+                self._waiters += 1
+                self._track_demand()
+                try:
+                    if self._waiters >= self.grow_waiters and self.pool_size < self.max_size:
+                        # Очередь ожидающих выросла — расширяем пул, драйвер создаст этот же запрос
+                        self.pool_size += 1
+                        self._stats["grown"] += 1
+                        print(f"📈 Пул расширен до {self.pool_size} драйверов")
+                        continue
+                    await self._driver_available.wait()
+                finally:
+                    self._waiters -= 1
+            if self._drivers:
+                return self._drivers.pop()
+            self._pending += 1
+
+        # Свободного драйвера нет, но есть место в пуле — создаем по требованию
+        try:
+            driver = await self._spawn_driver()
             print("✅ Создан драйвер по требованию")
+            return driver
         except Exception as e:
             print(f"❌ Не удалось создать драйвер по требованию: {e}")
             raise
+        finally:
+            self._pending -= 1
 
-    async def _clean_driver(self, driver: Chrome):
-        """
-        Очистка состояния драйвера перед повторным использованием
-        """
+    async def _checkin(self, driver: Chrome, failed: bool):
+        self._in_use -= 1
+        state = self._states.get(id(driver))
+        if state is None:
+            return
+        # Обработчик мог уйти со страницы — перепаркуем в фоне
+        state.parked_at = 0.0
+        # После ошибки в обработчике проверяем, жив ли драйвер, прежде чем отдавать его другим
+        if failed and not await self._run(self._sync_is_alive, driver):
+            self._stats["probe_failures"] += 1
+            self._retire(driver, "replaced")
+            return
+        if self._should_retire(state):
+            self._retire(driver, "recycled")
+            return
+        if not self._driver_node_healthy(driver):
+            self._retire(driver, "drained")
+            return
+        await self._put_idle(driver)
+
+    def _should_retire(self, state: _DriverState) -> bool:
+        if self.max_uses and state.uses >= self.max_uses:
+            return True
+        return bool(self.max_age) and time.time() - state.created_at >= self.max_age
+
+    def _retire(self, driver: Chrome, reason: str):
+        """Убирает драйвер из пула и в фоне закрывает его и создает замену"""
+        self._states.pop(id(driver), None)
+        self._release_node(driver)
+        self._stats[reason] += 1
+        self._pending += 1
+        task = asyncio.create_task(self._replace_driver(driver, reason))
+        self._drivers_creation_tasks.add(task)
+        task.add_done_callback(self._drivers_creation_tasks.discard)
+
+    async def _replace_driver(self, old_driver: Chrome, reason: str):
+        """Замена сломанного или отслужившего драйвера"""
         try:
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, self._sync_clean_driver, driver)
+            await self._run(self._sync_quit_driver, old_driver)
+            if self._total_sessions() > self.pool_size:
+                # Пул успели сжать — замена не нужна
+                return
+            new_driver = await self._spawn_driver()
+            await self._put_idle(new_driver)
+            print(f"✅ Драйвер заменен ({'ротация' if reason == 'recycled' else 'сломан'})")
         except Exception as e:
-            print(f"⚠️ Ошибка очистки драйвера: {e}")
+            print(f"❌ Не удалось заменить драйвер: {e}")
+        finally:
+            self._pending -= 1
+            await self._notify_available()
 
-    def _sync_clean_driver(self, driver: Chrome):
-        """Синхронная очистка драйвера"""
-        try:
-            # Очищаем cookies
-            try:
-                driver.delete_all_cookies()
-            except Exception:
-                pass
+    def _track_demand(self):
+        self._peak_demand = max(self._peak_demand, self._in_use + self._waiters)
 
-            # Очищаем localStorage и sessionStorage
+    async def _scale_loop(self):
+        """Периодически подстраивает размер пула под спрос"""
+        while True:
+            await asyncio.sleep(self.scale_interval)
             try:
-                driver.execute_script("window.localStorage.clear();")
-                driver.execute_script("window.sessionStorage.clear();")
-            except Exception:
-                pass
+                await self._scale_tick()
+            except Exception as e:
+                print(f"⚠️ Ошибка масштабирования пула: {e}")
+
+    async def _scale_tick(self):
+        # Прогноз спроса: сглаженный пик (выдано + ждут); растет сразу, падает плавно
+        peak = max(self._peak_demand, self._in_use + self._waiters)
+        self._peak_demand = 0
+        self._demand_ewma = max(peak, 0.7 * self._demand_ewma + 0.3 * peak)
+        target = min(self.max_size, max(self.min_size, int(self._demand_ewma * self.prewarm_headroom + 0.999)))
+
+        # Прогрев: создаем драйверы заранее, чтобы запросы не ждали создания сессии
+        if target > self._total_sessions():
+            self.pool_size = max(self.pool_size, target)
+            for _ in range(target - self._total_sessions()):
+                self._pending += 1
+                self._stats["prewarmed"] += 1
+                task = asyncio.create_task(self._create_single_driver_pending())
+                self._drivers_creation_tasks.add(task)
+                task.add_done_callback(self._drivers_creation_tasks.discard)
+            return
 
-            # Возвращаем на пустую страницу
+        # Сжатие: закрываем драйверы, простаивающие дольше idle_timeout, но не ниже target
+        now = time.time()
+        async with self._driver_available:
+            for driver in list(self._drivers):
+                if len(self._states) + self._pending <= target:
+                    break
+                state = self._states.get(id(driver))
+                if state is not None and now - state.idle_since >= self.idle_timeout:
+                    self._drivers.remove(driver)
+                    self._states.pop(id(driver), None)
+                    self._release_node(driver)
+                    self._stats["shrunk"] += 1
+                    task = asyncio.create_task(self._run(self._sync_quit_driver, driver))
+                    self._drivers_creation_tasks.add(task)
+                    task.add_done_callback(self._drivers_creation_tasks.discard)
+            self.pool_size = max(target, self._total_sessions(), self.min_size)
+
+    async def _create_single_driver_pending(self):
+        """Создание драйвера для прогрева (счетчик _pending уже увеличен)"""
+        try:
+            await self._put_idle(await self._spawn_driver())
+        except Exception as e:
+            print(f"❌ Не удалось создать драйвер для прогрева: {e}")
+        finally:
+            self._pending -= 1
+            await self._notify_available()
+
+    def is_parked_on(self, driver: Chrome, url: str) -> bool:
+        """Открыта ли у выданного драйвера свежая страница url (теплый режим)"""
+        state = self._states.get(id(driver))
+        return (state is not None and bool(state.parked_at) and url == self.warm_url
+                and time.time() - state.parked_at < self.warm_refresh)
+
+    async def _warm_loop(self):
+        """Держит свободные драйверы на warm_url: паркует новые и вернувшиеся, обновляет устаревшие"""
+        while True:
+            await asyncio.sleep(self.warm_interval)
             try:
-                if getattr(driver, "current_url", None) and driver.current_url != "about:blank":
-                    driver.get("about:blank")
-            except Exception:
-                pass
+                await self._warm_tick()
+            except Exception as e:
+                print(f"⚠️ Ошибка прогрева драйверов: {e}")
+
+    async def _warm_tick(self):
+        now = time.time()
+        async with self._driver_available:
+            stale = [driver for driver in self._drivers
+                     if id(driver) in self._states and now - self._states[id(driver)].parked_at >= self.warm_refresh]
+            # Прогреваемые драйверы временно убираем из свободных, чтобы их не выдали посреди загрузки
+            for driver in stale:
+                self._drivers.remove(driver)
+
+        results = await asyncio.gather(*(self._run(self._sync_park_driver, driver) for driver in stale),
+                                       return_exceptions=True)
+        for driver, parked in zip(stale, results):
+            state = self._states.get(id(driver))
+            if state is None:
+                continue
+            if parked is True:
+                state.parked_at = time.time()
+                await self._put_idle(driver)
+            else:
+                self._retire(driver, "replaced")
+
+    def _sync_park_driver(self, driver: Chrome) -> bool:
+        try:
+            driver.get(self.warm_url)
+            return True
+        except Exception as e:
+            print(f"⚠️ Не удалось открыть {self.warm_url} в драйвере: {e}")
+            return False
+
+    @staticmethod
+    def _sync_quit_driver(driver: Chrome):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _sync_is_alive(driver: Chrome) -> bool:
+        """Дешевая проверка живости сессии — одна удаленная команда"""
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
 
+    async def _clean_driver(self, driver: Chrome) -> bool:
+        """
+        Очистка состояния драйвера перед повторным использованием
+        """
+        try:
+            return await self._run(self._sync_clean_driver, driver)
         except Exception as e:
-            print(f"⚠️ Ошибка при очистке драйвера: {e}")
-            # Если драйвер сломан, заменяем его
-            self._replace_broken_driver(driver)
+            print(f"⚠️ Ошибка очистки драйвера: {e}")
+            return False
 
-    def _replace_broken_driver(self, broken_driver: Chrome):
-        """Замена сломанного драйвера"""
+    def _sync_clean_driver(self, driver: Chrome) -> bool:
+        """Синхронная очистка драйвера. False — драйвер сломан и его нужно заменить"""
+        # Очищаем cookies
         try:
-            broken_driver.quit()
+            driver.delete_all_cookies()
         except Exception:
             pass
 
-        # Создаем новый драйвер (синхронно)
+        # Очищаем localStorage и sessionStorage
         try:
-            new_driver = self._create_driver()
-            self._drivers.append(new_driver)
-            print("✅ Сломанный драйвер заменен")
+            driver.execute_script("window.localStorage.clear();")
+            driver.execute_script("window.sessionStorage.clear();")
+        except Exception:
+            pass
+
+        # Возвращаем на пустую страницу; если и это не удалось — сессия мертва
+        try:
+            if driver.current_url != "about:blank":
+                driver.get("about:blank")
         except Exception as e:
-            print(f"❌ Не удалось заменить сломанный драйвер: {e}")
+            print(f"⚠️ Ошибка при очистке драйвера: {e}")
+            return False
+        return True
 
     async def close_all(self):
         """Закрытие всех драйверов при завершении приложения"""
@@ -312,35 +867,90 @@ class AsyncDriverPool:
             except asyncio.CancelledError:
                 pass
 
+        for task in (self._scaler_task, self._health_task, self._warm_task):
+            if task and not task.done():
+                task.cancel()
+        self._scaler_task = None
+        self._health_task = None
+        self._warm_task = None
+
         # Отменяем все задачи создания драйверов
-        for task in self._drivers_creation_tasks:
+        for task in list(self._drivers_creation_tasks):
             if not task.done():
                 task.cancel()
 
-        for driver in list(self._drivers):
-            try:
-                driver.quit()
-            except Exception as e:
-                print(f"⚠️ Ошибка закрытия драйвера: {e}")
+        # Закрываем сессии параллельно, не блокируя цикл событий
+        await asyncio.gather(*(self._run(self._sync_quit_driver, state.driver) for state in list(self._states.values())),
+                             return_exceptions=True)
+        if self._status_client is not None:
+            await self._status_client.aclose()
+            self._status_client = None
 
         self._drivers.clear()
+        self._states.clear()
+        self._node_by_driver.clear()
+        for node in self._nodes:
+            node.sessions = 0
         self._initialized = False
         self._initialization_task = None
         self._drivers_creation_tasks.clear()
         print("✅ Пул драйверов закрыт")
 
+    def get_readiness(self) -> dict:
+        """
+        Готовность пула для /ready: живых драйверов не меньше DRIVER_READY_MIN
+        и (в remote режиме) есть хотя бы один здоровый Selenium-узел
+        """
+        live = len(self._states)
+        healthy_nodes = [node.url for node in self._nodes if node.healthy] if self.selenium_remote else []
+        ready = live >= min(self.ready_min, self.pool_size) and (not self.selenium_remote or bool(healthy_nodes))
+        return {
+            "ready": ready,
+            "initialized": self._initialized,
+            "live_drivers": live,
+            "idle_drivers": len(self._drivers),
+            "creating": self._pending,
+            "ready_min": self.ready_min,
+            "healthy_nodes": healthy_nodes,
+        }
+
     def get_stats(self):
         """Возвращает статистику пула"""
         return {
-            "total_drivers": len(self._drivers),
+            "total_drivers": len(self._states),
+            "idle_drivers": len(self._drivers),
+            "creating": self._pending,
             "pool_size": self.pool_size,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "in_use": self._in_use,
+            "waiting": self._waiters,
             "initialized": self._initialized,
-            "available": self._semaphore._value
+            "available": self.max_size - self._holders,
+            "block_profile": self.block_profile,
+            "page_load_strategy": self.page_load_strategy,
+            "clean_mode": self.clean_mode,
+            "warm_url": self.warm_url,
+            "parked": sum(1 for state in self._states.values() if state.parked_at),
+            **self._stats,
+            "nodes": [node.to_dict() for node in self._nodes] if self.selenium_remote else [],
         }
 
 
+def _create_driver_pool():
+    """
+    DRIVER_BROKER=client — сессии арендуются у брокера драйверов (python -m app.broker) через Unix-сокет,
+    иначе у процесса свой пул
+    """
+    if os.getenv("DRIVER_BROKER", "").lower() == "client":
+        from app.broker import DriverBrokerClient
+
+        return DriverBrokerClient()
+    return AsyncDriverPool()
+
+
 # Глобальный экземпляр пула
-driver_pool = AsyncDriverPool()
+driver_pool = _create_driver_pool()
 
 
 # FastAPI зависимость
@@ -349,4 +959,4 @@ async def get_driver():
     Зависимость для внедрения драйвера в эндпоинты
     """
     async with driver_pool.get_driver() as driver:
-        yield driver
\ No newline at end of file
+        yield driver
@@ -0,0 +1,154 @@
+"""
+Отдельные ограниченные пулы потоков вместо общего executor'а цикла событий:
+долгие создания и очистки драйверов не занимают потоки парсинга и записи в БД,
+а зависший Selenium не влияет на остальные эндпоинты
+"""
+import os
+import time
+import asyncio
+import threading
+import contextvars
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class BoundedExecutor:
+    """Пул потоков фиксированного размера с метриками: очередь, активные задачи, время ожидания потока"""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = self._make_executor()
+        self._lock = threading.Lock()  # Счетчики обновляются из потоков пула
+        self._queued = 0
+        self._active = 0
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0,
+                       "wait_total": 0.0, "wait_max": 0.0, "run_total": 0.0}
+
+    def _make_executor(self):
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+
+    async def run(self, func: Callable, *args) -> Any:
+        submitted_at = time.monotonic()
+        with self._lock:
+            self._queued += 1
+            self._stats["submitted"] += 1
+
+        def call():
+            started_at = time.monotonic()
+            waited = started_at - submitted_at
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+                self._stats["wait_total"] += waited
+                self._stats["wait_max"] = max(self._stats["wait_max"], waited)
+            failed = True
+            try:
+                result = func(*args)
+                failed = False
+                return result
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._stats["completed"] += 1
+                    self._stats["failed"] += failed
+                    self._stats["run_total"] += time.monotonic() - started_at
+
+        # Контекст (например, метка эндпоинта для метрик) переносим в поток, как это делает asyncio.to_thread
+        context = contextvars.copy_context()
+        return await asyncio.get_event_loop().run_in_executor(self._executor, context.run, call)
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait)
+
+    def get_stats(self):
+        with self._lock:
+            completed = self._stats["completed"]
+            return {
+                "max_workers": self.max_workers,
+                "queued": self._queued,
+                "active": self._active,
+                "submitted": self._stats["submitted"],
+                "completed": completed,
+                "failed": self._stats["failed"],
+                "wait_avg_ms": round(self._stats["wait_total"] / completed * 1000, 2) if completed else 0.0,
+                "wait_max_ms": round(self._stats["wait_max"] * 1000, 2),
+                "run_avg_ms": round(self._stats["run_total"] / completed * 1000, 2) if completed else 0.0,
+            }
+
+
+def _timed_call(func: Callable, *args):
+    """Выполняется в дочернем процессе: время старта нужно родителю для метрики ожидания"""
+    return time.monotonic(), func(*args)
+
+
+class BoundedProcessExecutor(BoundedExecutor):
+    """
+    Пул процессов с теми же метриками — для CPU-задач, которые в потоках конкурируют за GIL
+    с остальным кодом. func и аргументы должны сериализоваться (функция уровня модуля).
+    time.monotonic общий для процессов одной машины, поэтому ожидание считается по времени старта в дочернем
+    """
+
+    def _make_executor(self):
+        # spawn: не копируем в дочерние процессы потоки пула драйверов и цикл событий
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def run(self, func: Callable, *args) -> Any:
+        submitted_at = time.monotonic()
+        with self._lock:
+            # Начало выполнения в дочернем процессе родитель не видит: пока задача не вернулась,
+            # сверх max_workers она считается в очереди
+            self._queued += 1
+            self._stats["submitted"] += 1
+        started_at = None
+        try:
+            started_at, result = await asyncio.get_event_loop().run_in_executor(
+                self._executor, _timed_call, func, *args
+            )
+            return result
+        finally:
+            finished_at = time.monotonic()
+            with self._lock:
+                self._queued -= 1
+                self._stats["completed"] += 1
+                self._stats["failed"] += started_at is None
+                if started_at is not None:
+                    waited = max(0.0, started_at - submitted_at)
+                    self._stats["wait_total"] += waited
+                    self._stats["wait_max"] = max(self._stats["wait_max"], waited)
+                    self._stats["run_total"] += finished_at - started_at
+
+    def get_stats(self):
+        stats = super().get_stats()
+        in_flight = stats["queued"]
+        stats.update(queued=max(0, in_flight - self.max_workers), active=min(in_flight, self.max_workers))
+        return stats
+
+
+# Обслуживание пула драйверов: создание (с повторами и sleep), очистка, проверки, закрытие
+driver_executor = BoundedExecutor("driver", int(os.getenv("DRIVER_EXECUTOR_THREADS", "8")))
+# Синхронный код парсинга на арендованных драйверах — поток на каждый одновременный обход
+scrape_executor = BoundedExecutor("scrape", int(os.getenv("SCRAPE_EXECUTOR_THREADS", "16")))
+# Синхронные запросы к БД из асинхронного кода
+db_executor = BoundedExecutor("db", int(os.getenv("DB_EXECUTOR_THREADS", "4")))
+# CPU-задачи (хэширование паролей) — в процессах: пропускная способность растет с числом ядер,
+# а всплеск регистраций не занимает потоки парсинга
+cpu_executor = BoundedProcessExecutor("cpu", int(os.getenv("CPU_EXECUTOR_PROCESSES") or os.cpu_count() or 2))
+
+EXECUTORS: Dict[str, BoundedExecutor] = {
+    executor.name: executor for executor in (driver_executor, scrape_executor, db_executor, cpu_executor)
+}
+
+
+def get_executor_stats():
+    return {name: executor.get_stats() for name, executor in EXECUTORS.items()}
+
+
+def shutdown_executors():
+    for executor in EXECUTORS.values():
+        executor.shutdown(wait=False)
@@ -0,0 +1,138 @@
+import os
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class FetchSchemaError(Exception):
+    """Ответ API не совпадает с ожидаемой схемой (сайт поменял формат)"""
+
+
+class GorzdravHttpFetcher:
+    """
+    Получение районов и поликлиник напрямую из JSON API gorzdrav.spb.ru, без браузера.
+    Использует один AsyncClient с пулом keep-alive соединений
+    """
+
+    def __init__(self, base_url: str = None, timeout: float = None, max_connections: int = None):
+        # base_url можно переопределить на локальный stub-сервер
+        self.base_url = (base_url or os.getenv("GORZDRAV_API_URL", "https://gorzdrav.spb.ru/_api/api/v2")).rstrip("/")
+        self.timeout = timeout or float(os.getenv("HTTP_FETCH_TIMEOUT", "10.0"))
+        self.max_connections = max_connections or int(os.getenv("HTTP_FETCH_MAX_CONNECTIONS", "10"))
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                headers={"Accept": "application/json"},
+            )
+        return self._client
+
+    async def _request(self, path: str, etag: Optional[str] = None) -> Tuple[Optional[list], Optional[str]]:
+        """
+        Запрос к API и проверка конверта ответа {"success": ..., "result": [...]}.
+        Возвращает (result, ETag ответа). С etag отправляет If-None-Match и на 304 возвращает (None, etag).
+        Валидаторы здесь не хранятся: их владелец — сохраненное в БД состояние района
+        """
+        headers = {"If-None-Match": etag} if etag else {}
+        response = await self._get_client().get(path, headers=headers)
+        if etag and response.status_code == 304:
+            return None, etag
+        response.raise_for_status()
+        try:
+            data = response.json()
+        except ValueError as e:
+            raise FetchSchemaError(f"{path}: ответ не является JSON") from e
+        return self._check_envelope(path, data), response.headers.get("ETag")
+
+    async def _get_result(self, path: str) -> list:
+        result, _ = await self._request(path)
+        return result
+
+    @staticmethod
+    def _check_envelope(path: str, data) -> list:
+        if not isinstance(data, dict) or not isinstance(data.get("result"), list):
+            raise FetchSchemaError(f"{path}: нет списка result в ответе")
+        if data.get("success") is False:
+            raise FetchSchemaError(f"{path}: API вернул success=false ({data.get('message')})")
+        return data["result"]
+
+    async def fetch_districts(self) -> List[dict]:
+        """Список районов: [{"id": ..., "name": ...}]"""
+        districts = await self._get_result("/shared/districts")
+        if not districts:
+            raise FetchSchemaError("/shared/districts: пустой список районов")
+        for district in districts:
+            if not isinstance(district, dict) or "id" not in district or not district.get("name"):
+                raise FetchSchemaError(f"/shared/districts: неожиданный формат района {district!r}")
+        return districts
+
+    async def fetch_clinics(self, district_id) -> List[str]:
+        """Названия поликлиник района"""
+        clinics, _ = await self.fetch_clinics_if_changed(district_id)
+        return clinics
+
+    async def fetch_clinics_if_changed(self, district_id,
+                                       etag: Optional[str] = None) -> Tuple[Optional[List[str]], Optional[str]]:
+        """
+        (названия поликлиник, ETag ответа); с etag сохраненной версии — (None, etag), если сервер ответил 304
+        """
+        path = f"/shared/district/{district_id}/lpus"
+        result, etag = await self._request(path, etag)
+        if result is None:
+            return None, etag
+        clinics = []
+        for lpu in result:
+            name = (lpu.get("lpuFullName") or lpu.get("lpuShortName")) if isinstance(lpu, dict) else None
+            if not name:
+                raise FetchSchemaError(f"{path}: неожиданный формат поликлиники {lpu!r}")
+            clinics.append(name)
+        return clinics, etag
+
+    async def _fetch_items(self, path: str, required: str = "id") -> List[dict]:
+        items = await self._get_result(path)
+        for item in items:
+            if not isinstance(item, dict) or item.get(required) is None:
+                raise FetchSchemaError(f"{path}: неожиданный формат элемента {item!r}")
+        return items
+
+    async def fetch_lpus(self, district_id) -> List[dict]:
+        """Поликлиники района целиком: [{"id": ..., "lpuFullName": ..., ...}]"""
+        return await self._fetch_items(f"/shared/district/{district_id}/lpus")
+
+    async def fetch_specialties(self, lpu_id) -> List[dict]:
+        """Специальности поликлиники: [{"id": ..., "name": ..., "countFreeTicket": ...}]"""
+        return await self._fetch_items(f"/schedule/lpu/{lpu_id}/specialties")
+
+    async def fetch_doctors(self, lpu_id, specialty_id) -> List[dict]:
+        """Врачи специальности: [{"id": ..., "name": ..., "freeTicketCount": ...}]"""
+        return await self._fetch_items(f"/schedule/lpu/{lpu_id}/speciality/{specialty_id}/doctors")
+
+    async def fetch_appointments(self, lpu_id, doctor_id) -> List[dict]:
+        """Свободные талоны врача: [{"id": ..., "visitStart": ..., "visitEnd": ...}]"""
+        return await self._fetch_items(f"/schedule/lpu/{lpu_id}/doctor/{doctor_id}/appointments")
+
+    async def fetch_district_info(self) -> Dict[str, List[str]]:
+        """Районы и их поликлиники в формате эндпоинта /district"""
+        districts = await self.fetch_districts()
+        clinics = await asyncio.gather(*(self.fetch_clinics(d["id"]) for d in districts))
+        return {d["name"]: c for d, c in zip(districts, clinics)}
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Глобальный экземпляр HTTP-клиента
+http_fetcher = GorzdravHttpFetcher()
@@ -0,0 +1,282 @@
+import os
+import json
+import time
+import uuid
+import socket
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+from app.kafka_queue import SCRAPE_RESULTS_TOPIC, scrape_queue
+from app.metrics import current_endpoint
+
+load_dotenv()
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+
+class Job:
+    """Состояние одной задачи парсинга"""
+
+    __slots__ = ("job_id", "type", "params", "status", "result", "error", "created_at", "finished_at", "_done")
+
+    def __init__(self, job_id: str, job_type: str, params: dict, status: str = "queued",
+                 result: Any = None, error: Optional[str] = None, created_at: float = None,
+                 finished_at: Optional[float] = None):
+        self.job_id = job_id
+        self.type = job_type
+        self.params = params
+        self.status = status
+        self.result = result
+        self.error = error
+        self.created_at = created_at or time.time()
+        self.finished_at = finished_at
+        self._done: Optional[asyncio.Event] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "type": self.type,
+            "params": self.params,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Job":
+        return cls(data["job_id"], data["type"], data.get("params") or {}, data["status"], data.get("result"),
+                   data.get("error"), data.get("created_at"), data.get("finished_at"))
+
+
+class RedisJobBackend:
+    """Опциональное хранение задач в Redis — переживает рестарт и видно всем воркерам API"""
+
+    def __init__(self, url: str, ttl: float, prefix: str = "parsergz:job:"):
+        import redis.asyncio as redis  # опциональная зависимость
+
+        self._redis = redis.from_url(url)
+        self._ttl = max(1, int(ttl))
+        self._prefix = prefix
+
+    async def save(self, job: Job):
+        await self._redis.set(self._prefix + job.job_id, json.dumps(job.to_dict(), ensure_ascii=False), ex=self._ttl)
+
+    async def load(self, job_id: str) -> Optional[Job]:
+        raw = await self._redis.get(self._prefix + job_id)
+        return Job.from_dict(json.loads(raw)) if raw is not None else None
+
+    async def close(self):
+        await self._redis.close()
+
+
+class JobStore:
+    """
+    Хранилище задач в памяти: завершенные задачи живут JOB_TTL секунд,
+    при превышении JOB_MAX_ENTRIES первыми удаляются самые старые завершенные
+    """
+
+    def __init__(self, max_entries: int = None, ttl: float = None, backend=None):
+        self.max_entries = max_entries or int(os.getenv("JOB_MAX_ENTRIES", "10000"))
+        self.ttl = ttl or float(os.getenv("JOB_TTL", "3600"))
+        self.backend = backend
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+
+    async def create(self, job_type: str, params: dict) -> Job:
+        job = Job(uuid.uuid4().hex, job_type, params)
+        self._jobs[job.job_id] = job
+        self._evict()
+        await self._persist(job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if (job is None or not job.finished) and self.backend is not None:
+            # Задачу мог создать или завершить другой процесс API
+            try:
+                stored = await self.backend.load(job_id)
+            except Exception as e:
+                print(f"⚠️ Ошибка чтения задачи {job_id}: {e}")
+                stored = None
+            if stored is not None and (job is None or stored.finished):
+                job = self._merge(stored)
+        return job
+
+    async def update(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None,
+                     job_type: str = None, finished_at: float = None) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            if finished_at is not None and time.time() - finished_at > self.ttl:
+                # Старый результат из топика: задача уже вытеснена по TTL, не воскрешаем ее
+                return None
+            # Результат задачи, созданной другим процессом API
+            job = self._merge(Job(job_id, job_type, {}))
+        job.status = status
+        job.result = result
+        job.error = error
+        if job.finished:
+            job.finished_at = finished_at or time.time()
+            if job._done is not None:
+                job._done.set()
+        await self._persist(job)
+        return job
+
+    async def wait(self, job: Job, timeout: float) -> Job:
+        """Long-poll: ждет завершения задачи не дольше timeout секунд"""
+        if job.finished or timeout <= 0:
+            return job
+        if job._done is None:
+            job._done = asyncio.Event()
+        try:
+            await asyncio.wait_for(job._done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return job
+
+    def _merge(self, job: Job) -> Job:
+        current = self._jobs.get(job.job_id)
+        if current is not None:
+            job._done = current._done
+            if job.finished and job._done is not None:
+                job._done.set()
+        self._jobs[job.job_id] = job
+        self._evict()
+        return job
+
+    def _evict(self):
+        now = time.time()
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished and now - job.finished_at > self.ttl]:
+            del self._jobs[job_id]
+        if len(self._jobs) <= self.max_entries:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished]:
+            del self._jobs[job_id]
+            if len(self._jobs) <= self.max_entries:
+                break
+
+    async def _persist(self, job: Job):
+        if self.backend is None:
+            return
+        try:
+            await self.backend.save(job)
+        except Exception as e:
+            print(f"⚠️ Ошибка сохранения задачи {job.job_id}: {e}")
+
+    async def close(self):
+        if self.backend is not None:
+            await self.backend.close()
+
+    def get_stats(self):
+        counts = {status: 0 for status in JOB_STATUSES}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {**counts, "total": len(self._jobs), "persistent": self.backend is not None}
+
+
+class JobManager:
+    """
+    Прием задач: при включенной очереди задачи уходят воркерам через Kafka,
+    иначе выполняются в этом процессе как asyncio-задачи на общем пуле драйверов
+    """
+
+    def __init__(self, store: JobStore, queue, handlers: Dict[str, Any] = None):
+        self.store = store
+        self.queue = queue
+        self.handlers = handlers
+        self.pool = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self._local_tasks = set()
+
+    async def start(self, pool):
+        self.pool = pool
+        if self.handlers is None:
+            from app.worker import JOB_HANDLERS
+
+            self.handlers = JOB_HANDLERS
+        if self.queue.enabled:
+            self._listener_task = asyncio.create_task(self._listen_results())
+
+    async def stop(self):
+        tasks = list(self._local_tasks)
+        if self._listener_task is not None:
+            tasks.append(self._listener_task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._listener_task = None
+        self._local_tasks.clear()
+        await self.store.close()
+
+    async def submit(self, job_type: str, params: dict) -> Job:
+        job = await self.store.create(job_type, params)
+        if self.queue.enabled:
+            await self.queue.submit(job_type, params, job_id=job.job_id)
+        else:
+            task = asyncio.create_task(self._run_local(job))
+            self._local_tasks.add(task)
+            task.add_done_callback(self._local_tasks.discard)
+        return job
+
+    async def _run_local(self, job: Job):
+        current_endpoint.set(f"job:{job.type}")
+        await self.store.update(job.job_id, "running")
+        try:
+            result = await self.handlers[job.type](self.pool, job.params)
+            await self.store.update(job.job_id, "done", result=result)
+        except Exception as e:
+            print(f"❌ Задача {job.job_id} завершилась ошибкой: {e}")
+            await self.store.update(job.job_id, "failed", error=str(e))
+
+    async def _listen_results(self):
+        """
+        Читает топик результатов; у каждого процесса API своя группа, чтобы видеть все результаты.
+        Группа новая при каждом запуске, поэтому читаем с конца топика, а не всю историю результатов
+        """
+        consumer = self.queue.broker.consumer(
+            SCRAPE_RESULTS_TOPIC, f"api-{socket.gethostname()}-{os.getpid()}", offset_reset="latest"
+        )
+        await consumer.start()
+        try:
+            while True:
+                try:
+                    batches = await consumer.getmany(timeout_ms=1000)
+                    for messages in batches.values():
+                        for message in messages:
+                            payload = message.value
+                            await self.store.update(
+                                payload["job_id"], payload["status"], payload.get("result"), payload.get("error"),
+                                job_type=payload.get("type"), finished_at=payload.get("finished_at"),
+                            )
+                    if batches:
+                        await consumer.commit()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"❌ Ошибка чтения результатов задач: {e}")
+                    await asyncio.sleep(1)
+        finally:
+            await consumer.stop()
+
+
+def _create_backend():
+    redis_url = os.getenv("JOB_REDIS_URL")
+    if not redis_url:
+        return None
+    try:
+        return RedisJobBackend(redis_url, ttl=float(os.getenv("JOB_TTL", "3600")))
+    except ImportError:
+        print("⚠️ JOB_REDIS_URL задан, но пакет redis не установлен — задачи хранятся только в памяти")
+        return None
+
+
+# Глобальный менеджер задач
+job_manager = JobManager(JobStore(backend=_create_backend()), scrape_queue)
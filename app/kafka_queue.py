@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import uuid
+import zlib
+import asyncio
+from collections import namedtuple
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+KAFKA_BOOTSTRAP_SERVERS = os.getenv("KAFKA_BOOTSTRAP_SERVERS", "kafka:9092")
+SCRAPE_JOBS_TOPIC = os.getenv("SCRAPE_JOBS_TOPIC", "scrape-jobs")
+SCRAPE_RESULTS_TOPIC = os.getenv("SCRAPE_RESULTS_TOPIC", "scrape-results")
+# kafka — настоящий брокер, memory — брокер в памяти процесса, пусто — очередь выключена
+SCRAPE_QUEUE = os.getenv("SCRAPE_QUEUE", "").lower()
+
+Message = namedtuple("Message", ["topic", "partition", "offset", "key", "value"])
+
+
+def _serialize(value: dict) -> bytes:
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+
+def _deserialize(raw: bytes) -> dict:
+    return json.loads(raw.decode("utf-8"))
+
+
+class KafkaBroker:
+    """Обертка над aiokafka: общий producer и фабрика consumer'ов"""
+
+    def __init__(self, bootstrap_servers: str = None):
+        self.bootstrap_servers = bootstrap_servers or KAFKA_BOOTSTRAP_SERVERS
+        self._producer = None
+
+    async def start(self):
+        from aiokafka import AIOKafkaProducer
+
+        self._producer = AIOKafkaProducer(
+            bootstrap_servers=self.bootstrap_servers,
+            value_serializer=_serialize,
+        )
+        await self._producer.start()
+
+    async def stop(self):
+        if self._producer is not None:
+            await self._producer.stop()
+            self._producer = None
+
+    async def send(self, topic: str, value: dict, key: Optional[str] = None):
+        await self._producer.send_and_wait(topic, value, key=key.encode("utf-8") if key else None)
+
+    def consumer(self, topic: str, group_id: str, offset_reset: str = "earliest"):
+        """offset_reset="latest" — новая группа читает только сообщения, пришедшие после подключения"""
+        from aiokafka import AIOKafkaConsumer
+
+        return AIOKafkaConsumer(
+            topic,
+            bootstrap_servers=self.bootstrap_servers,
+            group_id=group_id,
+            enable_auto_commit=False,
+            auto_offset_reset=offset_reset,
+            value_deserializer=_deserialize,
+        )
+
+
+class InMemoryConsumer:
+    """Consumer для InMemoryBroker с тем же интерфейсом, что и AIOKafkaConsumer (getmany/commit)"""
+
+    def __init__(self, broker: "InMemoryBroker", topic: str, group_id: str, offset_reset: str = "earliest"):
+        self._broker = broker
+        self._topic = topic
+        self._group_id = group_id
+        self._offset_reset = offset_reset
+        self._positions: Dict[int, int] = {}
+
+    async def start(self):
+        if self._offset_reset == "latest":
+            # Как auto_offset_reset="latest": без закоммиченного offset'а группа начинает с конца партиции
+            self._positions = self._broker._end_offsets(self._topic, self._group_id)
+
+    async def stop(self):
+        pass
+
+    async def getmany(self, timeout_ms: int = 0, max_records: Optional[int] = None) -> Dict[int, List[Message]]:
+        deadline = time.monotonic() + timeout_ms / 1000
+        while True:
+            batches = self._broker._fetch(self._topic, self._group_id, self._positions, max_records)
+            remaining = deadline - time.monotonic()
+            if batches or remaining <= 0:
+                for partition, messages in batches.items():
+                    self._positions[partition] = messages[-1].offset + 1
+                return batches
+            await self._broker._wait(self._topic, remaining)
+
+    async def commit(self):
+        self._broker._commit(self._topic, self._group_id, self._positions)
+
+
+class InMemoryBroker:
+    """
+    Брокер в памяти процесса вместо Kafka — для разработки и тестов.
+    Сообщения раскладываются по партициям по ключу, offset'ы хранятся на consumer group
+    """
+
+    def __init__(self, partitions: int = 3):
+        self.partitions = partitions
+        self._topics: Dict[str, List[List[Message]]] = {}
+        self._committed: Dict[tuple, int] = {}
+        self._conditions: Dict[str, asyncio.Condition] = {}
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def _partitions(self, topic: str) -> List[List[Message]]:
+        return self._topics.setdefault(topic, [[] for _ in range(self.partitions)])
+
+    def _condition(self, topic: str) -> asyncio.Condition:
+        return self._conditions.setdefault(topic, asyncio.Condition())
+
+    async def send(self, topic: str, value: dict, key: Optional[str] = None):
+        partitions = self._partitions(topic)
+        index = zlib.crc32(key.encode("utf-8")) % self.partitions if key else 0
+        partition = partitions[index]
+        # Сериализуем, как настоящий брокер, чтобы consumer не делил объект с producer'ом
+        partition.append(Message(topic, index, len(partition), key, _deserialize(_serialize(value))))
+        condition = self._condition(topic)
+        async with condition:
+            condition.notify_all()
+
+    def consumer(self, topic: str, group_id: str, offset_reset: str = "earliest") -> InMemoryConsumer:
+        return InMemoryConsumer(self, topic, group_id, offset_reset)
+
+    def _fetch(self, topic: str, group_id: str, positions: Dict[int, int],
+               max_records: Optional[int]) -> Dict[int, List[Message]]:
+        batches = {}
+        for index, partition in enumerate(self._partitions(topic)):
+            # Позиция consumer'а, а если он еще не читал партицию — закоммиченный offset группы
+            start = positions.get(index, self._committed.get((topic, group_id, index), 0))
+            messages = partition[start:start + max_records if max_records else None]
+            if messages:
+                batches[index] = messages
+        return batches
+
+    def _end_offsets(self, topic: str, group_id: str) -> Dict[int, int]:
+        return {
+            index: len(partition)
+            for index, partition in enumerate(self._partitions(topic))
+            if (topic, group_id, index) not in self._committed
+        }
+
+    def _commit(self, topic: str, group_id: str, positions: Dict[int, int]):
+        for partition, offset in positions.items():
+            self._committed[(topic, group_id, partition)] = offset
+
+    async def _wait(self, topic: str, timeout: float):
+        condition = self._condition(topic)
+        async with condition:
+            try:
+                await asyncio.wait_for(condition.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+def create_broker():
+    """Брокер по настройке SCRAPE_QUEUE; None — очередь выключена"""
+    if SCRAPE_QUEUE == "kafka":
+        return KafkaBroker()
+    if SCRAPE_QUEUE == "memory":
+        return InMemoryBroker()
+    return None
+
+
+class ScrapeJobProducer:
+    """Публикация задач парсинга в топик задач"""
+
+    def __init__(self, broker, topic: str = None):
+        self.broker = broker
+        self.topic = topic or SCRAPE_JOBS_TOPIC
+
+    async def submit(self, job_type: str, params: dict = None, job_id: str = None) -> str:
+        job_id = job_id or uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "type": job_type,
+            "params": params or {},
+            "submitted_at": time.time(),
+        }
+        # Ключ по job_id — задачи равномерно распределяются по партициям
+        await self.broker.send(self.topic, job, key=job_id)
+        return job_id
+
+
+class ScrapeQueue:
+    """
+    Очередь задач парсинга на стороне API.
+    В режиме memory воркер запускается в этом же процессе на общем пуле драйверов
+    """
+
+    def __init__(self, broker=None):
+        self.broker = broker if broker is not None else create_broker()
+        self.producer = ScrapeJobProducer(self.broker) if self.broker is not None else None
+        self._local_worker = None
+        self._local_worker_task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.broker is not None
+
+    async def start(self, pool=None):
+        if not self.enabled:
+            return
+        await self.broker.start()
+        if isinstance(self.broker, InMemoryBroker) and pool is not None:
+            from app.worker import ScrapeWorker
+
+            self._local_worker = ScrapeWorker(self.broker, pool)
+            self._local_worker_task = asyncio.create_task(self._local_worker.run())
+        print(f"📬 Очередь задач парсинга запущена ({type(self.broker).__name__})")
+
+    async def stop(self):
+        if self._local_worker is not None:
+            self._local_worker.stop()
+            self._local_worker_task.cancel()
+            try:
+                await self._local_worker_task
+            except asyncio.CancelledError:
+                pass
+            self._local_worker = None
+            self._local_worker_task = None
+        if self.enabled:
+            await self.broker.stop()
+
+    async def submit(self, job_type: str, params: dict = None, job_id: str = None) -> str:
+        return await self.producer.submit(job_type, params, job_id)
+
+
+# Глобальный экземпляр очереди
+scrape_queue = ScrapeQueue()
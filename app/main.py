@@ -1,8 +1,20 @@
 import os
 from pathlib import Path
 from fastapi import FastAPI
-from app.api.v1 import router as v1_router
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.api.v1 import register_refresh_targets, router as v1_router
 from app.dependencies import driver_pool
+from app.tabs import scrape_pool, tab_pool
+from app.fetcher import http_fetcher
+from app.cache import result_cache
+from app.crawl import slot_crawler, slot_index
+from app.scheduler import refresh_scheduler
+from app.waits import adaptive_wait
+from app.executors import get_executor_stats, shutdown_executors
+from app.db import async_engine
+from app import metrics
+from app.kafka_queue import scrape_queue
+from app.jobs import job_manager
 
 
 app = FastAPI(
@@ -15,17 +27,57 @@ app = FastAPI(
 async def startup_event():
     """Запускается при старте приложения"""
     await driver_pool.initialize()
+    # Обновления стартуют, когда пул готов, и уступают драйверы запросам пользователей
+    register_refresh_targets(refresh_scheduler)
+    await refresh_scheduler.start(scrape_pool())
+    await scrape_queue.start(scrape_pool())
+    await job_manager.start(scrape_pool())
     print("🚀 FastAPI сервер запущен, пул драйверов инициализируется в фоне")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Запускается при завершении приложения"""
+    await refresh_scheduler.stop()
+    await slot_crawler.stop()
+    await job_manager.stop()
+    await scrape_queue.stop()
     await driver_pool.close_all()
+    await http_fetcher.close()
+    await result_cache.close()
+    await async_engine.dispose()
+    shutdown_executors()
     print("🛑 Приложение завершено")
 
 app.include_router(v1_router, prefix="/api/v1")
 
 
+@app.get("/ready")
+async def ready():
+    """Readiness-проба: 200, когда пул драйверов может выдавать сессии, иначе 503"""
+    readiness = driver_pool.get_readiness()
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Метрики в формате Prometheus: команды WebDriver, ожидание пула, районы, пулы потоков"""
+    extra = metrics.render_gauges("driver_pool", [({}, driver_pool.get_stats())])
+    if tab_pool.enabled:
+        extra += metrics.render_gauges("tab_pool", [({}, tab_pool.get_stats())])
+    extra += metrics.render_gauges(
+        "executor", [({"executor": name}, stats) for name, stats in get_executor_stats().items()]
+    )
+    extra += metrics.render_gauges("result_cache", [({}, result_cache.get_stats())])
+    extra += metrics.render_gauges("slot_index", [({}, slot_index.get_stats())])
+    extra += metrics.render_gauges(
+        "adaptive_wait", [({"locator": name}, stats) for name, stats in adaptive_wait.get_stats().items()]
+    )
+    extra += metrics.render_gauges(
+        "refresh_target", [({"target": name}, stats) for name, stats in refresh_scheduler.get_stats().items()]
+    )
+    return PlainTextResponse(metrics.render(extra), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/info")
 async def info():
     try:
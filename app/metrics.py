@@ -0,0 +1,166 @@
+"""
+Метрики в текстовом формате Prometheus (/metrics) без внешних зависимостей:
+длительность каждой команды WebDriver (по эндпоинту и локатору), ожидание драйвера из пула,
+время обхода каждого района. Счетчики обновляются из потоков парсинга, поэтому под блокировкой
+"""
+import time
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Tuple
+
+from fastapi import Request
+
+# Эндпоинт (шаблон пути) или задача, от имени которой выполняются команды драйвера.
+# Executor'ы копируют контекст в свои потоки, поэтому метка доходит до синхронного кода парсинга
+current_endpoint: ContextVar[str] = ContextVar("current_endpoint", default="")
+
+_LOCATOR_MAX_LENGTH = 120
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # ключ меток -> [счетчики по корзинам, сумма, кол-во]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in self._series.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+webdriver_command_seconds = Histogram(
+    "webdriver_command_duration_seconds", "Длительность команды WebDriver",
+    ("command", "endpoint", "locator"),
+)
+webdriver_command_errors = Counter(
+    "webdriver_command_errors_total", "Команды WebDriver, завершившиеся ошибкой",
+    ("command", "endpoint", "locator"),
+)
+pool_acquire_seconds = Histogram(
+    "driver_pool_acquire_wait_seconds", "Ожидание драйвера из пула (очередь, создание, очистка)", ("endpoint",),
+)
+district_scrape_seconds = Histogram(
+    "district_scrape_duration_seconds", "Время обхода одного района", ("district", "extraction"),
+)
+
+METRICS = (webdriver_command_seconds, webdriver_command_errors, pool_acquire_seconds, district_scrape_seconds)
+
+
+def _locator(params) -> str:
+    if isinstance(params, dict) and "using" in params:
+        return f"{params['using']}={str(params.get('value', ''))[:_LOCATOR_MAX_LENGTH]}"
+    return ""
+
+
+def instrument_driver(driver):
+    """Оборачивает execute() драйвера: через него проходят все команды, в том числе команды элементов"""
+    execute = driver.execute
+
+    def timed_execute(command, params=None):
+        labels = {"command": command, "endpoint": current_endpoint.get(), "locator": _locator(params)}
+        started = time.perf_counter()
+        try:
+            return execute(command, params)
+        except Exception:
+            webdriver_command_errors.inc(**labels)
+            raise
+        finally:
+            webdriver_command_seconds.observe(time.perf_counter() - started, **labels)
+
+    driver.execute = timed_execute
+    return driver
+
+
+async def track_endpoint(request: Request):
+    """Зависимость роутера: запоминает шаблон пути эндпоинта для меток метрик драйвера"""
+    route = request.scope.get("route")
+    endpoint = request.scope.get("endpoint")
+    current_endpoint.set(getattr(route, "path", None) or getattr(endpoint, "__name__", request.url.path))
+
+
+def render_gauges(prefix: str, series: Iterable[Tuple[Dict[str, str], dict]]) -> List[str]:
+    """Числовые поля get_stats() как gauge-метрики; series — пары (метки, статистика)"""
+    grouped: Dict[str, List[str]] = {}
+    for labels, stats in series:
+        for name, value in stats.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            metric = f"{prefix}_{name}"
+            grouped.setdefault(metric, []).append(
+                f"{metric}{_format_labels(tuple(labels), tuple(labels.values()))} {value}"
+            )
+    lines = []
+    for metric, samples in grouped.items():
+        lines.append(f"# TYPE {metric} gauge")
+        lines.extend(samples)
+    return lines
+
+
+def render(extra: Iterable[str] = ()) -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    lines.extend(extra)
+    return "\n".join(lines) + "\n"
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, func
+from sqlalchemy import JSON, Column, Integer, String, DateTime, ForeignKey, UniqueConstraint, func
+from sqlalchemy.orm import relationship
 from app.db import Base
 
 class User(Base):
@@ -9,3 +10,41 @@ class User(Base):
     full_name = Column(String(256), nullable=True)
     hashed_password = Column(String(512), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class District(Base):
+    __tablename__ = "districts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(256), unique=True, index=True, nullable=False)
+    fingerprint = Column(String(64), nullable=True)  # sha256 списка поликлиник, см. app/changes.py
+    # ETag ответа API, из которого сохранены поликлиники; None — данные не из API или версия неизвестна
+    etag = Column(String(256), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    clinics = relationship("Clinic", back_populates="district", order_by="Clinic.position")
+
+
+class Clinic(Base):
+    __tablename__ = "clinics"
+    __table_args__ = (UniqueConstraint("district_id", "name", name="uq_clinics_district_id_name"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    district_id = Column(Integer, ForeignKey("districts.id", ondelete="CASCADE"), index=True, nullable=False)
+    name = Column(String(512), nullable=False)
+    position = Column(Integer, nullable=False, default=0)  # порядок поликлиники в списке района
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    district = relationship("District", back_populates="clinics")
+
+
+class DistrictChange(Base):
+    """Запись ленты изменений: какие поликлиники появились и пропали в районе"""
+    __tablename__ = "district_changes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    district = Column(String(256), index=True, nullable=False)
+    added = Column(JSON, nullable=False, default=list)
+    removed = Column(JSON, nullable=False, default=list)
+    fingerprint = Column(String(64), nullable=True)  # None — район пропал с сайта
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
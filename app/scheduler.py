@@ -0,0 +1,144 @@
+"""
+Фоновое обновление данных по расписанию, чтобы пользовательские запросы попадали в свежий кэш,
+а не в холодный запуск браузера. У каждой цели свой интервал и разброс (jitter).
+Обновления не стартуют, пока пул не готов или занят, а их аренды драйверов уступают
+интерактивным запросам (background_lease)
+"""
+import os
+import time
+import random
+import asyncio
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Аренда драйвера от фонового обновления: пул выдает такие аренды, только когда интерактивные
+# запросы не ждут и есть свободное место (см. AsyncDriverPool.get_driver)
+background_lease: ContextVar[bool] = ContextVar("background_lease", default=False)
+
+
+class RefreshTarget:
+    """Зарегистрированная цель обновления и ее статистика"""
+
+    def __init__(self, name: str, run: Callable[[], Awaitable], interval: float, jitter: float,
+                 initial_delay: float):
+        self.name = name
+        self.run = run
+        self.interval = interval
+        self.jitter = jitter
+        # Разброс и у первого запуска: процессы, стартовавшие вместе, не обновляют одновременно
+        self.next_at = time.monotonic() + initial_delay * (1 + random.uniform(-jitter, jitter))
+        self.task: Optional[asyncio.Task] = None
+        self.last_started: Optional[float] = None
+        self.last_finished: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.stats = {"runs": 0, "failures": 0, "skipped_saturated": 0, "last_seconds": 0.0}
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def schedule_next(self, delay: float = None):
+        if delay is None:
+            delay = self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+        self.next_at = time.monotonic() + max(0.0, delay)
+
+    def to_dict(self) -> dict:
+        return {
+            **self.stats,
+            "interval": self.interval,
+            "jitter": self.jitter,
+            "running": self.running,
+            "next_in": round(max(0.0, self.next_at - time.monotonic()), 1),
+            "last_started": self.last_started,
+            "last_finished": self.last_finished,
+            "last_error": self.last_error,
+        }
+
+
+class RefreshScheduler:
+    """
+    Раз в tick проверяет цели, у которых подошло время. Если пул занят, запуск откладывается
+    на saturated_retry секунд вместо полного интервала; одна цель не запускается дважды одновременно
+    """
+
+    def __init__(self, tick: float = None, saturated_retry: float = None, jitter: float = None):
+        self.tick = tick or float(os.getenv("REFRESH_TICK", "1"))
+        self.saturated_retry = saturated_retry or float(os.getenv("REFRESH_SATURATED_RETRY", "30"))
+        self.jitter = jitter if jitter is not None else float(os.getenv("REFRESH_JITTER", "0.1"))
+        self.targets: Dict[str, RefreshTarget] = {}
+        self.pool = None
+        self._loop_task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, run: Callable[[], Awaitable], interval: float, jitter: float = None,
+                 initial_delay: float = 0.0):
+        """run — корутина без аргументов; первый запуск — через initial_delay (с разбросом) после готовности пула"""
+        if interval <= 0:
+            raise ValueError(f"Интервал обновления {name} должен быть больше нуля")
+        jitter = self.jitter if jitter is None else jitter
+        self.targets[name] = RefreshTarget(name, run, interval, jitter, initial_delay)
+
+    async def start(self, pool):
+        self.pool = pool
+        if self._loop_task is None and self.targets:
+            self._loop_task = asyncio.create_task(self._loop())
+            print(f"⏰ Планировщик обновлений: {', '.join(self.targets)}")
+
+    async def stop(self):
+        tasks = [target.task for target in self.targets.values() if target.running]
+        if self._loop_task is not None:
+            tasks.append(self._loop_task)
+            self._loop_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _loop(self):
+        while True:
+            try:
+                self._tick()
+            except Exception as e:
+                print(f"❌ Ошибка планировщика обновлений: {e}")
+            await asyncio.sleep(self.tick)
+
+    def _tick(self):
+        now = time.monotonic()
+        due = [target for target in self.targets.values() if not target.running and target.next_at <= now]
+        if not due or not self.pool.get_readiness().get("ready"):
+            # Пока пул не готов, первый запуск ждет — не считаем это пропуском
+            return
+        for target in due:
+            if self.pool.is_saturated():
+                target.stats["skipped_saturated"] += 1
+                target.schedule_next(min(self.saturated_retry, target.interval))
+                continue
+            target.task = asyncio.create_task(self._run_target(target))
+
+    async def _run_target(self, target: RefreshTarget):
+        background_lease.set(True)
+        started = time.monotonic()
+        target.last_started = time.time()
+        try:
+            await target.run()
+            target.last_error = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            target.stats["failures"] += 1
+            target.last_error = str(e)
+            print(f"⚠️ Фоновое обновление {target.name} не удалось: {e}")
+        finally:
+            target.stats["runs"] += 1
+            target.stats["last_seconds"] = round(time.monotonic() - started, 2)
+            target.last_finished = time.time()
+            target.schedule_next()
+
+    def get_stats(self):
+        return {name: target.to_dict() for name, target in self.targets.items()}
+
+
+# Глобальный планировщик фоновых обновлений
+refresh_scheduler = RefreshScheduler()
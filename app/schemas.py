@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Dict, Optional
 from datetime import datetime
 
 class UserBase(BaseModel):
@@ -15,3 +15,16 @@ class UserOut(UserBase):
 
     class Config:
         orm_mode = True
+
+class ScrapeJobCreate(BaseModel):
+    type: str = "district"
+    params: Dict[str, Any] = {}
+
+class ScrapeJobOut(BaseModel):
+    job_id: str
+    type: Optional[str] = None
+    status: str
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: Optional[float] = None
+    finished_at: Optional[float] = None
@@ -0,0 +1,422 @@
+import os
+import time
+import asyncio
+import threading
+from itertools import chain
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from app.changes import pick_stale
+from app.executors import scrape_executor
+from app.fetcher import http_fetcher
+from app.metrics import district_scrape_seconds
+from app.waits import adaptive_wait
+
+# Страницу можно подменить локальной фикстурой (benchmarks/fixture_site.py)
+SCHEDULE_URL = os.getenv("GORZDRAV_SCHEDULE_URL", "https://gorzdrav.spb.ru/service-free-schedule")
+DISTRICT_LIST_XPATH = '/html/body/div/div[1]/div[12]/div[3]/div[1]/div[2]/div[1]/div/div[1]/ul'
+DISTRICT_BUTTONS_XPATH = DISTRICT_LIST_XPATH + '/li'
+CLINIC_LIST_XPATH = '//*[@id="serviceMoOutput"]/div'
+
+# Кол-во драйверов для параллельного обхода районов (1 — последовательный режим)
+DISTRICT_SCRAPE_WORKERS = int(os.getenv("DISTRICT_SCRAPE_WORKERS", "1"))
+# Способ получения данных: http (JSON API), selenium (браузер), auto (http с откатом на selenium)
+DISTRICT_ENGINE = os.getenv("DISTRICT_ENGINE", "auto").lower()
+ENGINES = ("auto", "http", "selenium")
+
+# Способ чтения DOM: webdriver (отдельная команда на каждый элемент) или js (один execute_async_script)
+DISTRICT_EXTRACTION = os.getenv("DISTRICT_EXTRACTION", "webdriver").lower()
+# Сколько районов обходить за один вызов скрипта в режиме js (0 — все за один вызов)
+DISTRICT_JS_BATCH = int(os.getenv("DISTRICT_JS_BATCH", "1"))
+# Таймаут ожидания одного состояния страницы внутри скрипта, мс
+DISTRICT_JS_TIMEOUT_MS = int(os.getenv("DISTRICT_JS_TIMEOUT_MS", "10000"))
+
+# Обход районов внутри страницы: клик, ожидание списка поликлиник, чтение названий, history.back().
+# Аргументы: XPath кнопок районов, XPath поликлиник, XPath списка районов, индексы, таймаут, callback
+EXTRACT_DISTRICTS_JS = """
+const [buttonsXpath, clinicsXpath, listXpath, indices, timeoutMs, done] = arguments;
+const xp = (path) => {
+    const snapshot = document.evaluate(path, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    const nodes = [];
+    for (let i = 0; i < snapshot.snapshotLength; i++) nodes.push(snapshot.snapshotItem(i));
+    return nodes;
+};
+const text = (el) => (el.innerText || el.textContent || '').trim();
+const waitFor = (check) => new Promise((resolve, reject) => {
+    const started = Date.now();
+    const tick = () => {
+        let value = null;
+        try { value = check(); } catch (e) {}
+        if (value) return resolve(value);
+        if (Date.now() - started > timeoutMs) return reject(new Error('timeout waiting for page state'));
+        setTimeout(tick, 50);
+    };
+    tick();
+});
+(async () => {
+    const rows = [];
+    for (const index of indices) {
+        const startedAt = Date.now();
+        try {
+            const buttons = await waitFor(() => { const found = xp(buttonsXpath); return found.length ? found : null; });
+            if (index >= buttons.length) continue;
+            const name = text(buttons[index]);
+            const before = new Set(xp(clinicsXpath));
+            buttons[index].click();
+            // Список готов, когда новые элементы появились и их кол-во перестало меняться
+            let last = -1;
+            const clinics = await waitFor(() => {
+                const found = xp(clinicsXpath).filter((node) => !before.has(node));
+                if (found.length && found.length === last) return found;
+                last = found.length;
+                return null;
+            });
+            const row = {index, name, clinics: clinics.map((node) => text(node).split('\\n')[0])};
+            rows.push(row);
+            history.back();
+            await waitFor(() => xp(listXpath).length > 0);
+            row.ms = Date.now() - startedAt;
+        } catch (e) {
+            rows.push({index, error: String(e)});
+        }
+    }
+    return rows;
+})().then(done, (e) => done([{index: -1, error: String(e)}]));
+"""
+
+# Ссылки на фоновые задачи потокового обхода, чтобы их не собрал GC до завершения
+_background_tasks = set()
+
+# (индекс района на странице, название района, список поликлиник)
+DistrictRow = Tuple[int, str, List[str]]
+
+
+def _find_district_buttons(driver: WebDriver):
+    return adaptive_wait.until_stable(driver, DISTRICT_BUTTONS_XPATH, "district_buttons")
+
+
+def _open_schedule(driver: WebDriver, page_ready: bool = False):
+    """Открывает страницу расписания, если драйвер не припаркован на ней пулом (теплый режим)"""
+    if not page_ready:
+        driver.get(SCHEDULE_URL)
+
+
+def count_districts(driver: WebDriver, page_ready: bool = False) -> int:
+    """Открывает страницу расписания и возвращает кол-во районов"""
+    _open_schedule(driver, page_ready)
+    return len(_find_district_buttons(driver))
+
+
+def list_districts(driver: WebDriver, page_ready: bool = False) -> List[str]:
+    """Названия районов в порядке кнопок на странице — дешевый сигнал без открытия районов"""
+    _open_schedule(driver, page_ready)
+    return [button.text for button in _find_district_buttons(driver)]
+
+
+def iter_districts(driver: WebDriver, indices: Optional[Iterable[int]] = None,
+                   extraction: Optional[str] = None, page_ready: bool = False) -> Iterator[DistrictRow]:
+    """
+    Обходит районы с указанными индексами (по умолчанию — все) на одном драйвере
+    и отдает каждый район сразу после обработки. Выполняется синхронно, в отдельном потоке
+    """
+    if (extraction or DISTRICT_EXTRACTION) == "js":
+        return _iter_districts_js(driver, indices, page_ready)
+    return _iter_districts_webdriver(driver, indices, page_ready)
+
+
+def _iter_districts_webdriver(driver: WebDriver, indices: Optional[Iterable[int]] = None,
+                              page_ready: bool = False) -> Iterator[DistrictRow]:
+    """Обход через WebDriver: отдельная удаленная команда на каждый поиск, клик и чтение текста"""
+    _open_schedule(driver, page_ready)
+    district_buttons = _find_district_buttons(driver)
+    if indices is None:
+        indices = range(len(district_buttons))
+
+    for i in indices:
+        started = time.perf_counter()
+        try:
+            # В КАЖДОЙ итерации заново находим все элементы
+            district_buttons = _find_district_buttons(driver)
+
+            if i < len(district_buttons):
+                district_name = district_buttons[i].text
+                district_buttons[i].click()
+                # Список целиком: DOM и запросы затихли; поликлиники предыдущего района не считаются
+                clinic_list = adaptive_wait.until_stable(driver, CLINIC_LIST_XPATH, "clinic_list", fresh=True)
+
+                clinics = [clinic.text.split('\n', 1)[0] for clinic in clinic_list]
+                driver.back()
+                # Список районов дождется _find_district_buttons в следующей итерации
+                if len(district_name) > 1:
+                    district_scrape_seconds.observe(time.perf_counter() - started,
+                                                    district=district_name, extraction="webdriver")
+                    yield i, district_name, clinics
+        except Exception as e:
+            print(f"Ошибка при обработке района {i + 1}: {e}")
+            driver.get(SCHEDULE_URL)
+            continue
+
+
+def _iter_districts_js(driver: WebDriver, indices: Optional[Iterable[int]] = None,
+                       page_ready: bool = False) -> Iterator[DistrictRow]:
+    """
+    Обход через EXTRACT_DISTRICTS_JS: клики и чтение всех названий выполняются внутри страницы,
+    на пачку из DISTRICT_JS_BATCH районов уходит один execute_async_script
+    """
+    _open_schedule(driver, page_ready)
+    total = len(_find_district_buttons(driver))
+    indices = list(range(total) if indices is None else indices)
+    batch_size = DISTRICT_JS_BATCH or len(indices) or 1
+    driver.set_script_timeout(DISTRICT_JS_TIMEOUT_MS / 1000 * 3 * batch_size)
+
+    for start in range(0, len(indices), batch_size):
+        batch = indices[start:start + batch_size]
+        try:
+            rows = driver.execute_async_script(
+                EXTRACT_DISTRICTS_JS, DISTRICT_BUTTONS_XPATH, CLINIC_LIST_XPATH, DISTRICT_LIST_XPATH,
+                batch, DISTRICT_JS_TIMEOUT_MS,
+            )
+        except Exception as e:
+            print(f"Ошибка при обработке районов {batch[0] + 1}..{batch[-1] + 1}: {e}")
+            driver.get(SCHEDULE_URL)
+            continue
+
+        failed = False
+        for row in rows:
+            if row.get("error"):
+                print(f"Ошибка при обработке района {row['index'] + 1}: {row['error']}")
+                failed = True
+            elif len(row["name"]) > 1:
+                if "ms" in row:
+                    district_scrape_seconds.observe(row["ms"] / 1000, district=row["name"], extraction="js")
+                yield row["index"], row["name"], row["clinics"]
+        if failed:
+            driver.get(SCHEDULE_URL)
+
+
+def scrape_districts(driver: WebDriver, indices: Optional[Iterable[int]] = None,
+                     page_ready: bool = False) -> List[DistrictRow]:
+    """Обход районов на одном драйвере с результатом целиком"""
+    return list(iter_districts(driver, indices, page_ready=page_ready))
+
+
+def merge_rows(batches: Iterable[List[DistrictRow]]) -> Dict[str, List[str]]:
+    """Склеивает результаты пачек в порядке районов на странице"""
+    rows = sorted(chain.from_iterable(batches), key=lambda row: row[0])
+    return {name: clinics for _, name, clinics in rows}
+
+
+def split_batches(total: int, workers: int) -> List[List[int]]:
+    """Раскладывает индексы районов по драйверам (round-robin)"""
+    return [list(range(start, total, workers)) for start in range(workers)]
+
+
+def _resolve_workers(pool, workers: Optional[int]) -> int:
+    return max(1, min(workers or DISTRICT_SCRAPE_WORKERS, pool.max_size))
+
+
+async def scrape_with_pool(pool, workers: Optional[int] = None,
+                           indices: Optional[List[int]] = None) -> Dict[str, List[str]]:
+    """
+    Обход районов (по умолчанию — всех) с использованием драйверов из пула.
+    При workers > 1 районы делятся между несколькими драйверами, которые работают параллельно
+    """
+    workers = _resolve_workers(pool, workers)
+    if indices is not None:
+        workers = min(workers, len(indices)) or 1
+
+    if workers == 1:
+        async with pool.get_driver() as driver:
+            rows = await scrape_executor.run(
+                scrape_districts, driver, indices, pool.is_parked_on(driver, SCHEDULE_URL)
+            )
+        return merge_rows([rows])
+
+    if indices is None:
+        # Список районов читаем один раз
+        async with pool.get_driver() as driver:
+            total = await scrape_executor.run(count_districts, driver, pool.is_parked_on(driver, SCHEDULE_URL))
+        indices = list(range(total))
+
+    async def run_batch(batch: List[int]) -> List[DistrictRow]:
+        async with pool.get_driver() as batch_driver:
+            return await scrape_executor.run(
+                scrape_districts, batch_driver, batch, pool.is_parked_on(batch_driver, SCHEDULE_URL)
+            )
+
+    batches = [[indices[i] for i in batch]
+               for batch in split_batches(len(indices), min(workers, len(indices))) if batch]
+    results = await asyncio.gather(*(run_batch(batch) for batch in batches))
+    return merge_rows(results)
+
+
+async def load_district_info(pool, engine: Optional[str] = None, workers: Optional[int] = None,
+                             fetcher=None) -> Dict[str, List[str]]:
+    """
+    Получение районов и поликлиник выбранным способом.
+    В режиме auto сначала идет прямой HTTP-запрос, Selenium используется только если он не удался
+    """
+    engine = (engine or DISTRICT_ENGINE).lower()
+    if engine not in ENGINES:
+        raise ValueError(f"Неизвестный engine: {engine}")
+    fetcher = fetcher or http_fetcher
+
+    if engine in ("auto", "http"):
+        try:
+            return await fetcher.fetch_district_info()
+        except Exception as e:
+            if engine == "http":
+                raise
+            print(f"⚠️ HTTP-получение районов не удалось, откат на Selenium: {e}")
+
+    return await scrape_with_pool(pool, workers)
+
+
+async def refresh_district_info(pool, known: Dict[str, dict], engine: Optional[str] = None,
+                                workers: Optional[int] = None, fetcher=None, full: bool = False
+                                ) -> Tuple[Dict[str, List[str]], List[str], List[str], Dict[str, Optional[str]]]:
+    """
+    Инкрементальное обновление: сначала дешевые сигналы, потом только районы, которые могли измениться.
+    http — условные запросы с ETag, сохраненным в БД вместе с отпечатком района; неизменившиеся приходят как 304;
+    selenium — только список районов, открываются новые и давно не проверенные (pick_stale).
+    known — сохраненное состояние районов (crud.get_district_state).
+    Возвращает (данные перечитанных районов, районы без изменений по 304, все районы на сайте,
+    ETag перечитанных районов — сохраняются вместе с данными)
+    """
+    engine = (engine or DISTRICT_ENGINE).lower()
+    if engine not in ENGINES:
+        raise ValueError(f"Неизвестный engine: {engine}")
+    fetcher = fetcher or http_fetcher
+
+    if engine in ("auto", "http"):
+        try:
+            districts = await fetcher.fetch_districts()
+
+            async def check(district: dict):
+                state = known.get(district["name"]) or {}
+                # Без сохраненного отпечатка 304 нечему доверять — запрашиваем целиком
+                etag = state.get("etag") if not full and state.get("fingerprint") else None
+                return (district["name"], *await fetcher.fetch_clinics_if_changed(district["id"], etag))
+
+            results = await asyncio.gather(*(check(district) for district in districts))
+        except Exception as e:
+            if engine == "http":
+                raise
+            print(f"⚠️ HTTP-получение районов не удалось, откат на Selenium: {e}")
+        else:
+            info = {name: clinics for name, clinics, _ in results if clinics is not None}
+            etags = {name: etag for name, clinics, etag in results if clinics is not None}
+            not_modified = [name for name, clinics, _ in results if clinics is None]
+            return info, not_modified, [name for name, *_ in results], etags
+
+    async with pool.get_driver() as driver:
+        buttons = await scrape_executor.run(list_districts, driver, pool.is_parked_on(driver, SCHEDULE_URL))
+    names = [name for name in buttons if len(name) > 1]
+    if not names:
+        raise RuntimeError("Пустой список районов на странице")
+    targets = set(names if full else pick_stale(names, known))
+    indices = [index for index, name in enumerate(buttons) if name in targets]
+    info = await scrape_with_pool(pool, workers, indices) if indices else {}
+    return info, [], names, {}
+
+
+async def stream_with_pool(pool, workers: Optional[int] = None) -> AsyncIterator[DistrictRow]:
+    """
+    Потоковый обход районов: каждый район отдается сразу, как только он обработан.
+    При workers > 1 районы приходят от нескольких драйверов вперемешку
+    """
+    loop = asyncio.get_event_loop()
+    workers = _resolve_workers(pool, workers)
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()  # клиент отключился — драйверы заканчивают после текущего района
+    done = object()
+
+    def pump(driver: WebDriver, indices: Optional[List[int]], page_ready: bool):
+        for row in iter_districts(driver, indices, page_ready=page_ready):
+            loop.call_soon_threadsafe(queue.put_nowait, row)
+            if stop.is_set():
+                break
+
+    async def run_batch(indices: Optional[List[int]]):
+        try:
+            if stop.is_set():
+                return
+            # Драйвер возвращается в пул только после того, как поток закончил с ним работать
+            async with pool.get_driver() as driver:
+                await scrape_executor.run(pump, driver, indices, pool.is_parked_on(driver, SCHEDULE_URL))
+        except Exception as e:
+            queue.put_nowait(e)
+        finally:
+            queue.put_nowait(done)
+
+    if workers == 1:
+        batches = [None]
+    else:
+        async with pool.get_driver() as driver:
+            total = await scrape_executor.run(count_districts, driver, pool.is_parked_on(driver, SCHEDULE_URL))
+        batches = [batch for batch in split_batches(total, min(workers, total)) if batch]
+
+    for batch in batches:
+        task = asyncio.create_task(run_batch(batch))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    try:
+        pending = len(batches)
+        while pending:
+            item = await queue.get()
+            if item is done:
+                pending -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        stop.set()
+
+
+async def stream_district_info(pool, engine: Optional[str] = None, workers: Optional[int] = None,
+                               fetcher=None) -> AsyncIterator[Tuple[str, List[str]]]:
+    """Потоковый вариант load_district_info: (район, поликлиники) по мере готовности"""
+    engine = (engine or DISTRICT_ENGINE).lower()
+    if engine not in ENGINES:
+        raise ValueError(f"Неизвестный engine: {engine}")
+    fetcher = fetcher or http_fetcher
+    yielded = set()
+
+    if engine in ("auto", "http"):
+        try:
+            districts = await fetcher.fetch_districts()
+        except Exception as e:
+            if engine == "http":
+                raise
+            print(f"⚠️ HTTP-получение районов не удалось, откат на Selenium: {e}")
+        else:
+            async def fetch(district: dict):
+                return district["name"], await fetcher.fetch_clinics(district["id"])
+
+            tasks = [asyncio.create_task(fetch(district)) for district in districts]
+            try:
+                for future in asyncio.as_completed(tasks):
+                    try:
+                        name, clinics = await future
+                    except Exception as e:
+                        if engine == "http":
+                            raise
+                        print(f"⚠️ HTTP-получение поликлиник не удалось, откат на Selenium: {e}")
+                        break
+                    yielded.add(name)
+                    yield name, clinics
+                else:
+                    return
+            finally:
+                # Ошибка или отключение клиента — остальные запросы больше не нужны
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Районы, уже отданные по HTTP, повторно не отдаем
+    async for _, name, clinics in stream_with_pool(pool, workers):
+        if name not in yielded:
+            yield name, clinics
@@ -0,0 +1,22 @@
+"""
+Хэширование паролей. Функции выполняются в дочерних процессах cpu_executor
+и передаются туда по имени, поэтому объявлены на уровне модуля
+"""
+from passlib.context import CryptContext
+
+from app.executors import cpu_executor
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_password(password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(password, hashed_password)
+
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    """Проверка пароля в cpu_executor: bcrypt не блокирует цикл событий"""
+    return await cpu_executor.run(_verify_password, password, hashed_password)
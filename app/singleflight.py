@@ -0,0 +1,56 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class _Call:
+    """Одно выполнение, результат которого ждут несколько вызывающих"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.callers = 1
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых одновременных запросов: пока выполнение с ключом идет,
+    новые вызывающие не запускают его повторно, а ждут тот же результат
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._stats = {"executions": 0, "coalesced": 0, "max_callers": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.create_task(fn()))
+            self._calls[key] = call
+            self._stats["executions"] += 1
+            call.task.add_done_callback(lambda task: self._finish(key, call))
+        else:
+            call.callers += 1
+            self._stats["coalesced"] += 1
+
+        # shield: отключение одного клиента не должно отменять общее выполнение
+        return await asyncio.shield(call.task)
+
+    def _finish(self, key: str, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        self._stats["max_callers"] = max(self._stats["max_callers"], call.callers)
+        if call.callers > 1:
+            print(f"🔗 {key}: {call.callers} запросов объединено в одно выполнение")
+        # Забираем исключение, чтобы не было предупреждения, если все ожидающие отменены
+        if not call.task.cancelled():
+            call.task.exception()
+
+    def get_stats(self):
+        return {
+            **self._stats,
+            "in_flight": len(self._calls),
+            "waiting_callers": sum(call.callers for call in self._calls.values()),
+        }
+
+
+# Глобальный экземпляр для эндпоинтов парсинга
+scrape_flight = SingleFlight()
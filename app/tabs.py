@@ -0,0 +1,293 @@
+"""
+Вкладки как единица параллельности: одна сессия Chrome открывает до DRIVER_TABS_PER_SESSION вкладок,
+и несколько обходов грузят страницы параллельно в одном браузере — памяти и слотов grid нужно меньше,
+чем при отдельной сессии на каждый обход.
+
+WebDriver выполняет команды в текущей вкладке сессии, поэтому команды вкладок сериализуются
+блокировкой сессии с переключением на нужную вкладку. Навигация не держит блокировку
+всю загрузку: страница запускается скриптом, а готовность опрашивается короткими командами —
+в это время остальные вкладки выполняют свои команды
+"""
+import os
+import copy
+import time
+import asyncio
+import threading
+import functools
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver import Chrome
+from selenium.webdriver.remote.command import Command
+
+from app.dependencies import AsyncDriverPool, driver_pool
+
+load_dotenv()
+
+# Метка на старом документе: пока она видна, навигация еще не началась
+_NAVIGATE_JS = "window.__parsergzNavigating = true; window.location.href = arguments[0];"
+_READY_STATE_JS = "return window.__parsergzNavigating ? 'navigating' : document.readyState;"
+
+# Какие document.readyState считаются загрузкой для page_load_strategy
+_READY_STATES = {
+    "normal": ("complete",),
+    "eager": ("interactive", "complete"),
+}
+
+
+class _TabSession:
+    """Сессия Chrome, арендованная у пула драйверов, и ее вкладки"""
+
+    def __init__(self, pool: AsyncDriverPool, driver: Chrome, lease: AsyncExitStack, tabs_per_session: int,
+                 load_timeout: float, poll_interval: float):
+        self.pool = pool
+        self.driver = driver
+        self.lease = lease
+        self.tabs_per_session = tabs_per_session
+        self.load_timeout = load_timeout
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()  # Одна команда сессии за раз
+        self.main_handle: Optional[str] = None
+        self.current_handle: Optional[str] = None
+        self.free: List[Chrome] = []  # Свободные вкладки (копии драйвера, привязанные к своей вкладке)
+        self.tabs = 0
+        self.opening = 0
+        self.failed = False
+
+    @property
+    def busy(self) -> int:
+        return self.tabs + self.opening - len(self.free)
+
+    def has_capacity(self) -> bool:
+        return bool(self.free) or self.tabs + self.opening < self.tabs_per_session
+
+    def _raw(self, command: str, params: dict = None):
+        return self.driver.execute(command, params)
+
+    def _switch(self, handle: str):
+        if self.current_handle != handle:
+            self._raw(Command.SWITCH_TO_WINDOW, {"handle": handle})
+            self.current_handle = handle
+
+    def _execute(self, handle: str, command: str, params: dict = None):
+        """execute() вкладки: команды сессии по очереди, перед каждой — переключение на свою вкладку"""
+        if command == Command.GET:
+            return self._navigate(handle, params["url"])
+        with self.lock:
+            self._switch(handle)
+            return self._raw(command, params)
+
+    def _navigate(self, handle: str, url: str):
+        with self.lock:
+            self._switch(handle)
+            self._raw(Command.W3C_EXECUTE_SCRIPT, {"script": _NAVIGATE_JS, "args": [url]})
+
+        ready_states = _READY_STATES.get(self.pool.page_load_strategy)
+        if ready_states is None:
+            # page_load_strategy=none — как и driver.get, не ждем загрузки
+            return {"value": None}
+        deadline = time.monotonic() + self.load_timeout
+        while True:
+            try:
+                with self.lock:
+                    self._switch(handle)
+                    state = self._raw(Command.W3C_EXECUTE_SCRIPT, {"script": _READY_STATE_JS, "args": []})["value"]
+            except WebDriverException:
+                state = "navigating"  # Документ выгружается посреди скрипта
+            if state in ready_states:
+                return {"value": None}
+            if time.monotonic() > deadline:
+                raise TimeoutException(f"Вкладка не загрузила {url} за {self.load_timeout} с")
+            time.sleep(self.poll_interval)
+
+    def _make_tab(self, handle: str) -> Chrome:
+        # Поверхностная копия делит с драйвером соединение и сессию, но созданные ею элементы
+        # ссылаются на копию — их команды тоже уходят в свою вкладку
+        tab = copy.copy(self.driver)
+        tab.execute = functools.partial(self._execute, handle)
+        # Сессия общая с другими вкладками: app/waits.py ждет опросом, а не одним долгим async-скриптом
+        tab.shared_session = True
+        return tab
+
+    def sync_open_tab(self) -> Chrome:
+        """Первая вкладка — окно сессии, остальные открываются новыми вкладками"""
+        with self.lock:
+            if self.main_handle is None:
+                self.main_handle = self.current_handle = self._raw(Command.W3C_GET_CURRENT_WINDOW_HANDLE)["value"]
+                return self._make_tab(self.main_handle)
+            handle = self._raw(Command.NEW_WINDOW, {"type": "tab"})["value"]["handle"]
+            self._switch(handle)
+            # Блокировка ресурсов через CDP действует на одну вкладку — включаем ее и в новой
+            self.pool.apply_resource_blocking(self.driver)
+            return self._make_tab(handle)
+
+    def sync_close_tabs(self):
+        """Закрывает дополнительные вкладки перед возвратом сессии в пул драйверов"""
+        with self.lock:
+            for handle in self._raw(Command.W3C_GET_WINDOW_HANDLES)["value"]:
+                if handle != self.main_handle:
+                    self._switch(handle)
+                    self._raw(Command.CLOSE)
+            if self.main_handle is not None:
+                self._switch(self.main_handle)
+
+
+class TabPool:
+    """
+    Пул вкладок поверх AsyncDriverPool с тем же интерфейсом get_driver():
+    выдает драйвер, привязанный к отдельной вкладке. Сессии берутся у пула драйверов по мере нужды
+    (не больше DRIVER_TAB_SESSIONS) и возвращаются ему, когда освобождаются все их вкладки.
+    Длинные команды (execute_async_script, неявное ожидание find_element) занимают сессию целиком,
+    поэтому ожидания app/waits.py во вкладках опрашивают страницу короткими командами —
+    выигрыш дают параллельные загрузки страниц и короткие команды
+    """
+
+    def __init__(self, pool: AsyncDriverPool, tabs_per_session: int = None, max_sessions: int = None):
+        self.pool = pool
+        self.tabs_per_session = tabs_per_session or int(os.getenv("DRIVER_TABS_PER_SESSION", "1"))
+        self.max_sessions = max_sessions or int(os.getenv("DRIVER_TAB_SESSIONS") or pool.max_size)
+        self.load_timeout = float(os.getenv("DRIVER_TAB_LOAD_TIMEOUT", "30"))
+        self.poll_interval = float(os.getenv("DRIVER_TAB_POLL_INTERVAL", "0.05"))
+        self._sessions: List[_TabSession] = []
+        self._leasing = 0
+        self._tab_available = asyncio.Condition()
+        self._stats = {"leases": 0, "tabs_opened": 0, "sessions_leased": 0, "waits": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.tabs_per_session > 1
+
+    @property
+    def max_size(self) -> int:
+        return self.max_sessions * self.tabs_per_session
+
+    @property
+    def pool_size(self) -> int:
+        return self.max_size
+
+    def is_parked_on(self, driver: Chrome, url: str) -> bool:
+        # Вкладки не паркуются — каждая выдача открывает страницу сама
+        return False
+
+    def is_saturated(self) -> bool:
+        """Нет свободной вкладки и новую сессию взять негде"""
+        if any(not session.failed and session.has_capacity() for session in self._sessions):
+            return False
+        return len(self._sessions) + self._leasing >= self.max_sessions or self.pool.is_saturated()
+
+    def get_readiness(self) -> dict:
+        return self.pool.get_readiness()
+
+    @asynccontextmanager
+    async def get_driver(self, clean: Optional[str] = None):
+        """Выдает драйвер одной вкладки; clean — режим очистки сессии при аренде у пула драйверов"""
+        session, tab = await self._checkout(clean)
+        try:
+            yield tab
+        except Exception:
+            session.failed = True
+            raise
+        finally:
+            await self._checkin(session, tab)
+
+    async def _checkout(self, clean: Optional[str]):
+        while True:
+            async with self._tab_available:
+                while True:
+                    # Сначала догружаем уже арендованные сессии, самые занятые — первыми
+                    candidates = [session for session in self._sessions
+                                  if not session.failed and session.has_capacity()]
+                    if candidates:
+                        session = max(candidates, key=lambda item: item.busy)
+                        break
+                    if len(self._sessions) + self._leasing < self.max_sessions:
+                        session = None
+                        self._leasing += 1
+                        break
+                    self._stats["waits"] += 1
+                    await self._tab_available.wait()
+                if session is not None:
+                    if session.free:
+                        tab = session.free.pop()
+                        self._stats["leases"] += 1
+                        return session, tab
+                    session.opening += 1
+
+            if session is None:
+                try:
+                    session = await self._lease_session(clean)
+                finally:
+                    async with self._tab_available:
+                        self._leasing -= 1
+                        if session is not None:
+                            self._sessions.append(session)
+                            session.opening += 1
+                        self._tab_available.notify_all()
+
+            try:
+                tab = await self.pool._run(session.sync_open_tab)
+            except Exception:
+                session.failed = True
+                async with self._tab_available:
+                    session.opening -= 1
+                await self._maybe_release(session)
+                raise
+            async with self._tab_available:
+                session.opening -= 1
+                session.tabs += 1
+            self._stats["tabs_opened"] += 1
+            self._stats["leases"] += 1
+            return session, tab
+
+    async def _lease_session(self, clean: Optional[str]) -> _TabSession:
+        lease = AsyncExitStack()
+        driver = await lease.enter_async_context(self.pool.get_driver(clean))
+        self._stats["sessions_leased"] += 1
+        return _TabSession(self.pool, driver, lease, self.tabs_per_session, self.load_timeout, self.poll_interval)
+
+    async def _checkin(self, session: _TabSession, tab: Chrome):
+        async with self._tab_available:
+            session.free.append(tab)
+            self._tab_available.notify()
+        await self._maybe_release(session)
+
+    async def _maybe_release(self, session: _TabSession):
+        """Возвращает сессию пулу драйверов, когда у нее не осталось занятых вкладок"""
+        async with self._tab_available:
+            if session.busy or session not in self._sessions:
+                return
+            self._sessions.remove(session)
+            self._tab_available.notify_all()
+
+        error = None
+        try:
+            await self.pool._run(session.sync_close_tabs)
+        except Exception as e:
+            error = e
+        if session.failed and error is None:
+            error = RuntimeError("Ошибка в одной из вкладок сессии")
+        if error is not None:
+            # Пул драйверов проверит сессию и при необходимости заменит ее
+            await session.lease.__aexit__(type(error), error, None)
+        else:
+            await session.lease.aclose()
+
+    def get_stats(self):
+        return {
+            **self._stats,
+            "tabs_per_session": self.tabs_per_session,
+            "max_sessions": self.max_sessions,
+            "sessions": len(self._sessions),
+            "tabs_in_use": sum(session.busy for session in self._sessions),
+        }
+
+
+# Глобальный пул вкладок поверх общего пула драйверов
+tab_pool = TabPool(driver_pool)
+
+
+def scrape_pool():
+    """Пул для парсинга: вкладки, если DRIVER_TABS_PER_SESSION > 1, иначе сессии целиком"""
+    return tab_pool if tab_pool.enabled else driver_pool
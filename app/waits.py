@@ -0,0 +1,208 @@
+"""
+Адаптивные ожидания вместо неявного ожидания и фиксированных WebDriverWait(driver, 10).
+
+Ожидание выполняется внутри страницы одним execute_async_script (во вкладках app/tabs.py, которые делят
+сессию, — опросом короткими execute_script): элементы найдены, DOM не меняется quiet_ms и нет незавершенных fetch/XHR. Поэтому список поликлиник возвращается целиком, а не по первому div.
+Таймаут каждого локатора считается по наблюдаемым задержкам (p99 * factor в пределах [min, max]):
+на удачном пути ожидание заканчивается, как только данные стабильны, а сломанная страница падает быстро
+"""
+import os
+import time
+import threading
+from collections import deque
+from typing import Deque, Dict, List
+
+from dotenv import load_dotenv
+from selenium.common.exceptions import TimeoutException
+
+load_dotenv()
+
+# Общая часть скриптов ожидания: счетчик незавершенных fetch/XHR, время последнего изменения DOM
+# и элементы, выданные прошлыми ожиданиями, ставятся один раз на документ и живут между вызовами
+_WAIT_PRELUDE = """
+const state = window.__parsergzWait || (() => {
+    // До установки наблюдателя изменений не видно: загруженный документ считаем затихшим
+    const state = {pending: new Map(), seq: 0, netLast: 0,
+                   domLast: document.readyState === 'complete' ? 0 : Date.now(), seen: {}};
+    const begin = () => { const id = ++state.seq; state.pending.set(id, Date.now()); state.netLast = Date.now(); return id; };
+    const end = (id) => { state.pending.delete(id); state.netLast = Date.now(); };
+    if (window.fetch) {
+        const originalFetch = window.fetch;
+        window.fetch = function (...args) {
+            const id = begin();
+            return originalFetch.apply(this, args).finally(() => end(id));
+        };
+    }
+    const originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function (...args) {
+        const id = begin();
+        this.addEventListener('loadend', () => end(id), {once: true});
+        return originalSend.apply(this, args);
+    };
+    new MutationObserver(() => { state.domLast = Date.now(); })
+        .observe(document.documentElement, {childList: true, subtree: true, characterData: true});
+    window.__parsergzWait = state;
+    return state;
+})();
+// Элементы по xpath и готовность: их не меньше minCount, DOM и сеть молчат quietMs.
+// fresh — не принимать результат прошлого ожидания этого xpath (поликлиники предыдущего района):
+// те же узлы с тем же текстом. Узлы, переиспользованные под новый текст, и новые узлы считаются свежими
+const probe = (xpath, quietMs, minCount, fresh, requestMaxMs) => {
+    const snapshot = document.evaluate(xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    const nodes = [];
+    for (let i = 0; i < snapshot.snapshotLength; i++) nodes.push(snapshot.snapshotItem(i));
+    const text = nodes.map((node) => node.textContent).join('\\n');
+    const last = state.seen[xpath];
+    const stale = fresh && last && last.text === text && nodes.every((node) => last.nodes.has(node));
+    const now = Date.now();
+    // Долгие соединения (requestMaxMs и больше) не должны блокировать сетевую тишину
+    const inflight = [...state.pending.values()].filter((at) => now - at < requestMaxMs).length;
+    const stable = !stale && nodes.length >= minCount && !inflight
+        && now - Math.max(state.domLast, state.netLast) >= quietMs;
+    if (stable) state.seen[xpath] = {nodes: new WeakSet(nodes), text};
+    return {stable, nodes: stale ? [] : nodes, inflight};
+};
+"""
+
+# Ожидание одним execute_async_script, проверка каждые 25 мс внутри страницы.
+# Аргументы: XPath, тишина (мс), таймаут (мс), мин. кол-во элементов, fresh, предел "живого" запроса (мс), callback
+WAIT_STABLE_JS = """
+const [xpath, quietMs, timeoutMs, minCount, fresh, requestMaxMs, done] = arguments;
+""" + _WAIT_PRELUDE + """
+const started = Date.now();
+let timer = null;
+const check = () => {
+    const result = probe(xpath, quietMs, minCount, fresh, requestMaxMs);
+    if (result.stable) {
+        clearInterval(timer);
+        done(result.nodes);
+    } else if (Date.now() - started > timeoutMs) {
+        clearInterval(timer);
+        done({error: 'timeout', found: result.nodes.length, inflight: result.inflight});
+    }
+};
+timer = setInterval(check, 25);
+check();
+"""
+
+# Одна проверка без ожидания — для вкладок, делящих сессию: опрос короткими командами
+# не держит сессию на все время ожидания. Аргументы те же, без таймаута и callback
+WAIT_POLL_JS = """
+const [xpath, quietMs, minCount, fresh, requestMaxMs] = arguments;
+""" + _WAIT_PRELUDE + """
+const result = probe(xpath, quietMs, minCount, fresh, requestMaxMs);
+return result.stable ? result.nodes : {pending: true, found: result.nodes.length, inflight: result.inflight};
+"""
+
+
+class LocatorLatency:
+    """Скользящее окно длительностей ожиданий одного локатора (вместе с истекшими)"""
+
+    def __init__(self, window: int):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.timeouts = 0
+
+    def percentile(self, q: float) -> float:
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+class AdaptiveWaiter:
+    """Ожидание стабильных элементов с таймаутом, выученным по задержкам каждого локатора"""
+
+    def __init__(self, default_timeout: float = None, min_timeout: float = None, max_timeout: float = None,
+                 factor: float = None, min_samples: int = None, quiet_ms: int = None, window: int = None):
+        # Таймаут, пока наблюдений мало
+        self.default_timeout = default_timeout or float(os.getenv("WAIT_DEFAULT_TIMEOUT", "10"))
+        self.min_timeout = min_timeout or float(os.getenv("WAIT_MIN_TIMEOUT", "2"))
+        self.max_timeout = max_timeout or float(os.getenv("WAIT_MAX_TIMEOUT", "15"))
+        self.factor = factor or float(os.getenv("WAIT_TIMEOUT_FACTOR", "3"))
+        self.min_samples = min_samples or int(os.getenv("WAIT_MIN_SAMPLES", "20"))
+        # Сколько DOM и сеть должны молчать, чтобы данные считались стабильными
+        self.quiet_ms = quiet_ms if quiet_ms is not None else int(os.getenv("WAIT_QUIET_MS", "100"))
+        self.request_max_ms = int(os.getenv("WAIT_REQUEST_MAX_MS", "3000"))
+        self.window = window or int(os.getenv("WAIT_WINDOW", "200"))
+        # Интервал опроса для вкладок, которые делят сессию (app/tabs.py)
+        self.poll_interval = float(os.getenv("WAIT_POLL_INTERVAL", "0.05"))
+        self._locators: Dict[str, LocatorLatency] = {}
+        self._lock = threading.Lock()  # Ожидания идут из потоков парсинга
+
+    def _latency(self, name: str) -> LocatorLatency:
+        latency = self._locators.get(name)
+        if latency is None:
+            latency = self._locators[name] = LocatorLatency(self.window)
+        return latency
+
+    def timeout_for(self, name: str) -> float:
+        with self._lock:
+            latency = self._latency(name)
+            if len(latency.samples) < self.min_samples:
+                return self.default_timeout
+            learned = latency.percentile(0.99) * self.factor
+        return min(self.max_timeout, max(self.min_timeout, learned))
+
+    def observe(self, name: str, seconds: float, timed_out: bool = False):
+        with self._lock:
+            latency = self._latency(name)
+            # Таймаут тоже идет в окно: если сайт замедлился, выученный таймаут растет, а не душит обход
+            latency.samples.append(seconds)
+            if timed_out:
+                latency.timeouts += 1
+
+    def until_stable(self, driver, xpath: str, name: str, min_count: int = 1, fresh: bool = False) -> List:
+        """
+        Элементы по xpath, когда их не меньше min_count, DOM и сеть затихли; fresh — не принимать
+        прошлый результат этого xpath на странице (те же узлы с тем же текстом). TimeoutException, если не дождались
+        """
+        timeout = self.timeout_for(name)
+        started = time.perf_counter()
+        if getattr(driver, "shared_session", False):
+            result = self._poll(driver, xpath, timeout, min_count, fresh)
+        else:
+            result = driver.execute_async_script(
+                WAIT_STABLE_JS, xpath, self.quiet_ms, int(timeout * 1000), min_count, fresh,
+                self.request_max_ms,
+            )
+        elapsed = time.perf_counter() - started
+        if isinstance(result, dict) and result.get("error"):
+            self.observe(name, elapsed, timed_out=True)
+            raise TimeoutException(
+                f"{name}: нет стабильных элементов за {timeout:.1f} с "
+                f"(найдено {result.get('found')}, запросов в полете {result.get('inflight')})"
+            )
+        self.observe(name, elapsed)
+        return result
+
+    def _poll(self, driver, xpath: str, timeout: float, min_count: int, fresh: bool):
+        """Ожидание короткими execute_script: между проверками сессия свободна для соседних вкладок"""
+        deadline = time.perf_counter() + timeout
+        while True:
+            result = driver.execute_script(
+                WAIT_POLL_JS, xpath, self.quiet_ms, min_count, fresh, self.request_max_ms
+            )
+            if not isinstance(result, dict):
+                return result
+            if time.perf_counter() > deadline:
+                return {"error": "timeout", "found": result.get("found"), "inflight": result.get("inflight")}
+            time.sleep(self.poll_interval)
+
+    def get_stats(self):
+        with self._lock:
+            names = list(self._locators)
+        stats = {}
+        for name in names:
+            timeout = self.timeout_for(name)
+            with self._lock:
+                latency = self._locators[name]
+                stats[name] = {
+                    "samples": len(latency.samples),
+                    "timeouts": latency.timeouts,
+                    "p50_ms": round(latency.percentile(0.5) * 1000, 1),
+                    "p99_ms": round(latency.percentile(0.99) * 1000, 1),
+                    "timeout_seconds": round(timeout, 2),
+                }
+        return stats
+
+
+# Глобальный экземпляр: таймауты учатся на всех драйверах процесса
+adaptive_wait = AdaptiveWaiter()
@@ -0,0 +1,153 @@
+"""
+Воркер парсинга: держит свой пул драйверов, читает задачи из Kafka и публикует результаты.
+Запуск: python -m app.worker
+Несколько воркеров в одной consumer group делят партиции топика задач между собой
+"""
+import os
+import time
+import socket
+import signal
+import asyncio
+from typing import Awaitable, Callable, Dict, List
+
+from app import crud
+from app.changes import change_feed
+from app.dependencies import AsyncDriverPool
+from app.executors import db_executor, shutdown_executors
+from app.metrics import current_endpoint
+from app.kafka_queue import SCRAPE_JOBS_TOPIC, SCRAPE_RESULTS_TOPIC, KafkaBroker, create_broker
+from app.scraper import load_district_info, refresh_district_info
+from app.tabs import TabPool
+
+SCRAPE_WORKER_GROUP = os.getenv("SCRAPE_WORKER_GROUP", "scrape-workers")
+
+
+async def handle_district(pool, params: dict):
+    info = await load_district_info(pool, params.get("engine"), params.get("workers"))
+    change_feed.publish(await db_executor.run(crud.store_district_info, info))
+    return {"district_buttons": info}
+
+
+async def handle_district_refresh(pool, params: dict):
+    """Инкрементальное обновление: перечитываются только районы, которые могли измениться"""
+    known = await db_executor.run(crud.load_district_state)
+    info, not_modified, districts, etags = await refresh_district_info(
+        pool, known, params.get("engine"), params.get("workers"), full=bool(params.get("full")),
+    )
+    present = set(districts)
+    removed = [name for name in known if name not in present]
+    changes = await db_executor.run(crud.store_district_info, info, removed, not_modified, etags)
+    change_feed.publish(changes)
+    return {
+        "districts": len(districts),
+        "rescraped": len(info),
+        "not_modified": len(not_modified),
+        "skipped": len(districts) - len(info) - len(not_modified),
+        "removed": removed,
+        "changes": changes,
+    }
+
+
+# Обработчики задач по типу
+JOB_HANDLERS: Dict[str, Callable[[AsyncDriverPool, dict], Awaitable[dict]]] = {
+    "district": handle_district,
+    "district_refresh": handle_district_refresh,
+}
+
+
+class ScrapeWorker:
+    """
+    Читает задачи пачками (getmany) и обрабатывает партиции параллельно:
+    внутри партиции задачи идут по порядку, offset'ы коммитятся после обработки пачки
+    """
+
+    def __init__(self, broker, pool, group_id: str = None, jobs_topic: str = None,
+                 results_topic: str = None, handlers: Dict[str, Callable] = None, max_records: int = None):
+        self.broker = broker
+        self.pool = pool
+        self.group_id = group_id or SCRAPE_WORKER_GROUP
+        self.jobs_topic = jobs_topic or SCRAPE_JOBS_TOPIC
+        self.results_topic = results_topic or SCRAPE_RESULTS_TOPIC
+        self.handlers = handlers or JOB_HANDLERS
+        self.max_records = max_records or pool.pool_size
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._stopping = False
+        self._stats = {"processed": 0, "failed": 0}
+
+    async def run(self):
+        consumer = self.broker.consumer(self.jobs_topic, self.group_id)
+        await consumer.start()
+        print(f"👷 Воркер {self.worker_id} слушает {self.jobs_topic} (group={self.group_id})")
+        try:
+            while not self._stopping:
+                batches = await consumer.getmany(timeout_ms=1000, max_records=self.max_records)
+                if not batches:
+                    continue
+                await asyncio.gather(*(self._process_partition(messages) for messages in batches.values()))
+                await consumer.commit()
+        finally:
+            await consumer.stop()
+
+    def stop(self):
+        self._stopping = True
+
+    async def _process_partition(self, messages: List):
+        for message in messages:
+            await self.process(message.value)
+
+    async def process(self, job: dict):
+        """Выполняет одну задачу и публикует ее результат"""
+        started_at = time.time()
+        current_endpoint.set(f"job:{job.get('type')}")
+        handler = self.handlers.get(job.get("type"))
+        # Статус running уходит в тот же топик и партицию (ключ job_id), что и итог задачи
+        await self._publish(job, {"status": "running"}, started_at)
+        try:
+            if handler is None:
+                raise ValueError(f"Неизвестный тип задачи: {job.get('type')}")
+            payload = {"status": "done", "result": await handler(self.pool, job.get("params") or {})}
+            self._stats["processed"] += 1
+        except Exception as e:
+            print(f"❌ Задача {job.get('job_id')} завершилась ошибкой: {e}")
+            payload = {"status": "failed", "error": str(e)}
+            self._stats["failed"] += 1
+
+        payload["finished_at"] = time.time()
+        await self._publish(job, payload, started_at)
+
+    async def _publish(self, job: dict, payload: dict, started_at: float):
+        payload.update(
+            job_id=job.get("job_id"),
+            type=job.get("type"),
+            worker=self.worker_id,
+            started_at=started_at,
+        )
+        await self.broker.send(self.results_topic, payload, key=job.get("job_id"))
+
+    def get_stats(self):
+        return {**self._stats, "worker": self.worker_id, "group_id": self.group_id}
+
+
+async def main():
+    broker = create_broker() or KafkaBroker()
+    pool = AsyncDriverPool(pool_size=int(os.getenv("WORKER_DRIVER_POOL_SIZE") or os.getenv("DRIVER_POOL_SIZE", "2")))
+    tabs = TabPool(pool)
+    worker = ScrapeWorker(broker, tabs if tabs.enabled else pool)
+
+    loop = asyncio.get_event_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    await broker.start()
+    await pool.initialize()
+    try:
+        await worker.run()
+    finally:
+        await pool.close_all()
+        await broker.stop()
+        shutdown_executors()
+        print("🛑 Воркер остановлен")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
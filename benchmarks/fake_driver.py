@@ -0,0 +1,124 @@
+"""
+Поддельный WebDriver для бенчмарков пула без браузера: воспроизводит состояние страницы расписания
+(список районов -> поликлиники -> назад) и тратит заданное время на каждую команду,
+так что меряются очередь пула, потоки и код парсинга, а не Chrome
+"""
+import time
+from typing import List
+
+from selenium.common.exceptions import NoSuchElementException
+
+from app.scraper import CLINIC_LIST_XPATH, DISTRICT_BUTTONS_XPATH, DISTRICT_LIST_XPATH
+from app.waits import WAIT_STABLE_JS
+from benchmarks.fixture_site import clinic_name, district_name
+
+
+class FakeElement:
+    def __init__(self, driver: "FakeWebDriver", text: str, district: int = None):
+        self._driver = driver
+        self.text = text
+        self._district = district
+
+    def click(self):
+        self._driver._command()
+        if self._district is not None:
+            self._driver._open_district(self._district)
+
+
+class FakeWebDriver:
+    def __init__(self, districts: int = 18, clinics: int = 10, command_latency: float = 0.002,
+                 page_latency: float = 0.1, data_latency: float = 0.05, session_latency: float = 0.0):
+        self.districts = districts
+        self.clinics = clinics
+        self.command_latency = command_latency
+        self.page_latency = page_latency
+        self.data_latency = data_latency
+        self.current_url = "about:blank"
+        self.session_id = f"fake-{id(self):x}"
+        self._district = None  # None — открыт список районов
+        self.commands = 0
+        time.sleep(session_latency)
+
+    def _command(self, latency: float = None):
+        self.commands += 1
+        time.sleep(self.command_latency if latency is None else latency)
+
+    def _open_district(self, index: int):
+        # Клик по району: список пропадает, поликлиники приходят через data_latency
+        self._district = index
+        time.sleep(self.data_latency)
+
+    def get(self, url: str):
+        self._command(self.page_latency if url != "about:blank" else None)
+        self.current_url = url
+        self._district = None
+
+    def back(self):
+        self._command()
+        self._district = None
+
+    def find_elements(self, by=None, value=None) -> List[FakeElement]:
+        self._command()
+        if self.current_url == "about:blank":
+            return []
+        if value == DISTRICT_BUTTONS_XPATH and self._district is None:
+            return [FakeElement(self, district_name(i), i) for i in range(self.districts)]
+        if value == DISTRICT_LIST_XPATH:
+            return [FakeElement(self, "")]
+        if value == CLINIC_LIST_XPATH and self._district is not None:
+            return [FakeElement(self, f"{clinic_name(self._district, i)}\nул. Тестовая, д. {i + 1}")
+                    for i in range(self.clinics)]
+        return []
+
+    def find_element(self, by=None, value=None) -> FakeElement:
+        elements = self.find_elements(by, value)
+        if not elements:
+            raise NoSuchElementException(value)
+        return elements[0]
+
+    def execute_script(self, script, *args):
+        self._command()
+
+    def execute_async_script(self, script, *args):
+        if script == WAIT_STABLE_JS:
+            return self._wait_stable(*args)
+        return self._extract_districts(*args)
+
+    def _wait_stable(self, xpath, quiet_ms, timeout_ms, min_count, fresh, request_max_ms):
+        """Ожидание app/waits.py: элементы уже на месте, но стабильность подтверждается тишиной quiet_ms"""
+        self._command(self.command_latency + quiet_ms / 1000)
+        elements = self.find_elements(value=xpath)
+        if len(elements) < min_count:
+            time.sleep(timeout_ms / 1000)
+            return {"error": "timeout", "found": len(elements), "inflight": 0}
+        return elements
+
+    def _extract_districts(self, buttons_xpath, clinics_xpath, list_xpath, indices, timeout_ms):
+        """Режим DISTRICT_EXTRACTION=js: один вызов на пачку, внутри — те же задержки, но без round-trip'ов"""
+        self._command()
+        rows = []
+        for index in indices:
+            started = time.perf_counter()
+            time.sleep(self.data_latency)
+            rows.append({
+                "index": index,
+                "name": district_name(index),
+                "clinics": [clinic_name(index, i) for i in range(self.clinics)],
+                "ms": (time.perf_counter() - started) * 1000,
+            })
+        return rows
+
+    def delete_all_cookies(self):
+        self._command()
+
+    def set_window_size(self, width, height):
+        pass
+
+    def set_script_timeout(self, seconds):
+        pass
+
+    def implicitly_wait(self, seconds):
+        pass
+
+    def quit(self):
+        pass
@@ -0,0 +1,243 @@
+"""
+Локальная копия страницы расписания gorzdrav.spb.ru для бенчмарков без интернета.
+
+Список районов лежит ровно по DISTRICT_LIST_XPATH, поликлиники рендерятся в #serviceMoOutput
+после клика по району (запрос к /fixture/clinics/<i> с задержкой), "Назад" возвращает список —
+как и на настоящем сайте. Там же отдается JSON API (/_api/api/v2/shared/..., /schedule/...)
+для движка http и обхода талонов (app/crawl.py).
+
+Запуск отдельно:
+    python -m benchmarks.fixture_site --port 8766 --latency 0.1
+"""
+import json
+import time
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+API_PREFIX = "/_api/api/v2"
+SCHEDULE_PATH = "/service-free-schedule"
+
+
+def district_name(index: int) -> str:
+    return f"Район {index + 1}"
+
+
+def clinic_name(district: int, index: int) -> str:
+    return f"Поликлиника {district + 1}-{index + 1}"
+
+
+def lpu_id(district: int, index: int) -> int:
+    return (district + 1) * 1000 + index + 1
+
+
+SPECIALTIES = ("Терапевт", "Хирург", "Офтальмолог", "Невролог", "Оториноларинголог")
+
+
+def _nest(levels) -> Tuple[str, str]:
+    """Открывающие и закрывающие теги: на каждом уровне (кол-во соседей перед нужным div) добавляется вложенность"""
+    opening, closing = "", ""
+    for fillers in levels:
+        opening += '<div class="filler"></div>' * fillers + "<div>"
+        closing = "</div>" + closing
+    return opening, closing
+
+
+# /html/body/div/div[1]/div[12]/div[3]/div[1]/div[2]/div[1]/div/div[1]/ul — кол-во div перед нужным на каждом уровне
+_LIST_LEVELS = (0, 11, 2, 0, 1, 0, 0, 0)
+
+PAGE_SCRIPT = """
+const districts = %(districts)s;
+const list = document.getElementById('districts');
+const output = document.getElementById('serviceMoOutput');
+const renderList = () => {
+    list.innerHTML = '';
+    districts.forEach((name, index) => {
+        const item = document.createElement('li');
+        item.textContent = name;
+        item.onclick = () => openDistrict(index);
+        list.appendChild(item);
+    });
+};
+const openDistrict = (index) => {
+    list.innerHTML = '';
+    history.pushState({district: index}, '', '#district-' + index);
+    fetch('/fixture/clinics/' + index).then((r) => r.json()).then((clinics) => {
+        if (!history.state || history.state.district !== index) return;
+        output.innerHTML = '';
+        clinics.forEach((clinic) => {
+            const row = document.createElement('div');
+            row.innerHTML = '<b></b><br><span></span>';
+            row.querySelector('b').textContent = clinic.name;
+            row.querySelector('span').textContent = clinic.address;
+            output.appendChild(row);
+        });
+    });
+};
+window.addEventListener('popstate', () => { output.innerHTML = ''; renderList(); });
+renderList();
+"""
+
+
+class FixtureSiteHandler(BaseHTTPRequestHandler):
+    districts = 18
+    clinics = 10
+    specialties = 3  # специальностей в поликлинике
+    doctors = 2  # врачей на специальность
+    slots = 5  # талонов у врача
+    latency = 0.05  # задержка на каждый запрос данных (клик по району, API)
+    page_latency = 0.1
+    padding_kb = 0  # лишний текст на странице — имитация тяжелой разметки
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0].split("#", 1)[0]
+        if path in ("/", SCHEDULE_PATH):
+            time.sleep(self.page_latency)
+            return self._send(self._page().encode("utf-8"), "text/html; charset=utf-8")
+        if path.startswith("/fixture/clinics/"):
+            district = self._index(path.rsplit("/", 1)[-1])
+            if district is None:
+                return self._not_found()
+            time.sleep(self.latency)
+            return self._send_json([
+                {"name": clinic_name(district, i), "address": f"ул. Тестовая, д. {i + 1}"}
+                for i in range(self.clinics)
+            ])
+        if path == API_PREFIX + "/shared/districts":
+            time.sleep(self.latency)
+            return self._send_json({"success": True, "result": [
+                {"id": i + 1, "name": district_name(i)} for i in range(self.districts)
+            ]})
+        if path.startswith(API_PREFIX + "/shared/district/") and path.endswith("/lpus"):
+            district = self._index(path.split("/")[-2], offset=1)
+            if district is None:
+                return self._not_found()
+            time.sleep(self.latency)
+            return self._send_json({"success": True, "result": [
+                {"id": lpu_id(district, i), "lpuFullName": clinic_name(district, i), "lpuShortName": f"П{i + 1}"}
+                for i in range(self.clinics)
+            ]})
+        if path.startswith(API_PREFIX + "/schedule/lpu/"):
+            return self._schedule(path[len(API_PREFIX + "/schedule/lpu/"):].split("/"))
+        return self._not_found()
+
+    def _schedule(self, parts):
+        """Специальности, врачи и талоны: у каждого второго врача свободных талонов нет"""
+        time.sleep(self.latency)
+        if len(parts) == 2 and parts[1] == "specialties":
+            return self._send_json({"success": True, "result": [
+                {"id": str(i + 1), "name": SPECIALTIES[i % len(SPECIALTIES)], "countFreeTicket": self.slots}
+                for i in range(self.specialties)
+            ]})
+        if len(parts) == 4 and parts[1] == "speciality" and parts[3] == "doctors":
+            return self._send_json({"success": True, "result": [
+                {"id": f"{parts[2]}{i + 1:02d}", "name": f"Врач {parts[2]}-{i + 1}",
+                 "freeTicketCount": self.slots if i % 2 == 0 else 0}
+                for i in range(self.doctors)
+            ]})
+        if len(parts) == 4 and parts[1] == "doctor" and parts[3] == "appointments":
+            return self._send_json({"success": True, "result": [
+                {"id": f"{parts[0]}-{parts[2]}-{i}", "visitStart": f"2030-01-{i % 28 + 1:02d}T09:{i % 60:02d}:00"}
+                for i in range(self.slots)
+            ]})
+        return self._not_found()
+
+    def _index(self, raw: str, offset: int = 0):
+        try:
+            index = int(raw) - offset
+        except ValueError:
+            return None
+        return index if 0 <= index < self.districts else None
+
+    def _page(self) -> str:
+        opening, closing = _nest(_LIST_LEVELS)
+        script = PAGE_SCRIPT % {"districts": json.dumps([district_name(i) for i in range(self.districts)],
+                                                       ensure_ascii=False)}
+        padding = f'<p style="display:none">{"x" * self.padding_kb * 1024}</p>' if self.padding_kb else ""
+        return (
+            "<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Расписание (фикстура)</title></head>"
+            f"<body><div>{opening}<ul id=\"districts\"></ul>{closing}"
+            f"<div id=\"serviceMoOutput\"></div>{padding}</div>"
+            f"<script>{script}</script></body></html>"
+        )
+
+    def _send_json(self, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        # ETag как у настоящего API — для условных запросов инкрементального обновления
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self._send(body, "application/json; charset=utf-8", {"ETag": etag})
+
+    def _send(self, body: bytes, content_type: str, headers: dict = None):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_found(self):
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def start_fixture_site(port: int = 8766, host: str = "0.0.0.0", **config) -> ThreadingHTTPServer:
+    """Запускает фикстуру в фоновом потоке; config — атрибуты FixtureSiteHandler (districts, latency, ...)"""
+    handler = type("ConfiguredFixtureSiteHandler", (FixtureSiteHandler,), config)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_fixture_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--districts", type=int, default=18)
+    parser.add_argument("--clinics", type=int, default=10, help="поликлиник в районе")
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка запроса данных, с")
+    parser.add_argument("--page-latency", type=float, default=0.1, help="задержка загрузки страницы, с")
+    parser.add_argument("--padding-kb", type=int, default=0, help="лишний размер страницы, КБ")
+    parser.add_argument("--specialties", type=int, default=3, help="специальностей в поликлинике")
+    parser.add_argument("--doctors", type=int, default=2, help="врачей на специальность")
+    parser.add_argument("--slots", type=int, default=5, help="талонов у врача")
+
+
+def fixture_config(args) -> dict:
+    return {
+        "districts": args.districts,
+        "clinics": args.clinics,
+        "latency": args.latency,
+        "page_latency": args.page_latency,
+        "padding_kb": args.padding_kb,
+        "specialties": args.specialties,
+        "doctors": args.doctors,
+        "slots": args.slots,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_fixture_arguments(parser)
+    args = parser.parse_args()
+    server = start_fixture_site(args.port, **fixture_config(args))
+    print(f"🧪 Фикстура: http://127.0.0.1:{args.port}{SCHEDULE_PATH}, API: http://127.0.0.1:{args.port}{API_PREFIX}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Нагрузочный бенчмарк обхода районов без интернета: пропускная способность, p50/p99 времени запроса
+и ожидание драйвера из пула для разных размеров пула и уровней параллельности.
+
+Цели (--target):
+    fake   — поддельный WebDriver (benchmarks/fake_driver.py): пул, потоки и код парсинга без браузера
+    chrome — настоящий Chrome (локальный или selenium) против фикстуры benchmarks/fixture_site.py
+    http   — GorzdravHttpFetcher против JSON API фикстуры; размер пула = кол-во соединений
+
+Примеры:
+    python -m benchmarks.load --pool-sizes 1,2,4 --concurrency 1,4,16
+    SELENIUM_REMOTE=false python -m benchmarks.load --target chrome --requests 8
+    python -m benchmarks.load --target chrome --public-host host.docker.internal
+Регрессии: сохранить результат --output base.json, затем сравнить --baseline base.json —
+код выхода 1, если p50 какого-то случая вырос больше чем на --tolerance
+"""
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app import scraper
+from app.dependencies import AsyncDriverPool
+from app.fetcher import GorzdravHttpFetcher
+from benchmarks.fake_driver import FakeWebDriver
+from benchmarks.fixture_site import API_PREFIX, SCHEDULE_PATH, add_fixture_arguments, fixture_config, \
+    start_fixture_site
+
+
+class TimedPool(AsyncDriverPool):
+    """Пул, который запоминает, сколько ждал каждый запрос драйвера"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waits: List[float] = []
+
+    @asynccontextmanager
+    async def get_driver(self, clean: Optional[str] = None):
+        started = time.perf_counter()
+        async with super().get_driver(clean) as driver:
+            self.waits.append(time.perf_counter() - started)
+            yield driver
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    # Метод ближайшего ранга
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+async def run_case(job: Callable[[], Awaitable[int]], concurrency: int, requests: int, expected: int) -> dict:
+    """requests вызовов job не более чем по concurrency одновременно; job возвращает кол-во районов"""
+    limit = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        async with limit:
+            started = time.perf_counter()
+            try:
+                if await job() != expected:
+                    errors += 1
+            except Exception as e:
+                errors += 1
+                print(f"⚠️ Ошибка запроса: {e}", file=sys.stderr)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput": round(requests / elapsed, 3),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+    }
+
+
+def _make_pool(args, size: int) -> TimedPool:
+    pool = TimedPool(pool_size=size, min_size=size, max_size=size)
+    if args.target == "fake":
+        pool.selenium_remote = False
+        pool._create_driver = lambda: FakeWebDriver(
+            districts=args.districts, clinics=args.clinics, command_latency=args.command_latency,
+            page_latency=args.page_latency, data_latency=args.latency, session_latency=args.session_latency,
+        )
+    return pool
+
+
+async def bench_pool(args, size: int, concurrency: int) -> dict:
+    pool = _make_pool(args, size)
+    await pool.initialize()
+    await pool._initialization_task
+    try:
+        async def job():
+            return len(await scraper.scrape_with_pool(pool, args.workers))
+
+        result = await run_case(job, concurrency, args.requests, args.districts)
+    finally:
+        await pool.close_all()
+    result.update(
+        wait_p50_ms=round(percentile(pool.waits, 0.5) * 1000, 1),
+        wait_p99_ms=round(percentile(pool.waits, 0.99) * 1000, 1),
+    )
+    return result
+
+
+async def bench_http(args, size: int, concurrency: int) -> dict:
+    fetcher = GorzdravHttpFetcher(base_url=f"http://127.0.0.1:{args.port}{API_PREFIX}", max_connections=size)
+    try:
+        async def job():
+            return len(await fetcher.fetch_district_info())
+
+        result = await run_case(job, concurrency, args.requests, args.districts)
+    finally:
+        await fetcher.close()
+    result.update(wait_p50_ms=None, wait_p99_ms=None)
+    return result
+
+
+def compare(results: List[dict], baseline_path: str, tolerance: float) -> bool:
+    """True, если ни один случай не стал медленнее базового больше чем на tolerance"""
+    with open(baseline_path, encoding="utf-8") as file:
+        baseline = {(row["target"], row["pool_size"], row["concurrency"]): row for row in json.load(file)}
+    ok = True
+    for row in results:
+        base = baseline.get((row["target"], row["pool_size"], row["concurrency"]))
+        if base is None or not base["p50_ms"]:
+            continue
+        change = row["p50_ms"] / base["p50_ms"] - 1
+        if change > tolerance:
+            ok = False
+            print(f"❌ Регрессия: pool={row['pool_size']} conc={row['concurrency']} "
+                  f"p50 {base['p50_ms']} -> {row['p50_ms']} мс (+{change:.0%})")
+    return ok
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+async def main_async(args) -> List[dict]:
+    server = None
+    if args.target in ("chrome", "http"):
+        server = start_fixture_site(args.port, **fixture_config(args))
+        scraper.SCHEDULE_URL = f"http://{args.public_host}:{args.port}{SCHEDULE_PATH}"
+
+    results = []
+    print(f"{'target':<8}{'pool':>6}{'conc':>6}{'req/s':>10}{'p50, мс':>10}{'p99, мс':>10}"
+          f"{'wait p50':>10}{'wait p99':>10}{'errors':>8}")
+    try:
+        for size in args.pool_sizes:
+            for concurrency in args.concurrency:
+                bench = bench_http if args.target == "http" else bench_pool
+                row: Dict = {"target": args.target, "pool_size": size, "concurrency": concurrency,
+                             **await bench(args, size, concurrency)}
+                results.append(row)
+                print(f"{row['target']:<8}{size:>6}{concurrency:>6}{row['throughput']:>10.2f}"
+                      f"{row['p50_ms']:>10.1f}{row['p99_ms']:>10.1f}"
+                      f"{row['wait_p50_ms'] if row['wait_p50_ms'] is not None else '-':>10}"
+                      f"{row['wait_p99_ms'] if row['wait_p99_ms'] is not None else '-':>10}{row['errors']:>8}")
+    finally:
+        if server is not None:
+            server.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=("fake", "chrome", "http"), default="fake")
+    parser.add_argument("--pool-sizes", type=_int_list, default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=16, help="запросов на каждый случай")
+    parser.add_argument("--workers", type=int, default=1, help="драйверов на один запрос (DISTRICT_SCRAPE_WORKERS)")
+    parser.add_argument("--command-latency", type=float, default=0.002, help="fake: задержка команды WebDriver, с")
+    parser.add_argument("--session-latency", type=float, default=0.5, help="fake: создание сессии, с")
+    parser.add_argument("--public-host", default="127.0.0.1", help="chrome: адрес фикстуры, видимый из браузера")
+    parser.add_argument("--output", help="сохранить результаты в JSON")
+    parser.add_argument("--baseline", help="сравнить с сохраненными результатами")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="допустимый рост p50 относительно baseline")
+    add_fixture_arguments(parser)
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+    if args.baseline and not compare(results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Бенчмарк блокировки ресурсов в Chrome: время загрузки страницы и трафик
+для профилей DRIVER_BLOCK_PROFILE и стратегий загрузки страницы.
+
+Страница-фикстура с картинками, шрифтами, CSS и "счетчиком" отдается локальным HTTP-сервером.
+Запуск (локальный Chrome):
+    SELENIUM_REMOTE=false python -m benchmarks.resource_blocking
+Для selenium в docker укажите адрес, по которому контейнер видит эту машину:
+    python -m benchmarks.resource_blocking --public-host host.docker.internal
+"""
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from statistics import median
+
+from app.dependencies import AsyncDriverPool
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    images = 20
+    asset_size = 50_000
+    latency = 0.05
+    bytes_sent = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        if self.path == "/" or self.path.startswith("/?"):
+            body = self._page().encode("utf-8")
+            content_type = "text/html; charset=utf-8"
+        else:
+            time.sleep(self.latency)
+            body = b"\0" * self.asset_size
+            content_type = {
+                "css": "text/css", "js": "application/javascript", "woff2": "font/woff2",
+            }.get(self.path.rsplit(".", 1)[-1], "image/png")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+        with FixtureHandler.lock:
+            FixtureHandler.bytes_sent += len(body)
+
+    def _page(self) -> str:
+        images = "".join(f'<img src="/img/{i}.png?{time.time()}">' for i in range(self.images))
+        return f"""<html><head>
+<link rel="stylesheet" href="/static/site.css?{time.time()}">
+<link rel="preload" as="font" href="/static/font.woff2?{time.time()}" crossorigin>
+<script async src="/counter/mc.yandex.ru/watch.js?{time.time()}"></script>
+</head><body><ul id="list">{"".join(f"<li>Район {i}</li>" for i in range(18))}</ul>{images}</body></html>"""
+
+    def log_message(self, *args):
+        pass
+
+
+def run(profile: str, strategy: str, url: str, loads: int):
+    pool = AsyncDriverPool(pool_size=1, block_profile=profile, page_load_strategy=strategy)
+    driver = pool._create_driver()
+    try:
+        driver.get(url)  # прогрев
+        timings = []
+        FixtureHandler.bytes_sent = 0
+        for _ in range(loads):
+            started = time.perf_counter()
+            driver.get(url)
+            timings.append(time.perf_counter() - started)
+        return median(timings), FixtureHandler.bytes_sent / loads
+    finally:
+        driver.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--public-host", default="127.0.0.1", help="адрес фикстуры, видимый из браузера")
+    parser.add_argument("--loads", type=int, default=10)
+    parser.add_argument("--images", type=int, default=20)
+    parser.add_argument("--asset-size", type=int, default=50_000)
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка на каждый ресурс, с")
+    args = parser.parse_args()
+
+    FixtureHandler.images = args.images
+    FixtureHandler.asset_size = args.asset_size
+    FixtureHandler.latency = args.latency
+    server = ThreadingHTTPServer(("0.0.0.0", args.port), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://{args.public_host}:{args.port}/"
+
+    print(f"{'profile':<12}{'strategy':<10}{'p50, мс':>10}{'КБ/загрузка':>14}")
+    try:
+        for profile in ("none", "light", "aggressive"):
+            for strategy in ("normal", "eager"):
+                seconds, sent = run(profile, strategy, url, args.loads)
+                print(f"{profile:<12}{strategy:<10}{seconds * 1000:>10.1f}{sent / 1024:>14.1f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,8 @@ topics=(
   "topic_2:3:1"
   "topic_3:3:1"
   "topic_4:1:1"
+  "scrape-jobs:3:1"
+  "scrape-results:3:1"
 )
 
 for topic in "${topics[@]}"; do
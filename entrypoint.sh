@@ -6,3 +6,9 @@ exec uvicorn app.main:app --host 0.0.0.0 --port 80 --reload
 
 # Для продакшена замените строку выше на, например:
 # exec gunicorn -k uvicorn.workers.UvicornWorker app.main:app -b 0.0.0.0:80 --workers 3
+
+# С несколькими воркерами сессии браузера лучше держать в одном процессе-брокере,
+# иначе каждый воркер создаст свой пул из DRIVER_POOL_SIZE драйверов:
+# python -m app.broker &
+# export DRIVER_BROKER=client
+# exec gunicorn -k uvicorn.workers.UvicornWorker app.main:app -b 0.0.0.0:80 --workers 3
@@ -0,0 +1,123 @@
+"""
+load_district_info: в режиме auto данные берутся из JSON API, а при ошибке HTTP
+или смене схемы ответа — откат на Selenium (scrape_with_pool)
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from app import scraper
+from app.fetcher import FetchSchemaError, GorzdravHttpFetcher
+from benchmarks.fixture_site import API_PREFIX, clinic_name, district_name, start_fixture_site
+
+SELENIUM_INFO = {"Selenium": ["Поликлиника из браузера"]}
+
+
+@pytest.fixture
+def selenium_calls(monkeypatch):
+    calls = []
+
+    async def fake_scrape_with_pool(pool, workers=None):
+        calls.append((pool, workers))
+        return SELENIUM_INFO
+
+    monkeypatch.setattr(scraper, "scrape_with_pool", fake_scrape_with_pool)
+    return calls
+
+
+def _load_from_fixture(engine, prefix=API_PREFIX, **config):
+    server = start_fixture_site(0, host="127.0.0.1", latency=0, page_latency=0, **config)
+    fetcher = GorzdravHttpFetcher(base_url=f"http://127.0.0.1:{server.server_address[1]}{prefix}")
+
+    async def scenario():
+        try:
+            return await scraper.load_district_info("pool", engine, fetcher=fetcher)
+        finally:
+            await fetcher.close()
+
+    try:
+        return asyncio.run(scenario())
+    finally:
+        server.shutdown()
+
+
+def _load_from_transport(engine, handler):
+    fetcher = GorzdravHttpFetcher(base_url="http://gorzdrav.test/_api/api/v2")
+
+    async def scenario():
+        fetcher._client = httpx.AsyncClient(base_url=fetcher.base_url, transport=httpx.MockTransport(handler))
+        try:
+            return await scraper.load_district_info("pool", engine, fetcher=fetcher)
+        finally:
+            await fetcher.close()
+
+    return asyncio.run(scenario())
+
+
+def test_auto_uses_http_api(selenium_calls):
+    info = _load_from_fixture("auto", districts=3, clinics=2)
+    assert info == {district_name(d): [clinic_name(d, i) for i in range(2)] for d in range(3)}
+    assert selenium_calls == []
+
+
+def test_auto_falls_back_to_selenium_on_http_error(selenium_calls):
+    # Неверный префикс API — фикстура отвечает 404
+    info = _load_from_fixture("auto", prefix="/_api/api/v3", districts=3, clinics=2)
+    assert info == SELENIUM_INFO
+    assert selenium_calls == [("pool", None)]
+
+
+def test_auto_falls_back_to_selenium_on_schema_change(selenium_calls):
+    def handler(request):
+        if request.url.path.endswith("/shared/districts"):
+            return httpx.Response(200, json={"success": True, "result": [{"id": 1, "name": "Центральный"}]})
+        # Поле с названием поликлиники переименовано
+        return httpx.Response(200, json={"success": True, "result": [{"id": 1, "title": "Поликлиника №1"}]})
+
+    assert _load_from_transport("auto", handler) == SELENIUM_INFO
+    assert selenium_calls == [("pool", None)]
+
+
+def test_http_engine_raises_instead_of_fallback(selenium_calls):
+    def handler(request):
+        return httpx.Response(200, json={"districts": []})
+
+    with pytest.raises(FetchSchemaError):
+        _load_from_transport("http", handler)
+    with pytest.raises(httpx.HTTPStatusError):
+        _load_from_fixture("http", prefix="/_api/api/v3")
+    assert selenium_calls == []
+
+
+def test_stream_falls_back_to_selenium_for_districts_not_yet_yielded(monkeypatch):
+    selenium_rows = [(0, "Центральный", ["Поликлиника №1"]), (1, "Невский", ["Поликлиника №2"])]
+
+    async def fake_stream_with_pool(pool, workers=None):
+        for row in selenium_rows:
+            yield row
+
+    monkeypatch.setattr(scraper, "stream_with_pool", fake_stream_with_pool)
+
+    async def handler(request):
+        path = request.url.path
+        if path.endswith("/shared/districts"):
+            return httpx.Response(200, json={"success": True, "result": [
+                {"id": 1, "name": "Центральный"}, {"id": 2, "name": "Невский"},
+            ]})
+        if "/district/2/" in path:
+            # Ответ по второму району приходит позже первого и с ошибкой
+            await asyncio.sleep(0.05)
+            return httpx.Response(500)
+        return httpx.Response(200, json={"success": True, "result": [{"id": 1, "lpuFullName": "Поликлиника №1"}]})
+
+    fetcher = GorzdravHttpFetcher(base_url="http://gorzdrav.test/_api/api/v2")
+
+    async def scenario():
+        fetcher._client = httpx.AsyncClient(base_url=fetcher.base_url, transport=httpx.MockTransport(handler))
+        try:
+            return [row async for row in scraper.stream_district_info("pool", "auto", fetcher=fetcher)]
+        finally:
+            await fetcher.close()
+
+    assert asyncio.run(scenario()) == [("Центральный", ["Поликлиника №1"]), ("Невский", ["Поликлиника №2"])]
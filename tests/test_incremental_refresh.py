@@ -0,0 +1,73 @@
+"""
+Инкрементальное обновление районов против фикстуры benchmarks/fixture_site.py:
+ETag для If-None-Match берется только из сохраненного состояния района, поэтому
+обходы без сохранения (/district/stream, краулер) не могут спрятать изменение сайта за 304
+"""
+import asyncio
+
+from app.changes import fingerprint
+from app.fetcher import GorzdravHttpFetcher
+from app.scraper import refresh_district_info, stream_district_info
+from benchmarks.fixture_site import API_PREFIX, clinic_name, district_name, start_fixture_site
+
+
+def _persist(known, info, etags):
+    """То же, что save_district_info делает с состоянием районов: отпечаток и ETag в одной записи"""
+    for name, clinics in info.items():
+        known[name] = {"fingerprint": fingerprint(clinics), "etag": etags.get(name), "updated_at": 0}
+    return known
+
+
+def test_stream_does_not_hide_site_change_from_refresh():
+    server = start_fixture_site(0, host="127.0.0.1", districts=3, clinics=2, latency=0, page_latency=0)
+    fetcher = GorzdravHttpFetcher(base_url=f"http://127.0.0.1:{server.server_address[1]}{API_PREFIX}")
+
+    async def scenario():
+        try:
+            info, not_modified, districts, etags = await refresh_district_info(None, {}, "http", fetcher=fetcher)
+            assert not not_modified and len(info) == 3 and all(etags.values())
+            known = _persist({}, info, etags)
+
+            # Без изменений сайта — все районы 304
+            info, not_modified, _, _ = await refresh_district_info(None, known, "http", fetcher=fetcher)
+            assert info == {} and sorted(not_modified) == sorted(districts)
+
+            # Сайт меняется: в каждом районе 3 поликлиники вместо 2
+            server.RequestHandlerClass.clinics = 3
+            streamed = {name: clinics async for name, clinics in stream_district_info(None, "http", fetcher=fetcher)}
+            assert all(len(clinics) == 3 for clinics in streamed.values())
+
+            info, not_modified, _, etags = await refresh_district_info(None, known, "http", fetcher=fetcher)
+            assert not_modified == []
+            assert info[district_name(0)] == [clinic_name(0, i) for i in range(3)]
+            known = _persist(known, info, etags)
+
+            info, not_modified, _, _ = await refresh_district_info(None, known, "http", fetcher=fetcher)
+            assert info == {} and len(not_modified) == 3
+        finally:
+            await fetcher.close()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        server.shutdown()
+
+
+def test_refresh_without_stored_fingerprint_ignores_etag():
+    server = start_fixture_site(0, host="127.0.0.1", districts=2, clinics=2, latency=0, page_latency=0)
+    fetcher = GorzdravHttpFetcher(base_url=f"http://127.0.0.1:{server.server_address[1]}{API_PREFIX}")
+
+    async def scenario():
+        try:
+            _, _, _, etags = await refresh_district_info(None, {}, "http", fetcher=fetcher)
+            # Сохранение не удалось: отпечатка нет, ETag в состоянии не доверяем
+            known = {name: {"fingerprint": None, "etag": etag, "updated_at": 0} for name, etag in etags.items()}
+            info, not_modified, _, _ = await refresh_district_info(None, known, "http", fetcher=fetcher)
+            assert not_modified == [] and len(info) == 2
+        finally:
+            await fetcher.close()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        server.shutdown()
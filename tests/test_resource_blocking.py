@@ -0,0 +1,23 @@
+from app.dependencies import AsyncDriverPool, BLOCK_PROFILES, _IMAGE_PATTERNS
+
+
+def _blocked(allowlist, profile="light"):
+    return AsyncDriverPool(pool_size=1, block_profile=profile, block_allowlist=allowlist)._blocked_urls()
+
+
+def test_allowlisted_host_unblocks_only_its_tracker_pattern():
+    blocked = _blocked(["mc.yandex.ru"])
+    assert "*mc.yandex.ru*" not in blocked
+    assert set(blocked) == set(BLOCK_PROFILES["light"]) - {"*mc.yandex.ru*"}
+
+
+def test_allowlisted_image_url_keeps_other_image_patterns():
+    blocked = _blocked(["https://gorzdrav.spb.ru/static/logo.png?v=1"])
+    assert "*.png*" not in blocked
+    assert "*.jpg*" in blocked
+    # Не все картинки заблокированы — отключать их настройкой профиля нельзя
+    assert not set(_IMAGE_PATTERNS) <= set(blocked)
+
+
+def test_site_host_does_not_unblock_resource_types():
+    assert _blocked(["gorzdrav.spb.ru"], "aggressive") == BLOCK_PROFILES["aggressive"]
@@ -0,0 +1,84 @@
+"""
+Конвейер задач на InMemoryBroker: submit → ScrapeWorker → топик результатов → JobStore.
+Партиции обрабатываются параллельно, offset'ы коммитятся только после всей пачки
+"""
+import asyncio
+
+from app.jobs import JobManager, JobStore
+from app.kafka_queue import SCRAPE_JOBS_TOPIC, InMemoryBroker, ScrapeQueue
+from app.worker import SCRAPE_WORKER_GROUP, ScrapeWorker
+
+
+class FakePool:
+    pool_size = 3
+
+
+def test_jobs_flow_from_submit_to_store():
+    broker = InMemoryBroker(partitions=3)
+    queue = ScrapeQueue(broker)
+    store = JobStore(ttl=60)
+    pool = FakePool()
+    statuses = {}
+    active = {"now": 0, "max": 0}
+    committed_during_batch = []
+
+    async def handler(handler_pool, params):
+        assert handler_pool is pool
+        # Пока задача выполняется, статус running уже дошел до хранилища
+        await asyncio.sleep(0.01)
+        statuses[params["n"]] = (await store.get(params["job_id"])).status
+        committed_during_batch.append(dict(broker._committed))
+        active["now"] += 1
+        active["max"] = max(active["max"], active["now"])
+        await asyncio.sleep(0.05)
+        active["now"] -= 1
+        if params["n"] == 5:
+            raise RuntimeError("сайт недоступен")
+        return {"n": params["n"]}
+
+    manager = JobManager(store, queue, handlers={"test": handler})
+    worker = ScrapeWorker(broker, pool, handlers={"test": handler}, max_records=10)
+
+    async def submit(n):
+        # job_id нужен обработчику, чтобы прочитать статус своей задачи
+        job = await store.create("test", {"n": n})
+        job.params["job_id"] = job.job_id
+        await queue.submit("test", job.params, job_id=job.job_id)
+        return job
+
+    async def scenario():
+        await queue.start()
+        await manager.start(pool)
+        await asyncio.sleep(0)  # listener подключился к топику результатов до первых результатов
+        jobs = [await submit(n) for n in range(6)]
+        assert all(job.status == "queued" for job in jobs)
+
+        worker_task = asyncio.create_task(worker.run())
+        try:
+            for job in jobs:
+                await store.wait(job, timeout=5)
+        finally:
+            worker.stop()
+            await worker_task
+            await manager.stop()
+            await queue.stop()
+        return jobs
+
+    jobs = asyncio.run(scenario())
+
+    assert [job.status for job in jobs] == ["done"] * 5 + ["failed"]
+    assert [job.result for job in jobs[:5]] == [{"n": n} for n in range(5)]
+    assert jobs[5].error == "сайт недоступен"
+    assert set(statuses.values()) == {"running"}
+
+    # Задачи из разных партиций выполнялись одновременно
+    used_partitions = sum(1 for partition in broker._partitions(SCRAPE_JOBS_TOPIC) if partition)
+    assert used_partitions > 1 and active["max"] == used_partitions
+
+    # Все задачи пришли одной пачкой: во время ее обработки offset'ы не коммитились
+    assert all(
+        not any(key[0] == SCRAPE_JOBS_TOPIC for key in committed) for committed in committed_during_batch
+    )
+    for index, partition in enumerate(broker._partitions(SCRAPE_JOBS_TOPIC)):
+        if partition:
+            assert broker._committed[(SCRAPE_JOBS_TOPIC, SCRAPE_WORKER_GROUP, index)] == len(partition)